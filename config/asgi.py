@@ -5,6 +5,24 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+Déploiement (uvicorn) :
+
+    pip install uvicorn
+    python manage.py collectstatic --noinput
+    DB_PROFIL=production DB_CONN_MAX_AGE=0 \
+        uvicorn config.asgi:application --host 0.0.0.0 --port 8000 --workers 4 --lifespan off
+
+- Sous ASGI, les pages en lecture (accueil, classement, mes pronos) et l'API JSON sont servies
+  par leurs versions async (config.urls_asgi) ; les autres vues, synchrones, tournent dans un thread.
+- DB_CONN_MAX_AGE=0 : les requêtes ORM de chaque requête HTTP passent par un thread dédié,
+  des connexions persistantes s'accumuleraient (une par thread).
+- uvicorn ne sert pas les fichiers statiques : les laisser au proxy (nginx) devant uvicorn.
+- Classement en direct (pronostics/direct.py) : chaque page de classement ouverte garde une connexion
+  Server-Sent Events (/classement/direct/). Avec plusieurs workers, ou pour recevoir les imports de
+  watch_imports, les changements passent par un cache commun aux processus (CACHE_BACKEND=fichier).
+  Derrière nginx : proxy_read_timeout au-delà de 15 s (un commentaire d'entretien part toutes les 15 s).
+- Comparer avec le chemin WSGI : python manage.py benchmark_asgi
 """
 
 import os
@@ -12,5 +30,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+os.environ.setdefault('PRONOSTICS_VUES_ASYNC', '1')
 
 application = get_asgi_application()
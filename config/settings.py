@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # ---------------------------
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 # MIDDLEWARE
 # ---------------------------
 MIDDLEWARE = [
+    'pronostics.instrumentation.InstrumentationMiddleware',  # En tête : mesure aussi session et authentification
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,7 +61,9 @@ MIDDLEWARE = [
 # ---------------------------
 # URL CONF
 # ---------------------------
-ROOT_URLCONF = 'config.urls'
+# Sous ASGI (config/asgi.py), les pages en lecture et l'API JSON sont servies par leurs versions async
+PRONOSTICS_VUES_ASYNC = os.environ.get('PRONOSTICS_VUES_ASYNC') == '1'
+ROOT_URLCONF = 'config.urls_asgi' if PRONOSTICS_VUES_ASYNC else 'config.urls'
 
 # ---------------------------
 # TEMPLATES
@@ -75,6 +79,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'pronostics.cache.version',
             ],
         },
     },
@@ -86,13 +91,105 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 
 # ---------------------------
-# BASE DE DONNÉES (sqlite pour dev)
+# BASE DE DONNÉES
+# ---------------------------
+# DB_PROFIL=dev (défaut)   : sqlite simple pour le développement
+# DB_PROFIL=production     : sqlite en WAL, attente sur verrou, connexions persistantes,
+#                            transactions d'écriture IMMEDIATE (pas d'erreur "database is locked"
+#                            quand une lecture veut devenir écriture pendant le rush)
+# DB_PROFIL=postgresql     : PostgreSQL, paramètres POSTGRES_DB / POSTGRES_USER / POSTGRES_PASSWORD /
+#                            POSTGRES_HOST / POSTGRES_PORT
+DB_PROFIL = os.environ.get('DB_PROFIL', 'dev')
+
+if DB_PROFIL == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'viscatolosa'),
+            'USER': os.environ.get('POSTGRES_USER', 'viscatolosa'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+elif DB_PROFIL == 'production':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_CHEMIN', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'timeout': 20,  # Attente maximale (secondes) d'un verrou d'écriture
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA busy_timeout=20000;'
+                ),
+            },
+            # Les tests de concurrence ont besoin d'un vrai fichier (WAL impossible en mémoire)
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
 # ---------------------------
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# CACHE
+# ---------------------------
+# Mémoire locale par défaut (un seul processus). Sur une machine unique où les imports
+# tournent dans un autre processus (watch_imports), utiliser le cache fichier partagé :
+# CACHE_BACKEND=fichier
+if os.environ.get('CACHE_BACKEND') == 'fichier':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DOSSIER', BASE_DIR / 'cache'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'pronostics',
+        }
     }
+
+# Durée de vie maximale (secondes) des pages en cache, bornée par le prochain coup d'envoi
+PRONOSTICS_CACHE_DUREE = 600
+
+# ---------------------------
+# INSTRUMENTATION
+# ---------------------------
+# Requêtes SQL plus lentes que ce seuil (ms) écrites dans le journal des requêtes lentes
+PRONOSTICS_SEUIL_REQUETE_LENTE_MS = float(os.environ.get('SEUIL_REQUETE_LENTE_MS', 200))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'horodate': {'format': '{asctime} {message}', 'style': '{'},
+    },
+    'handlers': {
+        'requetes_lentes': {
+            'class': 'logging.FileHandler',
+            'filename': os.environ.get('JOURNAL_REQUETES_LENTES', BASE_DIR / 'requetes_lentes.log'),
+            'formatter': 'horodate',
+            'encoding': 'utf-8',
+            'delay': True,  # Fichier créé à la première requête lente seulement
+        },
+    },
+    'loggers': {
+        'pronostics.requetes_lentes': {'handlers': ['requetes_lentes'], 'level': 'WARNING', 'propagate': False},
+    },
 }
 
 # ---------------------------
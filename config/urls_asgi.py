@@ -0,0 +1,11 @@
+"""
+URL configuration servie sous ASGI : mêmes URLs que config.urls, avec les versions
+async des pages en lecture et de l'API JSON (pronostics.urls_asgi).
+"""
+from django.contrib import admin
+from django.urls import path, include
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('', include('pronostics.urls_asgi', namespace='pronostics')),
+]
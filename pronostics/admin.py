@@ -1,24 +1,120 @@
 from django.contrib import admin
-from .models import Match, Pronostic, Saison, Equipe
+from django.contrib.admin.views.main import PAGE_VAR
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils.functional import cached_property
 
+from .cache import incrementer_version
+from .classement import mettre_a_jour_saison, rescorer_matchs
+from .models import Classement, Match, Pronostic, Saison, Equipe
+
+# -------------------------------
+# Grandes tables (pronostics, classements)
+# -------------------------------
+class PaginateurSansComptage(Paginator):
+    """
+    Jamais de COUNT(*) sur toute la table : le comptage s'arrête (LIMIT) une ligne après la page
+    demandée, ce qui suffit pour le lien vers la page suivante. `tronque` : il reste des lignes au-delà.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, page_demandee=1):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.borne = max(page_demandee, 1) * per_page + 1
+        self.tronque = False
+
+    @cached_property
+    def count(self):
+        compte = self.object_list[:self.borne].count()
+        self.tronque = compte == self.borne
+        return compte
+
+
+class GrandeTableAdmin(admin.ModelAdmin):
+    paginator = PaginateurSansComptage
+    show_full_result_count = False  # Sinon un second COUNT(*) sans filtre
+    list_max_show_all = 0  # Pas de lien "Tout afficher"
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        try:
+            page = int(request.GET.get(PAGE_VAR, 1))
+        except ValueError:
+            page = 1
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page, page_demandee=page)
+
+
+# -------------------------------
+# Modèles
+# -------------------------------
 class EquipeInline(admin.TabularInline):
     model = Saison.equipes.through
     extra = 0
+    autocomplete_fields = ('equipe',)
 
 @admin.register(Saison)
 class SaisonAdmin(admin.ModelAdmin):
-    list_display = ('annee',)
+    list_display = ('annee', 'archivee')
+    readonly_fields = ('archivee',)  # Voir la commande archiver_saison
     inlines = [EquipeInline]
 
 @admin.register(Equipe)
 class EquipeAdmin(admin.ModelAdmin):
     list_display = ('nom', 'logo')
+    search_fields = ('nom',)
 
 @admin.register(Match)
 class MatchAdmin(admin.ModelAdmin):
-    list_display = ('journee', 'saison', 'equipe_domicile', 'equipe_exterieure', 'date', 'score_domicile', 'score_exterieur')
+    list_display = ('journee', 'saison', 'equipe_domicile', 'equipe_exterieure', 'date', 'score_domicile', 'score_exterieur', 'verrouille')
+    list_select_related = ()  # Saison et équipes : référentiel en mémoire, pas de jointure
+    list_filter = ('saison', 'journee', 'verrouille')  # Index (saison, journee)
+    search_fields = ('equipe_domicile__nom', 'equipe_exterieure__nom')
+    autocomplete_fields = ('equipe_domicile', 'equipe_exterieure')
     ordering = ('date',)
+    actions = ['recalculer_points', 'verrouiller_journees', 'deverrouiller_journees']
+
+    # Actions en masse : quelques requêtes UPDATE, jamais de save() par objet
+    @admin.action(description="Recalculer les points des matchs sélectionnés")
+    def recalculer_points(self, request, queryset):
+        with transaction.atomic():
+            pronostics = rescorer_matchs(list(queryset.values_list('id', flat=True)))
+            for saison_id in queryset.order_by().values_list('saison_id', flat=True).distinct():
+                mettre_a_jour_saison(saison_id)
+        incrementer_version()
+        self.message_user(request, f"{pronostics} pronostics recalculés.")
+
+    def _verrouiller(self, request, queryset, verrouille):
+        # Tous les matchs des journées (saison, journée) touchées par la sélection, en un seul UPDATE
+        meme_journee = queryset.filter(saison_id=OuterRef('saison_id'), journee=OuterRef('journee'))
+        matchs = Match.objects.filter(Exists(meme_journee)).update(verrouille=verrouille)
+        incrementer_version()
+        self.message_user(request, f"{matchs} matchs {'verrouillés' if verrouille else 'déverrouillés'}.")
+
+    @admin.action(description="Verrouiller les journées des matchs sélectionnés")
+    def verrouiller_journees(self, request, queryset):
+        self._verrouiller(request, queryset, True)
+
+    @admin.action(description="Déverrouiller les journées des matchs sélectionnés")
+    def deverrouiller_journees(self, request, queryset):
+        self._verrouiller(request, queryset, False)
 
 @admin.register(Pronostic)
-class PronosticAdmin(admin.ModelAdmin):
-    list_display = ('user', 'match', 'score_domicile', 'score_exterieur', 'points')
+class PronosticAdmin(GrandeTableAdmin):
+    list_display = ('user', 'match', 'journee', 'score_domicile', 'score_exterieur', 'points')
+    # Pronostic.__str__ lit l'utilisateur et le match (ses équipes viennent du référentiel en mémoire)
+    list_select_related = ('user', 'match')
+    list_filter = ('match__saison', 'match__journee')  # Clé étrangère match indexée, puis index (saison, journee)
+    search_fields = ('=user__username',)  # Égalité exacte : index unique du nom d'utilisateur
+    autocomplete_fields = ('user',)
+    raw_id_fields = ('match',)
+
+    @admin.display(description='Journée', ordering='match__journee')
+    def journee(self, obj):
+        return obj.match.journee
+
+@admin.register(Classement)
+class ClassementAdmin(GrandeTableAdmin):
+    list_display = ('saison', 'rang', 'user', 'points', 'scores_exacts', 'bons_resultats', 'points_derniere_journee')
+    list_filter = ('saison',)
+    list_select_related = ('saison', 'user')
+    search_fields = ('=user__username',)
+    autocomplete_fields = ('user',)
@@ -0,0 +1,359 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET
+
+from .cache import date_modification, version_donnees
+from .classement import aautour_de, asaison_courante, autour_de, saison_courante
+from .models import Classement, Match, Pronostic, Saison
+
+# -------------------------------
+# Pagination par curseur
+# -------------------------------
+LIMITE_PAR_DEFAUT = 50
+LIMITE_MAX = 200
+
+
+class CurseurInvalide(ValueError):
+    pass
+
+
+def _encoder_curseur(valeurs):
+    # isoformat() complet : DjangoJSONEncoder tronque aux millisecondes et la reprise sauterait ou répéterait des lignes
+    valeurs = [v.isoformat() if isinstance(v, datetime) else v for v in valeurs]
+    texte = json.dumps(valeurs, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texte.encode()).decode().rstrip('=')
+
+
+def _decoder_curseur(curseur):
+    try:
+        texte = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4)).decode()
+        return json.loads(texte)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise CurseurInvalide("Curseur invalide") from e
+
+
+def _valeur_curseur(queryset, champ, valeur):
+    """Valeur d'un curseur convertie par le champ trié : un curseur modifié à la main donne un 400, pas un 500"""
+    if champ in queryset.query.annotations:
+        champ_modele = queryset.query.annotations[champ].output_field
+    else:
+        champ_modele = queryset.model._meta.get_field(champ)
+    if valeur is None or isinstance(valeur, (list, dict)):
+        raise CurseurInvalide("Curseur invalide")
+    try:
+        return champ_modele.to_python(valeur)
+    except (ValidationError, TypeError, ValueError) as e:
+        raise CurseurInvalide("Curseur invalide") from e
+
+
+def _page_demandee(request, queryset, tri):
+    """Applique curseur et limite : retourne (queryset de limite + 1 lignes, limite)"""
+    try:
+        limite = min(int(request.GET.get('limite', LIMITE_PAR_DEFAUT)), LIMITE_MAX)
+    except ValueError:
+        raise CurseurInvalide("Limite invalide")
+    if limite < 1:
+        raise CurseurInvalide("Limite invalide")
+
+    curseur = request.GET.get('curseur')
+    if curseur:
+        derniers = _decoder_curseur(curseur)
+        if not isinstance(derniers, list) or len(derniers) != len(tri):
+            raise CurseurInvalide("Curseur invalide")
+        derniers = [_valeur_curseur(queryset, champ, valeur) for champ, valeur in zip(tri, derniers)]
+        # (a, b) > (x, y)  <=>  a > x  OU  (a = x ET b > y)
+        apres = Q()
+        for i, champ in enumerate(tri):
+            egalites = {tri[j]: derniers[j] for j in range(i)}
+            apres |= Q(**egalites, **{f'{champ}__gt': derniers[i]})
+        queryset = queryset.filter(apres)
+    return queryset.order_by(*tri)[:limite + 1], limite
+
+
+def _couper(lignes, limite, tri):
+    suivant = None
+    if len(lignes) > limite:
+        lignes = lignes[:limite]
+        suivant = _encoder_curseur([lignes[-1][champ] for champ in tri])
+    return lignes, suivant
+
+
+def paginer(request, queryset, tri):
+    """
+    Pagination par curseur sur les champs `tri` (croissants, uniques ensemble) : la page suivante
+    reprend strictement après la dernière ligne, sans OFFSET ni COUNT.
+    Retourne (lignes, curseur suivant ou None).
+    """
+    page, limite = _page_demandee(request, queryset, tri)
+    return _couper(list(page), limite, tri)
+
+
+async def apaginer(request, queryset, tri):
+    """Version async de paginer()"""
+    page, limite = _page_demandee(request, queryset, tri)
+    return _couper([ligne async for ligne in page], limite, tri)
+
+
+# -------------------------------
+# Réponses conditionnelles (ETag / Last-Modified)
+# -------------------------------
+def _valeur_etag(user, prochain):
+    """
+    Version des données, utilisateur (mes_pronos) et prochain match : au coup d'envoi,
+    la liste des matchs à venir change sans nouvelle écriture. L'URL fait déjà partie de la clé côté client.
+    """
+    return f'"v{version_donnees()}-u{user.pk}-p{prochain}"'
+
+
+def _etag(request, *args, **kwargs):
+    return _valeur_etag(request.user, Match.objects.a_venir().values_list('id', flat=True).first())
+
+
+def _derniere_modification(request, *args, **kwargs):
+    return datetime.fromtimestamp(int(date_modification()), tz=dt_timezone.utc)
+
+
+def _non_authentifie():
+    return JsonResponse({'erreur': 'Authentification requise'}, status=401)
+
+
+def _saison_inconnue():
+    return JsonResponse({'erreur': 'Saison inconnue'}, status=404)
+
+
+def saison_demandee(request):
+    """Comme classement.saison_demandee(), mais une saison inconnue lève Saison.DoesNotExist (404 JSON, voir api_vue)"""
+    if request.GET.get('saison'):
+        return Saison.objects.get(annee=request.GET['saison'])
+    return saison_courante()
+
+
+async def asaison_demandee(request):
+    """Version async de saison_demandee()"""
+    if request.GET.get('saison'):
+        return await Saison.objects.aget(annee=request.GET['saison'])
+    return await asaison_courante()
+
+
+def _finaliser(response):
+    # Toujours revalider : le client renvoie son ETag et reçoit 304 si rien n'a changé
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def api_vue(vue):
+    """
+    GET uniquement, authentification requise (401 JSON), 304 si le client a déjà la version courante.
+    Erreurs en JSON : paramètre ou curseur invalide (400), saison inconnue (404).
+    Accepte aussi les vues async : l'utilisateur et l'ETag sont alors calculés avec l'ORM async.
+    """
+    if iscoroutinefunction(vue):
+        @wraps(vue)
+        @require_GET
+        async def wrapper(request, *args, **kwargs):
+            # Utilisateur résolu une fois : la vue et les templates lisent request.user sans requête synchrone
+            request.user = await request.auser()
+            if not request.user.is_authenticated:
+                return _non_authentifie()
+            # Version et date lues dans le cache hors de la boucle (cache en fichiers sous ASGI)
+            prochain = await Match.objects.a_venir().values_list('id', flat=True).afirst()
+            etag = await sync_to_async(_valeur_etag, thread_sensitive=False)(request.user, prochain)
+            derniere_modification = await sync_to_async(_derniere_modification, thread_sensitive=False)(request)
+            conditionnelle = condition(
+                etag_func=lambda *a, **k: etag,
+                last_modified_func=lambda *a, **k: derniere_modification,
+            )(vue)
+            try:
+                return _finaliser(await conditionnelle(request, *args, **kwargs))
+            except CurseurInvalide as e:
+                return JsonResponse({'erreur': str(e)}, status=400)
+            except Saison.DoesNotExist:
+                return _saison_inconnue()
+        return wrapper
+
+    conditionnelle = condition(etag_func=_etag, last_modified_func=_derniere_modification)(vue)
+
+    @wraps(vue)
+    @require_GET
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _non_authentifie()
+        try:
+            return _finaliser(conditionnelle(request, *args, **kwargs))
+        except CurseurInvalide as e:
+            return JsonResponse({'erreur': str(e)}, status=400)
+        except Saison.DoesNotExist:
+            return _saison_inconnue()
+    return wrapper
+
+
+def _page(lignes, suivant, format_ligne):
+    return JsonResponse(
+        {'resultats': [format_ligne(l) for l in lignes], 'suivant': suivant},
+        json_dumps_params={'separators': (',', ':')},
+    )
+
+
+# -------------------------------
+# Requêtes et formats des lignes (communs aux versions sync et async)
+# -------------------------------
+TRI_CLASSEMENT = ['rang', 'user_id']
+TRI_MATCHS = ['date', 'id']
+TRI_PRONOS = ['date_match', 'match_id']
+
+
+def _requete_classement(saison):
+    return Classement.objects.filter(saison=saison).values(
+        'rang', 'user_id', joueur=F('user__username'), pts=F('points'),
+        exacts=F('scores_exacts'), bons=F('bons_resultats'), derniere_journee=F('points_derniere_journee'),
+    )
+
+
+def _ligne_classement(l):
+    return {
+        'rang': l['rang'], 'joueur': l['joueur'], 'points': l['pts'],
+        'exacts': l['exacts'], 'bons': l['bons'], 'derniere_journee': l['derniere_journee'],
+    }
+
+
+VOISINS_PAR_DEFAUT = 5
+VOISINS_MAX = 25
+
+
+def _voisins_demandes(request):
+    try:
+        voisins = min(int(request.GET.get('voisins', VOISINS_PAR_DEFAUT)), VOISINS_MAX)
+    except ValueError:
+        raise CurseurInvalide("Nombre de voisins invalide")
+    if voisins < 0:
+        raise CurseurInvalide("Nombre de voisins invalide")
+    return voisins
+
+
+def _format_autour(user):
+    def format_ligne(l):
+        return {
+            'rang': l['rang'], 'joueur': l['username'], 'points': l['points'],
+            'exacts': l['scores_exacts'], 'bons': l['bons_resultats'], 'derniere_journee': l['points_derniere_journee'],
+            'moi': l['user_id'] == user.pk,
+        }
+    return format_ligne
+
+
+def _valeurs_match(queryset):
+    return queryset.values(
+        'id', 'journee', 'date', 'score_domicile', 'score_exterieur',
+        domicile=F('equipe_domicile__nom'), exterieur=F('equipe_exterieure__nom'),
+    )
+
+
+def _match_compact(ligne):
+    return {
+        'id': ligne['id'],
+        'journee': ligne['journee'],
+        'date': ligne['date'],
+        'domicile': ligne['domicile'],
+        'exterieur': ligne['exterieur'],
+        'score': [ligne['score_domicile'], ligne['score_exterieur']] if ligne['score_domicile'] is not None else None,
+    }
+
+
+def _requete_pronos(user, saison):
+    return Pronostic.objects.filter(user=user, match__saison=saison).values(
+        'points', 'match_id', date_match=F('match__date'),
+        domicile=F('match__equipe_domicile__nom'), exterieur=F('match__equipe_exterieure__nom'),
+        prono_dom=F('score_domicile'), prono_ext=F('score_exterieur'),
+        score_dom=F('match__score_domicile'), score_ext=F('match__score_exterieur'),
+    )
+
+
+def _ligne_prono(l):
+    return {
+        'match': l['match_id'],
+        'date': l['date_match'],
+        'domicile': l['domicile'],
+        'exterieur': l['exterieur'],
+        'prono': [l['prono_dom'], l['prono_ext']] if l['prono_dom'] is not None else None,
+        'score': [l['score_dom'], l['score_ext']] if l['score_dom'] is not None else None,
+        'points': l['points'],
+    }
+
+
+# -------------------------------
+# Points d'entrée (WSGI)
+# -------------------------------
+@api_vue
+def classement(request):
+    lignes, suivant = paginer(request, _requete_classement(saison_demandee(request)), TRI_CLASSEMENT)
+    return _page(lignes, suivant, _ligne_classement)
+
+
+@api_vue
+def autour_de_moi(request):
+    """Rang de l'utilisateur et ses voisins (?voisins=N de chaque côté) ; liste vide s'il n'est pas classé"""
+    saison = saison_demandee(request)
+    lignes = autour_de(request.user.pk, saison.id, _voisins_demandes(request)) if saison else []
+    return _page(lignes, None, _format_autour(request.user))
+
+
+@api_vue
+def matchs_a_venir(request):
+    lignes, suivant = paginer(request, _valeurs_match(Match.objects.a_venir()), TRI_MATCHS)
+    return _page(lignes, suivant, _match_compact)
+
+
+@api_vue
+def journee(request, journee):
+    queryset = _valeurs_match(Match.objects.filter(saison=saison_demandee(request), journee=journee))
+    lignes, suivant = paginer(request, queryset, TRI_MATCHS)
+    return _page(lignes, suivant, _match_compact)
+
+
+@api_vue
+def mes_pronos(request):
+    lignes, suivant = paginer(request, _requete_pronos(request.user, saison_demandee(request)), TRI_PRONOS)
+    return _page(lignes, suivant, _ligne_prono)
+
+
+# -------------------------------
+# Points d'entrée async (ASGI, voir config/asgi.py)
+# -------------------------------
+@api_vue
+async def aclassement(request):
+    lignes, suivant = await apaginer(request, _requete_classement(await asaison_demandee(request)), TRI_CLASSEMENT)
+    return _page(lignes, suivant, _ligne_classement)
+
+
+@api_vue
+async def aautour_de_moi(request):
+    saison = await asaison_demandee(request)
+    lignes = await aautour_de(request.user.pk, saison.id, _voisins_demandes(request)) if saison else []
+    return _page(lignes, None, _format_autour(request.user))
+
+
+@api_vue
+async def amatchs_a_venir(request):
+    lignes, suivant = await apaginer(request, _valeurs_match(Match.objects.a_venir()), TRI_MATCHS)
+    return _page(lignes, suivant, _match_compact)
+
+
+@api_vue
+async def ajournee(request, journee):
+    queryset = _valeurs_match(Match.objects.filter(saison=await asaison_demandee(request), journee=journee))
+    lignes, suivant = await apaginer(request, queryset, TRI_MATCHS)
+    return _page(lignes, suivant, _match_compact)
+
+
+@api_vue
+async def ames_pronos(request):
+    lignes, suivant = await apaginer(request, _requete_pronos(request.user, await asaison_demandee(request)), TRI_PRONOS)
+    return _page(lignes, suivant, _ligne_prono)
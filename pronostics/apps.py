@@ -3,3 +3,17 @@ from django.apps import AppConfig
 class PronosticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pronostics'
+
+    def ready(self):
+        from django.core.signals import request_started
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401  Branche la mise à jour du classement
+        from .instrumentation import installer_chronometre
+        from .referentiel import verifier
+
+        # Chronométrage des requêtes SQL (instrumentation.py), sur chaque nouvelle connexion
+        connection_created.connect(installer_chronometre, dispatch_uid='pronostics_chronometre_sql')
+
+        # Référentiel équipes / saisons : version partagée relue une fois par requête (referentiel.py)
+        request_started.connect(verifier, dispatch_uid='pronostics_referentiel')
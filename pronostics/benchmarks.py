@@ -0,0 +1,248 @@
+import contextlib
+import csv
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from watchers.import_csv import import_csv
+from watchers.import_users import import_users
+
+from .models import Match
+from .synthetique import generer_donnees
+
+# -------------------------------
+# Tailles et seuils
+# -------------------------------
+TAILLES = {
+    'petite': {'joueurs': 20, 'saisons': 1, 'equipes': 6, 'journees': 6},
+    'moyenne': {'joueurs': 200, 'saisons': 2, 'equipes': 10, 'journees': 18},
+    'grande': {'joueurs': 1000, 'saisons': 3, 'equipes': 20, 'journees': 38},
+}
+
+# Seuils par taille et par scénario : nombre de requêtes SQL (pire répétition) et durée médiane (ms).
+# Les durées sont larges (machines différentes) ; les requêtes, elles, ne doivent pas dériver.
+SEUILS = {
+    'petite': {
+        'classement': {'requetes': 14, 'ms': 200},
+        'mes_pronos': {'requetes': 8, 'ms': 100},
+        'pronostiquer': {'requetes': 25, 'ms': 200},
+        'import_csv': {'requetes': 40, 'ms': 500},
+        'import_users': {'requetes': 15, 'ms': 300},
+        'suppression': {'requetes': 40, 'ms': 200},
+    },
+    'moyenne': {
+        'classement': {'requetes': 14, 'ms': 500},
+        'mes_pronos': {'requetes': 8, 'ms': 300},
+        'pronostiquer': {'requetes': 25, 'ms': 300},
+        'import_csv': {'requetes': 60, 'ms': 3000},
+        'import_users': {'requetes': 15, 'ms': 1000},
+        'suppression': {'requetes': 45, 'ms': 1000},
+    },
+    'grande': {
+        'classement': {'requetes': 14, 'ms': 2000},
+        'mes_pronos': {'requetes': 8, 'ms': 1000},
+        'pronostiquer': {'requetes': 25, 'ms': 500},
+        'import_csv': {'requetes': 200, 'ms': 20000},
+        'import_users': {'requetes': 20, 'ms': 5000},
+        'suppression': {'requetes': 50, 'ms': 5000},
+    },
+}
+
+
+# -------------------------------
+# Mesure
+# -------------------------------
+class Mesure:
+    """Chronomètre et compteur de requêtes, cumulés sur les répétitions d'un scénario"""
+
+    def __init__(self):
+        self.durees = []
+        self.requetes = []
+
+    @contextlib.contextmanager
+    def __call__(self):
+        with CaptureQueriesContext(connection) as requetes:
+            debut = time.perf_counter()
+            yield
+            self.durees.append(time.perf_counter() - debut)
+        self.requetes.append(len(requetes))
+
+    def resultat(self):
+        return {
+            'repetitions': len(self.durees),
+            'requetes': max(self.requetes),
+            'ms_median': round(statistics.median(self.durees) * 1000, 2),
+            'ms_min': round(min(self.durees) * 1000, 2),
+            'ms_max': round(max(self.durees) * 1000, 2),
+        }
+
+
+@contextlib.contextmanager
+def base_jetable():
+    """Base de test créée pour la durée du bloc (les données réelles ne sont jamais touchées)"""
+    setup_test_environment(debug=False)
+    anciennes_bases = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(anciennes_bases, verbosity=0)
+        teardown_test_environment()
+
+
+# -------------------------------
+# Scénarios
+# -------------------------------
+# Chaque scénario prépare ses entrées hors chronomètre, lance une exécution de chauffe,
+# puis mesure `repetitions` exécutions dans `with mesure():`.
+
+def _client(joueur):
+    client = Client()
+    client.force_login(joueur)
+    return client
+
+
+def _page(nom):
+    def scenario(donnees, dossier, mesure, repetitions):
+        client = _client(donnees['joueurs'][0])
+        url = reverse(f'pronostics:{nom}')
+        for repetition in range(repetitions + 1):
+            cache.clear()  # Mesure du calcul de la page, pas du cache
+            with mesure() if repetition else contextlib.nullcontext():
+                response = client.get(url)
+            assert response.status_code == 200, response.status_code
+    return scenario
+
+
+def _pronostiquer(donnees, dossier, mesure, repetitions):
+    client = _client(donnees['joueurs'][0])
+    match = Match.objects.filter(saison=donnees['saison']).a_venir().first()
+    url = reverse('pronostics:pronostiquer', args=[match.id])
+    for repetition in range(repetitions + 1):
+        with mesure() if repetition else contextlib.nullcontext():
+            response = client.post(url, {'score_domicile': repetition % 5, 'score_exterieur': 1})
+        assert response.status_code == 302, response.status_code
+
+
+def _ecrire_matchs(chemin, lignes):
+    with open(chemin, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Saison', 'Journée', 'Equipe domicile', 'Equipe extérieure', 'Date', 'Heure', 'Score domicile', 'Score extérieur'])
+        writer.writerows(lignes)
+
+
+def _import_csv(donnees, dossier, mesure, repetitions):
+    """Réimport du calendrier complet avec les scores d'une journée corrigés à chaque répétition"""
+    chemin = os.path.join(dossier, 'matchs.csv')
+    lignes = []
+    for match in Match.objects.select_related('saison', 'equipe_domicile', 'equipe_exterieure').order_by('date'):
+        date = timezone.localtime(match.date)
+        lignes.append([
+            match.saison.annee, match.journee, match.equipe_domicile.nom, match.equipe_exterieure.nom,
+            date.strftime('%Y-%m-%d'), date.strftime('%H:%M'),
+            '' if match.score_domicile is None else match.score_domicile,
+            '' if match.score_exterieur is None else match.score_exterieur,
+        ])
+    annee = donnees['saison'].annee
+    derniere_jouee = max((int(l[1]) for l in lignes if l[0] == annee and l[6] != ''), default=None)
+    for repetition in range(repetitions + 1):
+        for ligne in lignes:
+            if ligne[0] == annee and int(ligne[1]) == derniere_jouee:
+                ligne[6] = repetition % 4
+        _ecrire_matchs(chemin, lignes)
+        with mesure() if repetition else contextlib.nullcontext(), contextlib.redirect_stdout(io.StringIO()):
+            import_csv(chemin)
+
+
+def _import_users(donnees, dossier, mesure, repetitions):
+    """Synchronisation de tous les joueurs, emails d'un joueur sur dix modifiés à chaque répétition"""
+    chemin = os.path.join(dossier, 'users.csv')
+    noms = list(User.objects.order_by('username').values_list('username', flat=True))
+    for repetition in range(repetitions + 1):
+        with open(chemin, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['username', 'email', 'first_name', 'last_name'])
+            for i, nom in enumerate(noms):
+                suffixe = f'+{repetition}' if i % 10 == 0 else ''
+                writer.writerow([nom, f'{nom}{suffixe}@exemple.fr', nom.capitalize(), 'Synthétique'])
+        with mesure() if repetition else contextlib.nullcontext(), contextlib.redirect_stdout(io.StringIO()):
+            import_users(chemin)
+
+
+def _suppression(donnees, dossier, mesure, repetitions):
+    """Suppression d'un match joué (et de tous ses pronostics), puis de dix joueurs : cascades en masse"""
+    matchs = list(Match.objects.filter(saison=donnees['saison'], score_domicile__isnull=False).order_by('-date')[:repetitions + 1])
+    for repetition, match in enumerate(matchs):
+        joueurs = User.objects.filter(pronostic__isnull=False).distinct().order_by('-id')[:10]
+        with mesure() if repetition else contextlib.nullcontext():
+            match.delete()
+            User.objects.filter(pk__in=list(joueurs.values_list('id', flat=True))).delete()
+
+
+SCENARIOS = {
+    'classement': _page('classement'),
+    'mes_pronos': _page('mes_pronos'),
+    'pronostiquer': _pronostiquer,
+    'import_csv': _import_csv,
+    'import_users': _import_users,
+    'suppression': _suppression,  # En dernier : les données des scénarios suivants seraient amputées
+}
+
+
+# -------------------------------
+# Exécution et comparaison
+# -------------------------------
+def mesurer(parametres, repetitions=5, scenarios=None):
+    """Génère le jeu de données `parametres` dans la base courante et mesure chaque scénario"""
+    donnees = generer_donnees(**parametres)
+    resultats = {'pronostics': donnees['pronostics'], 'scenarios': {}}
+    with tempfile.TemporaryDirectory() as dossier:
+        for nom in scenarios or SCENARIOS:
+            mesure = Mesure()
+            SCENARIOS[nom](donnees, dossier, mesure, repetitions)
+            resultats['scenarios'][nom] = mesure.resultat()
+    return resultats
+
+
+def executer_suite(tailles, repetitions=5, scenarios=None):
+    """Mesure chaque taille dans sa propre base jetable : {taille: résultats}"""
+    resultats = {}
+    for taille in tailles:
+        with base_jetable():
+            resultats[taille] = mesurer(TAILLES[taille], repetitions, scenarios)
+    return resultats
+
+
+def depassements(resultats, seuils=SEUILS, reference=None, tolerance=0.5):
+    """
+    Liste des dépassements : seuils absolus (requêtes, durée médiane) et, si une exécution de
+    référence est fournie, régression par rapport à elle (requêtes en plus, durée > référence × (1 + tolerance)).
+    """
+    messages = []
+    for taille, resultat in resultats.items():
+        for nom, mesure in resultat['scenarios'].items():
+            seuil = seuils.get(taille, {}).get(nom, {})
+            if 'requetes' in seuil and mesure['requetes'] > seuil['requetes']:
+                messages.append(f"{taille}/{nom} : {mesure['requetes']} requêtes (seuil {seuil['requetes']})")
+            if 'ms' in seuil and mesure['ms_median'] > seuil['ms']:
+                messages.append(f"{taille}/{nom} : {mesure['ms_median']} ms (seuil {seuil['ms']} ms)")
+
+            ancienne = (reference or {}).get(taille, {}).get('scenarios', {}).get(nom)
+            if ancienne is None:
+                continue
+            if mesure['requetes'] > ancienne['requetes']:
+                messages.append(f"{taille}/{nom} : {mesure['requetes']} requêtes (référence {ancienne['requetes']})")
+            if mesure['ms_median'] > ancienne['ms_median'] * (1 + tolerance):
+                messages.append(f"{taille}/{nom} : {mesure['ms_median']} ms (référence {ancienne['ms_median']} ms)")
+    return messages
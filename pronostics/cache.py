@@ -0,0 +1,197 @@
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from .models import Match
+
+# -------------------------------
+# Version des données
+# -------------------------------
+# Toute écriture qui change ce qu'affichent les pages (import de matchs ou d'utilisateurs,
+# pronostic enregistré) incrémente la version : les entrées de cache des versions
+# précédentes ne sont plus jamais lues et expirent d'elles-mêmes.
+CLE_VERSION = 'pronostics:version'
+CLE_MODIFICATION = 'pronostics:modification'
+CLE_STATS = 'pronostics:stats:{resultat}:{vue}'
+DUREE_PAR_DEFAUT = 600
+
+
+def version_donnees():
+    """Version courante des données (initialisée à 1)"""
+    version = cache.get(CLE_VERSION)
+    if version is None:
+        cache.add(CLE_VERSION, 1, timeout=None)
+        version = cache.get(CLE_VERSION, 1)
+    return version
+
+
+def date_modification():
+    """Horodatage (timestamp) de la dernière modification des données"""
+    horodatage = cache.get(CLE_MODIFICATION)
+    if horodatage is None:
+        horodatage = time.time()
+        cache.add(CLE_MODIFICATION, horodatage, timeout=None)
+    return horodatage
+
+
+def _incrementer():
+    try:
+        cache.incr(CLE_VERSION)
+    except ValueError:  # Clé absente (cache vidé ou expiré)
+        cache.add(CLE_VERSION, 1, timeout=None)
+    cache.set(CLE_MODIFICATION, time.time(), timeout=None)
+
+
+def incrementer_version():
+    """
+    Invalide le cache des pages. L'incrément est fait tout de suite, puis à nouveau au commit :
+    une page mise en cache entre les deux avec des données non encore validées est ainsi écartée.
+    """
+    _incrementer()
+    transaction.on_commit(_incrementer)
+
+
+# -------------------------------
+# Version d'une saison
+# -------------------------------
+# Pour les calculs coûteux d'une seule saison (projection.py) : ne change qu'avec les scores et
+# les pronostics de cette saison, pas à chaque écriture du site comme version_donnees().
+CLE_VERSION_SAISON = 'pronostics:saison:{saison}:version'
+
+
+def version_saison(saison_id):
+    """Version courante des scores et pronostics de la saison (initialisée à 1)"""
+    cle = CLE_VERSION_SAISON.format(saison=saison_id)
+    version = cache.get(cle)
+    if version is None:
+        cache.add(cle, 1, timeout=None)
+        version = cache.get(cle, 1)
+    return version
+
+
+def _incrementer_saison(saison_id):
+    cle = CLE_VERSION_SAISON.format(saison=saison_id)
+    try:
+        cache.incr(cle)
+    except ValueError:  # Clé absente (cache vidé ou expiré)
+        cache.add(cle, 1, timeout=None)
+
+
+def incrementer_version_saison(saison_id):
+    """Comme incrementer_version(), pour la seule saison `saison_id`"""
+    _incrementer_saison(saison_id)
+    transaction.on_commit(lambda: _incrementer_saison(saison_id))
+
+
+# -------------------------------
+# Compteurs de succès / échecs
+# -------------------------------
+def _compter(resultat, vue):
+    cle = CLE_STATS.format(resultat=resultat, vue=vue)
+    if not cache.add(cle, 1, timeout=None):
+        try:
+            cache.incr(cle)
+        except ValueError:
+            cache.set(cle, 1, timeout=None)
+
+
+def statistiques(vues):
+    """{vue: {'hit': n, 'miss': n}} pour les vues demandées"""
+    return {
+        vue: {resultat: cache.get(CLE_STATS.format(resultat=resultat, vue=vue), 0) for resultat in ('hit', 'miss')}
+        for vue in vues
+    }
+
+
+VUES_EN_CACHE = []
+
+
+# -------------------------------
+# Cache de vues complètes
+# -------------------------------
+def _duree(duree, prochain):
+    """Durée de vie bornée par le prochain coup d'envoi : la page change alors sans nouvelle donnée"""
+    if prochain is None:
+        return duree
+    return max(1, min(duree, int((prochain - timezone.now()).total_seconds()) + 1))
+
+
+def cache_vue(par_utilisateur=False, duree=None):
+    """
+    Met en cache la réponse d'une vue GET, clé : chemin, paramètres, version des données
+    (et utilisateur pour les pages personnelles). Accepte aussi les vues async.
+    """
+    def decorateur(vue):
+        nom = vue.__name__
+        if nom not in VUES_EN_CACHE:  # Les versions sync et async d'une vue partagent leurs compteurs
+            VUES_EN_CACHE.append(nom)
+
+        def lire(request, user):
+            cle = f"pronostics:vue:{nom}:v{version_donnees()}:{request.get_full_path()}"
+            if par_utilisateur:
+                cle += f":u{user.pk}"
+            en_cache = cache.get(cle)
+            if en_cache is None:
+                _compter('miss', nom)
+                return cle, None
+            _compter('hit', nom)
+            contenu, content_type = en_cache
+            return cle, HttpResponse(contenu, content_type=content_type)
+
+        def a_mettre_en_cache(response):
+            return response.status_code == 200 and not getattr(response, 'streaming', False)
+
+        def ecrire(cle, response, prochain):
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            timeout = _duree(duree or getattr(settings, 'PRONOSTICS_CACHE_DUREE', DUREE_PAR_DEFAUT), prochain)
+            cache.set(cle, (response.content, response['Content-Type']), timeout)
+
+        if iscoroutinefunction(vue):
+            # Accès au cache hors de la boucle (comme direct.py) : avec le cache en fichiers conseillé
+            # sous ASGI, chaque lecture ou écriture sur disque bloquerait toutes les connexions
+            alire = sync_to_async(lire, thread_sensitive=False)
+            aecrire = sync_to_async(ecrire, thread_sensitive=False)
+
+            @wraps(vue)
+            async def wrapper(request, *args, **kwargs):
+                if request.method != 'GET':
+                    return await vue(request, *args, **kwargs)
+                cle, response = await alire(request, await request.auser() if par_utilisateur else None)
+                if response is None:
+                    response = await vue(request, *args, **kwargs)
+                    if a_mettre_en_cache(response):
+                        await aecrire(cle, response, await Match.objects.a_venir().values_list('date', flat=True).afirst())
+                return response
+            return wrapper
+
+        @wraps(vue)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return vue(request, *args, **kwargs)
+            cle, response = lire(request, request.user)
+            if response is None:
+                response = vue(request, *args, **kwargs)
+                if a_mettre_en_cache(response):
+                    ecrire(cle, response, Match.objects.a_venir().values_list('date', flat=True).first())
+            return response
+        return wrapper
+    return decorateur
+
+
+# -------------------------------
+# Contexte des templates (cache de fragments)
+# -------------------------------
+def version(request):
+    """
+    Expose `version_donnees` aux templates : {% cache 600 nom version_donnees %}. Lue seulement si le
+    template s'en sert : les pages des vues async ne lisent pas le cache dans la boucle.
+    """
+    return {'version_donnees': SimpleLazyObject(version_donnees)}
@@ -0,0 +1,342 @@
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum, Window
+from django.db.models.functions import Coalesce, Rank
+from django.shortcuts import aget_object_or_404, get_object_or_404
+
+from . import direct
+from .cache import incrementer_version, incrementer_version_saison
+from .models import Classement, ClassementJournee, Match, Pronostic, Saison
+from .referentiel import invalider
+
+# -------------------------------
+# Saison courante
+# -------------------------------
+def saison_courante():
+    """Retourne la saison la plus récente (les années "2025-2026" se trient naturellement)"""
+    return Saison.objects.order_by('-annee').first()
+
+
+async def asaison_courante():
+    """Version async de saison_courante()"""
+    return await Saison.objects.order_by('-annee').afirst()
+
+
+def saison_demandee(request):
+    """Saison choisie par le paramètre ?saison=2024-2025 (404 si inconnue), sinon la saison courante"""
+    if request.GET.get('saison'):
+        return get_object_or_404(Saison, annee=request.GET['saison'])
+    return saison_courante()
+
+
+async def asaison_demandee(request):
+    """Version async de saison_demandee()"""
+    if request.GET.get('saison'):
+        return await aget_object_or_404(Saison, annee=request.GET['saison'])
+    return await asaison_courante()
+
+
+def _est_archivee(saison_id):
+    return Saison.objects.filter(pk=saison_id, archivee=True).exists()
+
+
+# -------------------------------
+# Calcul des statistiques
+# -------------------------------
+def _derniere_journee(saison_id):
+    """Numéro de la dernière journée ayant au moins un match joué"""
+    return Match.objects.filter(
+        saison_id=saison_id,
+        score_domicile__isnull=False,
+        score_exterieur__isnull=False,
+    ).aggregate(derniere=Max('journee'))['derniere']
+
+
+def _statistiques(saison_id, user_id=None):
+    """
+    Calcule points, scores exacts, bons résultats et points de la dernière journée
+    pour chaque utilisateur de la saison (ou pour un seul utilisateur), en un seul GROUP BY.
+    """
+    derniere_journee = _derniere_journee(saison_id)
+    pronos = Pronostic.objects.filter(match__saison_id=saison_id)
+    if user_id is not None:
+        pronos = pronos.filter(user_id=user_id)
+
+    # Les points enregistrés sont à jour (réécrits à chaque changement de score)
+    lignes = pronos.values('user_id').order_by().annotate(
+        total=Coalesce(Sum('points'), 0),
+        exacts=Count('id', filter=Q(points=5)),
+        bons=Count('id', filter=Q(points__in=(3, 4))),
+        derniere=Coalesce(Sum('points', filter=Q(match__journee=derniere_journee)), 0),
+    )
+    return {
+        ligne['user_id']: {
+            'points': ligne['total'],
+            'scores_exacts': ligne['exacts'],
+            'bons_resultats': ligne['bons'],
+            'points_derniere_journee': ligne['derniere'],
+        }
+        for ligne in lignes
+    }
+
+
+# -------------------------------
+# Intégration des résultats
+# -------------------------------
+def rescorer_matchs(match_ids):
+    """
+    Réécrit en une requête les points enregistrés des pronostics des matchs dont le score a changé.
+    Les photos de leur journée et des suivantes sont effacées : mettre_a_jour_saison() les réécrit.
+    """
+    if not match_ids:
+        return 0
+    # Un score corrigé, ou un match reporté qui termine une journée passée, change le cumul
+    # de sa journée et de toutes celles d'après
+    invalider_photos(
+        Match.objects.filter(id__in=match_ids).values_list('saison_id').order_by().annotate(journee=Min('journee'))
+    )
+    direct.signaler(matchs=match_ids)
+    return Pronostic.objects.filter(match_id__in=match_ids).recalculer_points()
+
+
+# -------------------------------
+# Mise à jour du classement
+# -------------------------------
+def _avec_rangs(lignes):
+    """Associe un rang à chaque ligne, déjà triée par points décroissants (ex aequo au même rang)"""
+    rang = 0
+    points_precedents = None
+    for position, ligne in enumerate(lignes, start=1):
+        if ligne.points != points_precedents:
+            rang = position
+            points_precedents = ligne.points
+        yield ligne, rang
+
+
+def recalculer_rangs(saison_id):
+    """
+    Attribue les rangs de la saison en SQL (RANK() OVER : ex aequo au même rang) ;
+    seules les lignes dont le rang change sont lues puis écrites.
+    """
+    modifiees = list(
+        Classement.objects.filter(saison_id=saison_id)
+        .annotate(rang_calcule=Window(Rank(), order_by=F('points').desc()))
+        .exclude(rang=F('rang_calcule'))
+        .only('id', 'rang')
+    )
+    for ligne in modifiees:
+        ligne.rang = ligne.rang_calcule
+    Classement.objects.bulk_update(modifiees, ['rang'], batch_size=500)
+
+
+CHAMPS_STATISTIQUES = ['points', 'scores_exacts', 'bons_resultats', 'points_derniere_journee']
+
+
+def mettre_a_jour_utilisateur(user_id, saison_id):
+    """Recalcule la ligne de classement d'un utilisateur puis les rangs de la saison"""
+    if _est_archivee(saison_id):  # Pronostics résumés puis supprimés : le classement est définitif
+        return
+    # Plus aucun pronostic (supprimés) : ligne remise à zéro, comme dans mettre_a_jour_saison()
+    stats = _statistiques(saison_id, user_id=user_id).get(user_id, dict.fromkeys(CHAMPS_STATISTIQUES, 0))
+    Classement.objects.update_or_create(user_id=user_id, saison_id=saison_id, defaults=stats)
+    recalculer_rangs(saison_id)
+    incrementer_version_saison(saison_id)
+    direct.signaler(saison_id)
+
+
+def mettre_a_jour_saison(saison_id):
+    """Recalcule toutes les lignes de classement d'une saison (après un changement de score)"""
+    if _est_archivee(saison_id):
+        return
+    stats = _statistiques(saison_id)
+    existantes = {c.user_id: c for c in Classement.objects.filter(saison_id=saison_id)}
+
+    champs = CHAMPS_STATISTIQUES
+    a_creer = []
+    a_modifier = []
+    vide = dict.fromkeys(champs, 0)
+    for user_id in stats.keys() | existantes.keys():
+        ligne = stats.get(user_id, vide)
+        classement = existantes.get(user_id)
+        if classement is None:
+            a_creer.append(Classement(user_id=user_id, saison_id=saison_id, **ligne))
+        elif any(getattr(classement, champ) != ligne[champ] for champ in champs):
+            for champ in champs:
+                setattr(classement, champ, ligne[champ])
+            a_modifier.append(classement)
+
+    Classement.objects.bulk_create(a_creer)
+    Classement.objects.bulk_update(a_modifier, champs)
+    recalculer_rangs(saison_id)
+    photographier_journees(saison_id)
+    incrementer_version_saison(saison_id)
+    direct.signaler(saison_id)
+
+
+def recalculer_au_commit(saison_ids=None, rangs_seulement=False, photos=()):
+    """
+    Après une suppression (pronostics, matchs, utilisateurs) : chaque saison concernée est recalculée
+    une fois, au commit, quel que soit le nombre de lignes supprimées. None : toutes les saisons non
+    archivées. `photos` : positions (saison_id, journée) des matchs supprimés, voir invalider_photos().
+    `saison_ids` et `photos` peuvent être complétés jusqu'au commit (signaux d'une même suppression).
+    """
+    def recalculer():
+        saisons = Saison.objects.filter(archivee=False)
+        if saison_ids is not None:
+            saisons = saisons.filter(id__in=saison_ids)
+        with transaction.atomic():
+            invalider_photos(photos)
+            for saison_id in saisons.values_list('id', flat=True):
+                if rangs_seulement:  # Lignes supprimées : seuls les rangs des autres joueurs changent
+                    recalculer_rangs(saison_id)
+                else:
+                    mettre_a_jour_saison(saison_id)
+            incrementer_version()
+    transaction.on_commit(recalculer)
+
+
+# -------------------------------
+# Lecture du classement
+# -------------------------------
+# Ordre d'affichage : rang (ex aequo au même rang), puis scores exacts et nom pour départager l'affichage
+ORDRE_CLASSEMENT = ('rang', '-scores_exacts', 'username')
+
+
+def lignes_classement(saison_id):
+    """Lignes du classement d'une saison (dictionnaires), dans l'ordre d'affichage"""
+    return Classement.objects.filter(saison_id=saison_id).values(
+        'user_id', 'rang', 'points', 'scores_exacts', 'bons_resultats', 'points_derniere_journee',
+        username=F('user__username'),
+    ).order_by(*ORDRE_CLASSEMENT)
+
+
+def _voisins(saison_id, moi):
+    """Requêtes des lignes avant (ordre inverse) et après `moi`, bornées par l'index (saison, rang)"""
+    rang, exacts, nom = moi['rang'], moi['scores_exacts'], moi['username']
+    avant = Q(rang__lt=rang) | Q(rang=rang, scores_exacts__gt=exacts) | Q(rang=rang, scores_exacts=exacts, username__lt=nom)
+    apres = Q(rang__gt=rang) | Q(rang=rang, scores_exacts__lt=exacts) | Q(rang=rang, scores_exacts=exacts, username__gt=nom)
+    lignes = lignes_classement(saison_id)
+    return lignes.filter(avant).order_by('-rang', 'scores_exacts', '-username'), lignes.filter(apres)
+
+
+def autour_de(user_id, saison_id, n=5):
+    """
+    Ligne de l'utilisateur et ses n voisins de chaque côté, dans l'ordre d'affichage :
+    trois petites requêtes, sans charger le classement complet. Liste vide si l'utilisateur n'est pas classé.
+    """
+    moi = lignes_classement(saison_id).filter(user_id=user_id).first()
+    if moi is None:
+        return []
+    avant, apres = _voisins(saison_id, moi)
+    return list(avant[:n])[::-1] + [moi] + list(apres[:n])
+
+
+async def aautour_de(user_id, saison_id, n=5):
+    """Version async de autour_de()"""
+    moi = await lignes_classement(saison_id).filter(user_id=user_id).afirst()
+    if moi is None:
+        return []
+    avant, apres = _voisins(saison_id, moi)
+    return [l async for l in avant[:n]][::-1] + [moi] + [l async for l in apres[:n]]
+
+
+# -------------------------------
+# Photos du classement par journée
+# -------------------------------
+def journees_terminees(saison_id):
+    """Numéros des journées de la saison dont tous les matchs ont un score"""
+    journees = Match.objects.filter(saison_id=saison_id).values('journee').order_by('journee').annotate(
+        total=Count('id'),
+        joues=Count('id', filter=Q(score_domicile__isnull=False, score_exterieur__isnull=False)),
+    )
+    return [j['journee'] for j in journees if j['joues'] == j['total']]
+
+
+def invalider_photos(positions):
+    """
+    Efface les photos de chaque saison à partir de la première journée touchée, positions
+    (saison_id, journée) : score modifié, match déplacé (ancienne et nouvelle position) ou supprimé.
+    mettre_a_jour_saison() les réécrit. Saisons archivées : photos définitives.
+    """
+    premieres = {}
+    for saison_id, journee in positions:
+        premieres[saison_id] = min(journee, premieres.get(saison_id, journee))
+    if not premieres:
+        return
+    archivees = set(Saison.objects.filter(id__in=premieres, archivee=True).values_list('id', flat=True))
+    for saison_id, journee in premieres.items():
+        if saison_id not in archivees:
+            ClassementJournee.objects.filter(saison_id=saison_id, journee__gte=journee).delete()
+
+
+def photographier_journees(saison_id, journees=None):
+    """
+    Enregistre le classement cumulé de la saison à la fin de chaque journée demandée
+    (remplace les photos existantes). Par défaut : les journées terminées sans photo, écrites
+    une fois puis à nouveau si invalider_photos() les efface. Une seule agrégation par (utilisateur, journée).
+    """
+    if journees is None:
+        # order_by() : l'ordre par défaut (saison, journée, rang) entrerait dans le DISTINCT, une ligne par rang
+        deja_faites = set(
+            ClassementJournee.objects.filter(saison_id=saison_id).order_by().values_list('journee', flat=True).distinct()
+        )
+        journees = [j for j in journees_terminees(saison_id) if j not in deja_faites]
+    if not journees:
+        return
+    journees = sorted(journees)
+
+    # Points par utilisateur et par journée, jusqu'à la dernière journée demandée
+    points = {}
+    for ligne in Pronostic.objects.filter(match__saison_id=saison_id, match__journee__lte=journees[-1]).values(
+        'user_id', 'match__journee'
+    ).order_by().annotate(total=Sum('points')):
+        points.setdefault(ligne['user_id'], {})[ligne['match__journee']] = ligne['total'] or 0
+
+    photos = []
+    for journee in journees:
+        photos_journee = [
+            ClassementJournee(
+                user_id=user_id, saison_id=saison_id, journee=journee,
+                points=sum(pts for j, pts in par_journee.items() if j <= journee),
+                points_journee=par_journee.get(journee, 0),
+            )
+            for user_id, par_journee in points.items()
+            if min(par_journee) <= journee
+        ]
+        photos_journee.sort(key=lambda photo: (-photo.points, photo.user_id))
+        for photo, rang in _avec_rangs(photos_journee):
+            photo.rang = rang
+        photos.extend(photos_journee)
+
+    ClassementJournee.objects.filter(saison_id=saison_id, journee__in=journees).delete()
+    ClassementJournee.objects.bulk_create(photos, batch_size=500)
+
+
+# -------------------------------
+# Archivage d'une saison terminée
+# -------------------------------
+class SaisonNonTerminee(ValueError):
+    pass
+
+
+@transaction.atomic
+def archiver_saison(saison_id):
+    """
+    Résume une saison terminée puis supprime ses pronostics : le classement (Classement) et les
+    photos par journée (ClassementJournee) sont mis à jour une dernière fois et restent consultables,
+    les requêtes des saisons suivantes ne parcourent plus ces lignes. Retourne le nombre de pronostics supprimés.
+    """
+    if _est_archivee(saison_id):
+        return 0
+    if Match.objects.filter(saison_id=saison_id).filter(
+        Q(score_domicile__isnull=True) | Q(score_exterieur__isnull=True)
+    ).exists():
+        raise SaisonNonTerminee("La saison a encore des matchs sans score")
+
+    mettre_a_jour_saison(saison_id)
+    photographier_journees(saison_id, journees_terminees(saison_id))
+    # Archivée avant la suppression : les signaux de suppression ne recalculent plus ce classement définitif
+    Saison.objects.filter(pk=saison_id).update(archivee=True)
+    supprimes, _ = Pronostic.objects.filter(match__saison_id=saison_id).delete()
+    invalider()  # update() n'envoie pas post_save : le référentiel des saisons est à recharger
+    incrementer_version()
+    return supprimes
@@ -0,0 +1,90 @@
+import random
+import time
+from functools import wraps
+
+from django.db import OperationalError, transaction
+from django.utils import timezone
+
+from .cache import incrementer_version
+from .classement import mettre_a_jour_utilisateur
+from .models import Classement, Pronostic
+
+# -------------------------------
+# Écritures courtes avec nouvelle tentative sur verrou
+# -------------------------------
+TENTATIVES = 8
+DELAI_INITIAL = 0.05  # secondes, doublé à chaque tentative
+
+
+def _est_verrou(erreur):
+    message = str(erreur).lower()
+    return 'locked' in message or 'busy' in message or 'could not serialize' in message
+
+
+def reessayer_si_verrou(fonction=None, *, tentatives=TENTATIVES, delai=DELAI_INITIAL):
+    """
+    Exécute la fonction dans sa propre transaction (courte) et la relance si la base est
+    verrouillée par un autre écrivain ("database is locked"), avec un délai croissant.
+    """
+    def decorateur(fonction):
+        @wraps(fonction)
+        def wrapper(*args, **kwargs):
+            for tentative in range(1, tentatives + 1):
+                try:
+                    with transaction.atomic():
+                        return fonction(*args, **kwargs)
+                except OperationalError as e:
+                    # Dans une transaction englobante, la relance est impossible : l'erreur remonte
+                    if tentative == tentatives or not _est_verrou(e) or transaction.get_connection().in_atomic_block:
+                        raise
+                    time.sleep(delai * 2 ** (tentative - 1) * (1 + random.random()))
+        return wrapper
+    return decorateur(fonction) if fonction else decorateur
+
+
+@reessayer_si_verrou
+def enregistrer_pronostic(user, match, score_domicile, score_exterieur):
+    """Crée ou met à jour le pronostic de l'utilisateur sur le match"""
+    pronostic, _ = Pronostic.objects.update_or_create(
+        user=user, match=match,
+        defaults={'score_domicile': score_domicile, 'score_exterieur': score_exterieur},
+    )
+    return pronostic
+
+
+@reessayer_si_verrou
+def enregistrer_pronostics(user, scores):
+    """
+    Crée ou met à jour en une transaction les pronostics {match: (domicile, extérieur)} de l'utilisateur.
+    Les matchs déjà commencés ou verrouillés au moment de l'écriture sont ignorés. Retourne le nombre de pronostics écrits.
+    """
+    maintenant = timezone.now()
+    ouverts = {match.pk: match for match in scores if match.can_pronostiquer(maintenant)}
+    existants = {
+        match_id: (domicile, exterieur)
+        for match_id, domicile, exterieur in Pronostic.objects.filter(user=user, match_id__in=ouverts).values_list(
+            'match_id', 'score_domicile', 'score_exterieur'
+        )
+    }
+
+    a_ecrire = []
+    for match_id, match in ouverts.items():
+        domicile, exterieur = scores[match]
+        if existants.get(match_id) != (domicile, exterieur):  # Pronostic inchangé : rien à écrire
+            a_ecrire.append(Pronostic(user=user, match=match, score_domicile=domicile, score_exterieur=exterieur))
+    if not a_ecrire:
+        return 0
+
+    # Une seule requête INSERT ... ON CONFLICT : une autre soumission de la même journée (double clic,
+    # deuxième onglet) peut avoir créé le pronostic depuis la lecture, il est alors mis à jour.
+    # Matchs non joués : les points restent à 0, pas besoin de passer par Pronostic.save()
+    Pronostic.objects.bulk_create(
+        a_ecrire, update_conflicts=True, unique_fields=['user', 'match'], update_fields=['score_domicile', 'score_exterieur'],
+    )
+
+    # Les écritures en masse ne déclenchent pas les signaux : l'utilisateur doit apparaître au classement
+    for saison_id in {match.saison_id for match in ouverts.values()}:
+        if not Classement.objects.filter(user=user, saison_id=saison_id).exists():
+            mettre_a_jour_utilisateur(user.pk, saison_id)
+    incrementer_version()
+    return len(a_ecrire)
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import Classement, Match
+
+journal = logging.getLogger('pronostics.direct')
+
+# -------------------------------
+# Classement en direct (Server-Sent Events, sous ASGI)
+# -------------------------------
+# Les soirs de match, les joueurs rechargeaient le classement en boucle en attendant l'import des scores.
+# Chaque page ouverte garde désormais une connexion (views_async.direct) qui reçoit les changements :
+# - Les écritures du classement (classement.py) appellent signaler() ; l'avis part au commit.
+# - Dans chaque processus serveur, une seule tâche (Diffuseur) lit les avis, calcule une fois les scores
+#   et les lignes de classement modifiés, et pousse le même message à tous les abonnés de la saison.
+#   Une connexion inactive ne coûte qu'une file d'attente, sans requête ni rendu de page.
+# - Entre processus (PRONOSTICS_DIRECT_RELAIS) : les avis sont aussi déposés dans le cache, relu chaque
+#   seconde par les diffuseurs. Le cache tient lieu de courtier : il doit être commun aux processus
+#   (CACHE_BACKEND=fichier), comme pour le référentiel, pour recevoir les imports de watch_imports.
+CLE_SEQUENCE = 'pronostics:direct:sequence'
+CLE_AVIS = 'pronostics:direct:avis:{numero}'
+DUREE_AVIS = 300  # Secondes de conservation d'un avis dans le cache
+AVIS_RELAYES_MAX = 100  # Retard plus grand : classement entier rediffusé
+INTERVALLE_RELAIS = 1.0  # Secondes entre deux lectures du cache
+ENTRETIEN = 15  # Secondes sans événement avant un commentaire SSE (connexion gardée ouverte par les proxys)
+RECONNEXION_MS = 5000
+TAILLE_FILE = 100  # Messages en attente par abonné ; au-delà, l'abonné trop lent est déconnecté et se reconnecte
+
+
+def _relais():
+    return getattr(settings, 'PRONOSTICS_DIRECT_RELAIS', True)
+
+
+def _origine():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+# -------------------------------
+# Publication (n'importe quel processus, n'importe quel thread)
+# -------------------------------
+def signaler(saison_id=None, matchs=()):
+    """Annonce, au commit, un classement (saison_id) ou des scores (ids de matchs) modifiés"""
+    avis = {'saisons': [] if saison_id is None else [saison_id], 'matchs': list(matchs)}
+    transaction.on_commit(lambda: publier(avis))
+
+
+def publier(avis):
+    diffuseur.recevoir(avis)
+    if not _relais():
+        return
+    # Appelé au commit : les données sont écrites, un relais en panne ne doit pas transformer l'écriture en erreur
+    try:
+        _relayer(avis)
+    except Exception:
+        journal.exception("Relais du classement en direct")
+
+
+def _relayer(avis):
+    try:
+        numero = cache.incr(CLE_SEQUENCE)
+    except ValueError:  # Clé absente (cache vidé ou expiré, ou DummyCache)
+        numero = 1
+        cache.add(CLE_SEQUENCE, numero, timeout=None)
+    cache.set(CLE_AVIS.format(numero=numero), {**avis, 'origine': _origine()}, DUREE_AVIS)
+
+
+def _avis_relayes(dernier):
+    """
+    Avis déposés par les autres processus depuis le numéro `dernier` : (nouveau numéro, avis).
+    Un avis perdu (expiré, cache vidé, lu avant d'être écrit) devient None : tout est rediffusé.
+    """
+    numero = cache.get(CLE_SEQUENCE, 0)
+    if numero == dernier:
+        return dernier, []
+    if numero < dernier or numero - dernier > AVIS_RELAYES_MAX:
+        return numero, [None]
+    cles = [CLE_AVIS.format(numero=n) for n in range(dernier + 1, numero + 1)]
+    trouves = cache.get_many(cles)
+    origine = _origine()
+    avis = [trouves.get(cle) for cle in cles]
+    return numero, [a for a in avis if a is None or a['origine'] != origine]
+
+
+# -------------------------------
+# Diffusion (boucle asyncio du serveur)
+# -------------------------------
+def _message(evenement, donnees):
+    return f"event: {evenement}\ndata: {json.dumps(donnees, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+
+async def _photo(saison_id):
+    """{user_id: ligne} : dernier état du classement envoyé aux abonnés de la saison"""
+    return {
+        ligne['user_id']: ligne
+        async for ligne in Classement.objects.filter(saison_id=saison_id).values(
+            'user_id', 'rang', 'points', username=F('user__username'),
+        )
+    }
+
+
+class Diffuseur:
+    """Abonnés par saison et tâche de diffusion ; toutes les méthodes, sauf recevoir(), dans la boucle du serveur"""
+
+    def __init__(self):
+        self._boucle = None
+        self._avis = None
+        self._tache = None
+        self.abonnes = {}  # saison_id -> files des connexions ouvertes
+        self.photos = {}  # saison_id -> {user_id: ligne}
+
+    def recevoir(self, avis):
+        """Transmet un avis à la tâche de diffusion (appelable depuis n'importe quel thread)"""
+        boucle = self._boucle
+        if boucle is None or boucle.is_closed():
+            return  # Aucun abonné dans ce processus (commande, WSGI)
+        try:
+            boucle.call_soon_threadsafe(self._avis.put_nowait, avis)
+        except RuntimeError:  # Boucle fermée entre-temps
+            pass
+
+    async def abonner(self, saison_id):
+        boucle = asyncio.get_running_loop()
+        if self._boucle is not boucle:  # Premier abonné du processus (ou nouvelle boucle)
+            self._boucle, self._avis, self._tache = boucle, asyncio.Queue(), None
+            self.abonnes, self.photos = {}, {}
+        if saison_id not in self.photos:
+            self.photos[saison_id] = await _photo(saison_id)
+        file = asyncio.Queue(TAILLE_FILE + 1)  # + 1 : place pour le None de déconnexion
+        self.abonnes.setdefault(saison_id, set()).add(file)
+        if self._tache is None or self._tache.done():
+            self._tache = boucle.create_task(self._diffuser())
+        return file
+
+    def desabonner(self, saison_id, file):
+        files = self.abonnes.get(saison_id)
+        if files is None:
+            return
+        files.discard(file)
+        if not files:  # Plus personne : la photo ne serait plus tenue à jour
+            del self.abonnes[saison_id]
+            self.photos.pop(saison_id, None)
+
+    async def _diffuser(self):
+        # Cache lu hors de la boucle : un cache en fichiers (ou réseau) bloquerait toutes les connexions
+        dernier = await sync_to_async(cache.get, thread_sensitive=False)(CLE_SEQUENCE, 0) if _relais() else None
+        while self.abonnes:  # S'arrête avec le dernier abonné ; abonner() la relance
+            try:
+                avis = [await asyncio.wait_for(self._avis.get(), INTERVALLE_RELAIS)]
+            except asyncio.TimeoutError:
+                avis = []
+            while not self._avis.empty():  # Rafale (import) : un seul calcul
+                avis.append(self._avis.get_nowait())
+            if dernier is not None:
+                try:
+                    dernier, relayes = await sync_to_async(_avis_relayes, thread_sensitive=False)(dernier)
+                    avis += relayes
+                except Exception:
+                    journal.exception("Lecture du relais du classement en direct")
+            if avis and self.abonnes:
+                try:
+                    await self._traiter(avis)
+                except Exception:
+                    journal.exception("Diffusion du classement en direct")
+
+    async def _traiter(self, avis):
+        saisons, match_ids = set(), set()
+        for a in avis:
+            if a is None:
+                saisons.update(self.abonnes)
+            else:
+                saisons.update(a['saisons'])
+                match_ids.update(a['matchs'])
+
+        messages = defaultdict(list)
+        if match_ids:
+            scores = Match.objects.filter(id__in=match_ids, saison_id__in=list(self.abonnes)).values(
+                'id', 'saison_id', 'journee', 'score_domicile', 'score_exterieur',
+                domicile=F('equipe_domicile__nom'), exterieur=F('equipe_exterieure__nom'),
+            ).order_by('date', 'id')
+            async for match in scores:
+                saison_id = match.pop('saison_id')
+                messages[saison_id].append(_message('score', match))
+                saisons.add(saison_id)
+
+        for saison_id in saisons:
+            if saison_id not in self.abonnes:
+                continue
+            ancienne, nouvelle = self.photos.get(saison_id, {}), await _photo(saison_id)
+            if saison_id not in self.abonnes:  # Dernier abonné parti pendant la lecture
+                continue
+            self.photos[saison_id] = nouvelle
+            lignes = [l for user_id, l in nouvelle.items() if ancienne.get(user_id) != l]
+            retires = [user_id for user_id in ancienne if user_id not in nouvelle]
+            if lignes or retires:
+                lignes.sort(key=lambda l: (l['rang'], l['username']))
+                messages[saison_id].append(_message('classement', {'lignes': lignes, 'retires': retires}))
+
+        for saison_id, a_envoyer in messages.items():
+            for file in list(self.abonnes.get(saison_id, ())):
+                for message in a_envoyer:
+                    if file.qsize() >= TAILLE_FILE:
+                        file.put_nowait(None)
+                        self.desabonner(saison_id, file)
+                        break
+                    file.put_nowait(message)
+
+
+diffuseur = Diffuseur()
+
+
+async def flux(saison_id):
+    """Contenu d'une réponse text/event-stream : messages de la saison jusqu'à la déconnexion du client"""
+    file = await diffuseur.abonner(saison_id)
+    try:
+        yield f'retry: {RECONNEXION_MS}\n\n'
+        while True:
+            try:
+                message = await asyncio.wait_for(file.get(), ENTRETIEN)
+            except asyncio.TimeoutError:
+                message = ': entretien\n\n'
+            if message is None:  # Client trop lent : il se reconnectera
+                return
+            yield message
+    finally:
+        diffuseur.desabonner(saison_id, file)
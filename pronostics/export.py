@@ -0,0 +1,91 @@
+import csv
+import io
+
+# -------------------------------
+# Export CSV
+# -------------------------------
+def exporter_csv(entetes, lignes):
+    """Retourne le contenu CSV (texte) d'un tableau"""
+    sortie = io.StringIO()
+    writer = csv.writer(sortie)
+    writer.writerow(entetes)
+    writer.writerows(lignes)
+    return sortie.getvalue()
+
+
+# -------------------------------
+# Export PDF
+# -------------------------------
+# Générateur PDF minimal (police Helvetica standard, pas de dépendance externe) :
+# suffisant pour publier un tableau de classement.
+LARGEUR_PAGE = 595  # A4 en points
+HAUTEUR_PAGE = 842
+MARGE = 40
+INTERLIGNE = 16
+TAILLE_POLICE = 10
+
+
+def _texte_pdf(valeur):
+    """Échappe une chaîne pour un littéral PDF (encodage WinAnsi pour les accents)"""
+    texte = str(valeur).encode('cp1252', errors='replace')
+    return texte.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _contenu_page(titre, entetes, lignes, colonnes):
+    instructions = []
+
+    def ecrire(x, y, valeur, police='F1', taille=TAILLE_POLICE):
+        instructions.append(b'BT /%s %d Tf %d %d Td (%s) Tj ET' % (police.encode(), taille, x, y, _texte_pdf(valeur)))
+
+    y = HAUTEUR_PAGE - MARGE
+    ecrire(MARGE, y, titre, police='F2', taille=14)
+    y -= 2 * INTERLIGNE
+    for x, entete in zip(colonnes, entetes):
+        ecrire(x, y, entete, police='F2')
+    for ligne in lignes:
+        y -= INTERLIGNE
+        for x, valeur in zip(colonnes, ligne):
+            ecrire(x, y, valeur)
+    return b'\n'.join(instructions)
+
+
+def exporter_pdf(titre, entetes, lignes):
+    """Retourne le contenu PDF (octets) d'un tableau, paginé automatiquement"""
+    largeur_colonne = (LARGEUR_PAGE - 2 * MARGE) // max(len(entetes), 1)
+    colonnes = [MARGE + i * largeur_colonne for i in range(len(entetes))]
+    par_page = (HAUTEUR_PAGE - 2 * MARGE) // INTERLIGNE - 3
+    lignes = list(lignes)
+    pages = [lignes[i:i + par_page] for i in range(0, len(lignes), par_page)] or [[]]
+
+    # Objets : 1 catalogue, 2 arbre des pages, 3-4 polices, puis (page, contenu) par page
+    objets = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+    ]
+    kids = []
+    for numero, lignes_page in enumerate(pages, start=1):
+        suffixe = f" ({numero}/{len(pages)})" if len(pages) > 1 else ""
+        contenu = _contenu_page(titre + suffixe, entetes, lignes_page, colonnes)
+        page_id = len(objets) + 1
+        kids.append(b'%d 0 R' % page_id)
+        objets.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+            % (LARGEUR_PAGE, HAUTEUR_PAGE, page_id + 1)
+        )
+        objets.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(contenu), contenu))
+    objets[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), len(kids))
+
+    sortie = io.BytesIO()
+    sortie.write(b'%PDF-1.4\n')
+    positions = []
+    for numero, objet in enumerate(objets, start=1):
+        positions.append(sortie.tell())
+        sortie.write(b'%d 0 obj\n%s\nendobj\n' % (numero, objet))
+    debut_xref = sortie.tell()
+    sortie.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objets) + 1))
+    for position in positions:
+        sortie.write(b'%010d 00000 n \n' % position)
+    sortie.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objets) + 1, debut_xref))
+    return sortie.getvalue()
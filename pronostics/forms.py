@@ -13,6 +13,31 @@ class PronosticForm(forms.ModelForm):
             'score_exterieur': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Score extérieur'}),
         }
 
+# Formulaire de pronostic d'un match dans la saisie par journée (préfixé par l'id du match)
+class PronosticJourneeForm(forms.Form):
+    score_domicile = forms.IntegerField(
+        required=False, min_value=0,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Dom.'}),
+    )
+    score_exterieur = forms.IntegerField(
+        required=False, min_value=0,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Ext.'}),
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        domicile = cleaned_data.get('score_domicile')
+        exterieur = cleaned_data.get('score_exterieur')
+        if (domicile is None) != (exterieur is None) and not self.errors:
+            raise forms.ValidationError("Renseignez les deux scores, ou aucun.")
+        return cleaned_data
+
+    def scores(self):
+        """(domicile, extérieur) si le pronostic est renseigné, sinon None"""
+        if self.cleaned_data.get('score_domicile') is None:
+            return None
+        return self.cleaned_data['score_domicile'], self.cleaned_data['score_exterieur']
+
 # Formulaire de mise à jour utilisateur (email seulement)
 class UserUpdateForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,187 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+journal_requetes_lentes = logging.getLogger('pronostics.requetes_lentes')
+
+# -------------------------------
+# Mesure de la requête HTTP en cours
+# -------------------------------
+# Le collecteur est porté par une ContextVar : sous ASGI, l'ORM des vues async tourne dans un
+# autre thread (sync_to_async), qui hérite du contexte et donc du même collecteur.
+SEUIL_REQUETE_LENTE_MS = 200
+LONGUEUR_SQL_MAX = 500
+
+
+class MesureRequete:
+    """Requêtes SQL d'une requête HTTP : nombre, temps cumulé et durée de la plus lente"""
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.requetes = 0
+        self.duree_sql = 0.0
+        self.plus_lente = 0.0
+
+
+_mesure_en_cours = ContextVar('pronostics_mesure_en_cours', default=None)
+
+
+def chronometrer_sql(execute, sql, params, many, context):
+    """
+    Enveloppe d'exécution installée sur chaque connexion (voir apps.py) : compte et chronomètre
+    les requêtes SQL sans DEBUG, et journalise celles qui dépassent PRONOSTICS_SEUIL_REQUETE_LENTE_MS.
+    """
+    debut = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duree = time.perf_counter() - debut
+        mesure = _mesure_en_cours.get()
+        if mesure is not None:
+            mesure.requetes += 1
+            mesure.duree_sql += duree
+            mesure.plus_lente = max(mesure.plus_lente, duree)
+        if duree * 1000 >= getattr(settings, 'PRONOSTICS_SEUIL_REQUETE_LENTE_MS', SEUIL_REQUETE_LENTE_MS):
+            # Jamais les valeurs des paramètres : hash de mots de passe, clés de session, identifiants...
+            journal_requetes_lentes.warning(
+                "%.1f ms %s : %s (%s %d)", duree * 1000, mesure.chemin if mesure else '-', sql[:LONGUEUR_SQL_MAX],
+                'lots' if many else 'paramètres', len(params or ()),
+            )
+
+
+def installer_chronometre(sender, connection, **kwargs):
+    """Receveur de connection_created (une seule enveloppe par connexion, même après reconnexion)"""
+    if chronometrer_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(chronometrer_sql)
+
+
+# -------------------------------
+# Métriques (format texte Prometheus)
+# -------------------------------
+# Métriques propres au processus : avec plusieurs workers, chaque processus expose les siennes.
+BORNES_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+BORNES_REQUETES = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogramme:
+    def __init__(self, bornes):
+        self.bornes = bornes
+        self.compteurs = [0] * (len(bornes) + 1)  # Dernier compteur : au-delà de la dernière borne (+Inf)
+        self.somme = 0.0
+        self.total = 0
+
+    def observer(self, valeur):
+        self.compteurs[bisect_left(self.bornes, valeur)] += 1
+        self.somme += valeur
+        self.total += 1
+
+    def lignes(self, nom, etiquettes):
+        cumul = 0
+        for borne, compteur in zip(self.bornes + ('+Inf',), self.compteurs):
+            cumul += compteur
+            yield f'{nom}_bucket{{{etiquettes},le="{borne}"}} {cumul}'
+        yield f'{nom}_sum{{{etiquettes}}} {self.somme:.6f}'
+        yield f'{nom}_count{{{etiquettes}}} {self.total}'
+
+
+HISTOGRAMMES = {
+    # nom: (aide, bornes, clé de l'observation)
+    'pronostics_http_duree_secondes': ("Durée des requêtes HTTP par vue", BORNES_DUREE, 'duree'),
+    'pronostics_http_sql_requetes': ("Nombre de requêtes SQL par requête HTTP", BORNES_REQUETES, 'requetes'),
+    'pronostics_http_sql_secondes': ("Temps SQL cumulé par requête HTTP", BORNES_DUREE, 'duree_sql'),
+}
+
+
+class Metriques:
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._histogrammes = {nom: {} for nom in HISTOGRAMMES}
+        self._plus_lentes = {}  # {vue: durée}
+
+    def observer(self, vue, duree, mesure):
+        valeurs = {'duree': duree, 'requetes': mesure.requetes, 'duree_sql': mesure.duree_sql}
+        with self._verrou:
+            for nom, (_, bornes, cle) in HISTOGRAMMES.items():
+                self._histogrammes[nom].setdefault(vue, Histogramme(bornes)).observer(valeurs[cle])
+            self._plus_lentes[vue] = max(self._plus_lentes.get(vue, 0.0), mesure.plus_lente)
+
+    def reinitialiser(self):
+        with self._verrou:
+            self._histogrammes = {nom: {} for nom in HISTOGRAMMES}
+            self._plus_lentes = {}
+
+    def exposition(self):
+        lignes = []
+        with self._verrou:
+            for nom, (aide, _, _) in HISTOGRAMMES.items():
+                lignes += [f'# HELP {nom} {aide}', f'# TYPE {nom} histogram']
+                for vue, histogramme in sorted(self._histogrammes[nom].items()):
+                    lignes += histogramme.lignes(nom, f'vue="{_echapper(vue)}"')
+            nom = 'pronostics_http_sql_plus_lente_secondes'
+            lignes += [f'# HELP {nom} Durée de la requête SQL la plus lente observée par vue', f'# TYPE {nom} gauge']
+            # Étiquetée par vue seulement : le texte SQL ferait exploser la cardinalité (il reste dans le journal)
+            for vue, duree in sorted(self._plus_lentes.items()):
+                lignes.append(f'{nom}{{vue="{_echapper(vue)}"}} {duree:.6f}')
+        return '\n'.join(lignes) + '\n'
+
+
+def _echapper(valeur):
+    return valeur.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metriques = Metriques()
+
+
+# -------------------------------
+# Middleware
+# -------------------------------
+class InstrumentationMiddleware:
+    """
+    Mesure chaque requête (durée, requêtes SQL, temps SQL, requête la plus lente), l'ajoute aux
+    métriques de sa vue (nom d'URL) et l'expose dans l'en-tête Server-Timing.
+    À placer en tête de MIDDLEWARE pour compter aussi la session et l'utilisateur.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mesure = MesureRequete(request.path)
+        jeton = _mesure_en_cours.set(mesure)
+        debut = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _mesure_en_cours.reset(jeton)
+        return self._terminer(request, response, mesure, time.perf_counter() - debut)
+
+    async def __acall__(self, request):
+        mesure = MesureRequete(request.path)
+        jeton = _mesure_en_cours.set(mesure)
+        debut = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _mesure_en_cours.reset(jeton)
+        return self._terminer(request, response, mesure, time.perf_counter() - debut)
+
+    def _terminer(self, request, response, mesure, duree):
+        correspondance = getattr(request, 'resolver_match', None)
+        metriques.observer(correspondance.view_name if correspondance else '<aucune>', duree, mesure)
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={duree * 1000:.1f}',
+            f'sql;dur={mesure.duree_sql * 1000:.1f};desc="{mesure.requetes} requetes"',  # En-tête ASCII
+            f'sql-max;dur={mesure.plus_lente * 1000:.1f}',
+        ])
+        return response
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pronostics.classement import SaisonNonTerminee, archiver_saison
+from pronostics.models import Saison
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive une saison terminée : classement et photos par journée figés, "
+        "pronostics supprimés (les résultats restent consultables)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('saison', help='Année de la saison, ex: 2024-2025')
+
+    def handle(self, *args, **options):
+        try:
+            saison = Saison.objects.get(annee=options['saison'])
+        except Saison.DoesNotExist:
+            raise CommandError(f"Saison inconnue : {options['saison']}")
+        if saison.archivee:
+            self.stdout.write(f"Saison {saison} déjà archivée")
+            return
+        try:
+            supprimes = archiver_saison(saison.id)
+        except SaisonNonTerminee as e:
+            raise CommandError(f"{saison} : {e}")
+        self.stdout.write(self.style.SUCCESS(f"Saison {saison} archivée : {supprimes} pronostics résumés puis supprimés"))
@@ -0,0 +1,60 @@
+import json
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from pronostics.benchmarks import SCENARIOS, SEUILS, TAILLES, depassements, executer_suite
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure requêtes SQL et durée des chemins critiques (classement, mes_pronos, pronostiquer, "
+        "import_csv, import_users) sur des jeux synthétiques ; échoue si un seuil est dépassé"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tailles', nargs='+', choices=list(TAILLES), default=['petite', 'moyenne'])
+        parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=None)
+        parser.add_argument('--repetitions', type=int, default=5)
+        parser.add_argument('--sortie', help='Fichier JSON des résultats (défaut : sortie standard)')
+        parser.add_argument('--reference', help='Résultats JSON d\'un commit précédent à comparer')
+        parser.add_argument('--tolerance', type=float, default=0.5, help='Ralentissement toléré par rapport à la référence (0.5 = +50 %%)')
+        parser.add_argument('--seuils', help='Fichier JSON de seuils {taille: {scénario: {requetes, ms}}} remplaçant les seuils par défaut')
+
+    def handle(self, *args, **options):
+        seuils = SEUILS
+        if options['seuils']:
+            with open(options['seuils'], encoding='utf-8') as f:
+                seuils = json.load(f)
+        reference = None
+        if options['reference']:
+            with open(options['reference'], encoding='utf-8') as f:
+                reference = json.load(f)['resultats']
+
+        resultats = executer_suite(options['tailles'], options['repetitions'], options['scenarios'])
+        erreurs = depassements(resultats, seuils, reference, options['tolerance'])
+        rapport = json.dumps({
+            'commit': _commit(),
+            'date': timezone.now().isoformat(),
+            'repetitions': options['repetitions'],
+            'resultats': resultats,
+            'depassements': erreurs,
+        }, indent=2, ensure_ascii=False)
+
+        if options['sortie']:
+            with open(options['sortie'], 'w', encoding='utf-8') as f:
+                f.write(rapport + '\n')
+            self.stdout.write(f"Résultats écrits dans {options['sortie']}")
+        else:
+            self.stdout.write(rapport)
+
+        if erreurs:
+            raise CommandError("Seuils dépassés :\n" + "\n".join(erreurs))
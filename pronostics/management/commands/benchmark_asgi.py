@@ -0,0 +1,136 @@
+import asyncio
+import json
+import math
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from pronostics.benchmarks import base_jetable
+from pronostics.synthetique import generer_donnees
+
+VUES = ['accueil', 'classement', 'mes_pronos', 'api_classement', 'api_matchs_a_venir', 'api_mes_pronos']
+
+# Chemin mesuré : (client de test, configuration d'URL)
+MODES = {
+    'wsgi': ('sync', 'config.urls'),
+    'asgi': ('async', 'config.urls_asgi'),
+    'asgi-vues-sync': ('async', 'config.urls'),  # ASGI avant les vues async : chaque vue dans un thread
+}
+
+
+def _percentile(durees, p):
+    durees = sorted(durees)
+    return durees[max(0, math.ceil(p / 100 * len(durees)) - 1)]
+
+
+def _resultat(durees, total, erreurs):
+    return {
+        'requetes': len(durees),
+        'requetes_par_seconde': round(len(durees) / total, 1),
+        'p50_ms': round(_percentile(durees, 50) * 1000, 2),
+        'p99_ms': round(_percentile(durees, 99) * 1000, 2),
+        'erreurs': erreurs,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare débit et latence p99 des pages en lecture et de l'API entre WSGI (vues sync) et ASGI "
+        "(vues async), sur un jeu de données synthétique dans une base de test jetable"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requetes', type=int, default=200, help='Requêtes par vue et par mode')
+        parser.add_argument('--concurrence', type=int, default=10, help='Clients simultanés')
+        parser.add_argument('--joueurs', type=int, default=200)
+        parser.add_argument('--journees', type=int, default=10)
+        parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+        parser.add_argument('--avec-cache', action='store_true', help='Garder le cache des pages (sinon DummyCache)')
+        parser.add_argument('--json', action='store_true', help='Sortie JSON')
+
+    # -------------------------------
+    # Chemin WSGI : un thread par client, comme un serveur WSGI multi-thread
+    # -------------------------------
+    def mesurer_sync(self, url, requetes, clients):
+        durees, erreurs = [], []
+        par_client = math.ceil(requetes / len(clients))
+
+        def travailler(client):
+            try:
+                for _ in range(par_client):
+                    debut = time.perf_counter()
+                    response = client.get(url)
+                    durees.append(time.perf_counter() - debut)
+                    if response.status_code != 200:
+                        erreurs.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=travailler, args=(client,)) for client in clients]
+        debut = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return _resultat(durees, time.perf_counter() - debut, len(erreurs))
+
+    # -------------------------------
+    # Chemin ASGI : une boucle d'événements, clients concurrents
+    # -------------------------------
+    def mesurer_async(self, url, requetes, clients):
+        durees, erreurs = [], []
+        par_client = math.ceil(requetes / len(clients))
+
+        async def travailler(client):
+            for _ in range(par_client):
+                debut = time.perf_counter()
+                response = await client.get(url)
+                durees.append(time.perf_counter() - debut)
+                if response.status_code != 200:
+                    erreurs.append(response.status_code)
+
+        async def principal():
+            await asyncio.gather(*(travailler(client) for client in clients))
+
+        debut = time.perf_counter()
+        asyncio.run(principal())
+        return _resultat(durees, time.perf_counter() - debut, len(erreurs))
+
+    def handle(self, *args, **options):
+        caches = {} if options['avec_cache'] else {
+            'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        }
+        with base_jetable():
+            with override_settings(**caches):
+                donnees = generer_donnees(joueurs=options['joueurs'], journees=options['journees'])
+                joueur = donnees['joueurs'][0]
+                resultats = {}
+                for mode in options['modes']:
+                    type_client, urlconf = MODES[mode]
+                    with override_settings(ROOT_URLCONF=urlconf):
+                        clients = [AsyncClient() if type_client == 'async' else Client() for _ in range(options['concurrence'])]
+                        for client in clients:
+                            client.force_login(joueur)
+                        mesurer = self.mesurer_async if type_client == 'async' else self.mesurer_sync
+                        resultats[mode] = {
+                            vue: mesurer(reverse(f'pronostics:{vue}'), options['requetes'], clients) for vue in VUES
+                        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultats, indent=2))
+            return
+        self.stdout.write(
+            f"{donnees['pronostics']} pronostics, {len(donnees['joueurs'])} joueurs, "
+            f"{options['requetes']} requêtes par vue, concurrence {options['concurrence']}"
+        )
+        self.stdout.write(f"{'vue':<22}{'mode':<16}{'req/s':>10}{'p50 (ms)':>12}{'p99 (ms)':>12}{'erreurs':>10}")
+        for vue in VUES:
+            for mode in options['modes']:
+                r = resultats[mode][vue]
+                self.stdout.write(
+                    f"{vue:<22}{mode:<16}{r['requetes_par_seconde']:>10}{r['p50_ms']:>12}{r['p99_ms']:>12}{r['erreurs']:>10}"
+                )
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from pronostics.models import Classement, Match, Pronostic
+
+
+class Command(BaseCommand):
+    help = "Affiche le plan d'exécution (EXPLAIN) des requêtes les plus fréquentes"
+
+    def requetes(self):
+        date = timezone.make_aware(datetime(2025, 8, 16, 21, 5))
+        return {
+            "Prochain match (accueil, classement)": Match.objects.a_venir()[:1],
+            "Match par (domicile, extérieur, date) (import)": Match.objects.filter(
+                equipe_domicile_id=1, equipe_exterieure_id=2, date=date
+            ),
+            "Matchs d'une journée (journées terminées, saisie par journée)": Match.objects.filter(saison_id=1, journee=1),
+            "Pronostic par (utilisateur, match) (pronostiquer)": Pronostic.objects.filter(user_id=1, match_id=1),
+            "Pronostics du prochain match (classement)": Pronostic.objects.filter(match_id=1),
+            "Pronostics d'un utilisateur (mes_pronos)": Pronostic.objects.filter(user_id=1).order_by('match__date'),
+            "Classement d'une saison": Classement.objects.filter(saison_id=1).order_by('rang'),
+        }
+
+    def handle(self, *args, **options):
+        for titre, queryset in self.requetes().items():
+            self.stdout.write(f"-- {titre}")
+            self.stdout.write(queryset.explain())
+            self.stdout.write("")
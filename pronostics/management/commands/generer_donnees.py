@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from pronostics.synthetique import generer_donnees
+
+
+class Command(BaseCommand):
+    help = "Génère un jeu de données synthétique (saisons, équipes, matchs, joueurs, pronostics) dans la base configurée"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--joueurs', type=int, default=200)
+        parser.add_argument('--saisons', type=int, default=1, help='Saisons (les précédentes entièrement jouées)')
+        parser.add_argument('--equipes', type=int, default=18, help="Nombre d'équipes (nombre pair)")
+        parser.add_argument('--journees', type=int, default=34)
+        parser.add_argument('--journees-jouees', type=int, default=None, help='Journées jouées dans la saison courante (défaut : la moitié)')
+        parser.add_argument('--densite', type=float, default=0.9, help='Probabilité qu\'un joueur pronostique un match')
+        parser.add_argument('--graine', type=int, default=0, help='Graine aléatoire (jeu de données reproductible)')
+
+    def handle(self, *args, **options):
+        donnees = generer_donnees(
+            joueurs=options['joueurs'],
+            saisons=options['saisons'],
+            equipes=options['equipes'],
+            journees=options['journees'],
+            densite=options['densite'],
+            journees_jouees=options['journees_jouees'],
+            graine=options['graine'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(donnees['saisons'])} saison(s), {len(donnees['matchs'])} matchs, "
+            f"{len(donnees['joueurs'])} joueurs, {donnees['pronostics']} pronostics"
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from watchers.import_csv import CSV_FILE, import_csv, import_csv_flux
+
+
+class Command(BaseCommand):
+    help = "Importe les matchs depuis un CSV (import complet par défaut, ou en flux pour les archives)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('chemin', nargs='?', default=CSV_FILE, help='Fichier CSV des matchs')
+        parser.add_argument('--forcer', action='store_true', help="Réimporter même si le fichier n'a pas changé")
+        parser.add_argument('--flux', action='store_true', help='Import en flux par lots, mémoire constante, sans suppression')
+        parser.add_argument('--taille-lot', type=int, default=1000, help='Nombre de lignes par transaction en mode flux')
+        parser.add_argument('--arreter-sur-erreur', action='store_true', help="Arrêter à la première ligne invalide (mode flux)")
+
+    def handle(self, *args, **options):
+        if options['flux']:
+            import_csv_flux(
+                options['chemin'],
+                taille_lot=options['taille_lot'],
+                sur_erreur='arreter' if options['arreter_sur_erreur'] else 'ignorer',
+            )
+        else:
+            import_csv(options['chemin'], forcer=options['forcer'])
@@ -0,0 +1,56 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pronostics.classement import saison_courante
+from pronostics.models import Saison
+from pronostics.projection import processus_par_defaut, enregistrer_projection, scenarios_par_defaut
+
+
+class Command(BaseCommand):
+    help = (
+        "Simule les matchs restants d'une saison (par défaut la saison courante) et affiche, pour chaque joueur, "
+        "la probabilité de finir premier, sur le podium, dans les 10 premiers. Le résultat est enregistré pour la page Projection : à lancer après chaque import de scores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('saison', nargs='?', help='Année de la saison, ex: 2025-2026')
+        parser.add_argument('--scenarios', type=int, help='Nombre de fins de saison simulées')
+        parser.add_argument('--graine', type=int, default=0, help='Graine du générateur aléatoire (résultats reproductibles)')
+        parser.add_argument('--processus', type=int, help='Processus de calcul (défaut : un par cœur)')
+        parser.add_argument('--limite', type=int, default=20, help='Nombre de joueurs affichés')
+        parser.add_argument('--json', action='store_true', help='Projection complète au format JSON')
+
+    def handle(self, *args, **options):
+        if options['saison']:
+            try:
+                saison = Saison.objects.get(annee=options['saison'])
+            except Saison.DoesNotExist:
+                raise CommandError(f"Saison inconnue : {options['saison']}")
+        else:
+            saison = saison_courante()
+            if saison is None:
+                raise CommandError("Aucune saison")
+        if options['scenarios'] is not None and options['scenarios'] < 1:
+            raise CommandError("--scenarios doit être positif")
+
+        scenarios = options['scenarios'] or scenarios_par_defaut()
+        processus = options['processus'] or processus_par_defaut()
+        debut = time.perf_counter()
+        projection = enregistrer_projection(saison, scenarios, options['graine'], processus)
+        duree = time.perf_counter() - debut
+
+        if options['json']:
+            self.stdout.write(json.dumps(projection, ensure_ascii=False, indent=2))
+            return
+        self.stdout.write(
+            f"Saison {saison} : {projection['scenarios']} scénarios, {projection['matchs_restants']} matchs restants, "
+            f"{len(projection['joueurs'])} joueurs ({projection['moteur']}, {processus} processus, {duree:.2f} s)"
+        )
+        self.stdout.write(f"{'Joueur':<20} {'Points':>6} {'Projetés':>9} {'Premier':>8} {'Podium':>8} {'Top 10':>8}")
+        for ligne in projection['joueurs'][:options['limite']]:
+            self.stdout.write(
+                f"{ligne['username']:<20} {ligne['points']:>6} {ligne['points_projetes']:>9} "
+                f"{ligne['premier']:>8.1%} {ligne['podium']:>8.1%} {ligne['top_10']:>8.1%}"
+            )
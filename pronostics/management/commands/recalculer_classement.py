@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from pronostics.classement import journees_terminees, mettre_a_jour_saison, photographier_journees
+from pronostics.models import Saison
+
+
+class Command(BaseCommand):
+    help = "Reconstruit le classement matérialisé de toutes les saisons non archivées (ou d'une seule)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--saison', help='Année de la saison, ex: 2025-2026')
+        parser.add_argument('--photos', action='store_true', help='Refaire aussi les photos de toutes les journées terminées')
+
+    def handle(self, *args, **options):
+        # Saisons archivées : plus de pronostics, leur classement est définitif
+        saisons = Saison.objects.filter(archivee=False)
+        if options['saison']:
+            saisons = saisons.filter(annee=options['saison'])
+        for saison in saisons:
+            mettre_a_jour_saison(saison.id)
+            if options['photos']:
+                photographier_journees(saison.id, journees_terminees(saison.id))
+            self.stdout.write(f"Classement recalculé : {saison}")
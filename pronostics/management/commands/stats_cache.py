@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from pronostics import views  # noqa: F401  Enregistre les vues décorées par cache_vue
+from pronostics.cache import VUES_EN_CACHE, statistiques, version_donnees
+
+
+class Command(BaseCommand):
+    help = "Affiche les succès / échecs du cache des pages (cache partagé requis, ex. CACHE_BACKEND=fichier)"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Version des données : {version_donnees()}")
+        for vue, compteurs in statistiques(VUES_EN_CACHE).items():
+            total = compteurs['hit'] + compteurs['miss']
+            taux = f"{100 * compteurs['hit'] / total:.1f} %" if total else "-"
+            self.stdout.write(f"{vue:<15} hit {compteurs['hit']:>8}  miss {compteurs['miss']:>8}  taux {taux}")
@@ -0,0 +1,188 @@
+import os
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from pronostics.projection import projeter_saisons_perimees
+from watchers.import_csv import CSV_FILE, import_csv
+from watchers.import_users import import_users
+
+# ----------------------------
+# File d'attente des imports avec anti-rebond
+# ----------------------------
+class FileAttenteImports:
+    """
+    Regroupe les rafales d'événements d'un même fichier : l'import n'est lancé qu'après
+    `delai` secondes sans nouvel événement. Un seul import en attente par fichier (un
+    changement plus récent remplace celui encore en attente) et un seul thread de travail
+    exécute les imports, l'un après l'autre.
+    """
+
+    def __init__(self, imports, delai=2.0, journal=print):
+        self.imports = imports  # {nom du fichier: fonction d'import(chemin)}
+        self.delai = delai
+        self.journal = journal
+        self._en_attente = {}  # {chemin: échéance (time.monotonic)}
+        self._condition = threading.Condition()
+        self._arret = False
+        self._thread = threading.Thread(target=self._travailler, name='watch-imports', daemon=True)
+
+    def signaler(self, chemin):
+        """Enregistre une modification ; repousse l'échéance si un import du fichier est déjà en attente"""
+        if os.path.basename(chemin) not in self.imports:
+            return
+        with self._condition:
+            self._en_attente[chemin] = time.monotonic() + self.delai
+            self._condition.notify()
+
+    def demarrer(self):
+        self._thread.start()
+
+    def arreter(self, timeout=None):
+        with self._condition:
+            self._arret = True
+            self._condition.notify()
+        self._thread.join(timeout)
+
+    def _prochain(self):
+        """Attend qu'un fichier ait dépassé son échéance et le retire de la file (None à l'arrêt)"""
+        with self._condition:
+            while not self._arret:
+                maintenant = time.monotonic()
+                prets = [chemin for chemin, echeance in self._en_attente.items() if echeance <= maintenant]
+                if prets:
+                    chemin = min(prets, key=self._en_attente.get)
+                    del self._en_attente[chemin]
+                    return chemin
+                attente = min(self._en_attente.values(), default=maintenant + 60) - maintenant
+                self._condition.wait(attente)
+        return None
+
+    def _travailler(self):
+        while (chemin := self._prochain()) is not None:
+            nom = os.path.basename(chemin)
+            debut = time.perf_counter()
+            try:
+                self.imports[nom](chemin)
+            except Exception as e:  # Le thread de travail ne doit pas mourir sur un import raté
+                self.journal(f"Import de {nom} en échec après {time.perf_counter() - debut:.2f} s : {e!r}")
+            else:
+                self.journal(f"Import de {nom} terminé en {time.perf_counter() - debut:.2f} s")
+
+
+# ----------------------------
+# Projections recalculées après les imports de matchs
+# ----------------------------
+class ProjectionsEnArrierePlan:
+    """
+    Recalcule les projections périmées (projection.py) dans son propre thread, après l'import :
+    hors de sa transaction, sans retarder les imports suivants. Les demandes reçues pendant
+    un calcul n'en relancent qu'un seul.
+    """
+
+    def __init__(self, projeter=projeter_saisons_perimees, journal=print):
+        self.projeter = projeter
+        self.journal = journal
+        self._demande = threading.Event()
+        self._arret = False
+        self._thread = threading.Thread(target=self._travailler, name='watch-projections', daemon=True)
+
+    def demander(self):
+        self._demande.set()
+
+    def demarrer(self):
+        self._thread.start()
+
+    def arreter(self, timeout=None):
+        self._arret = True
+        self._demande.set()
+        self._thread.join(timeout)
+
+    def _travailler(self):
+        while True:
+            self._demande.wait()
+            self._demande.clear()
+            if self._arret:
+                return
+            debut = time.perf_counter()
+            try:
+                saisons = self.projeter()
+            except Exception as e:  # Comme les imports : le thread ne doit pas mourir sur un calcul raté
+                self.journal(f"Projection en échec après {time.perf_counter() - debut:.2f} s : {e!r}")
+            else:
+                if saisons:
+                    noms = ', '.join(str(saison) for saison in saisons)
+                    self.journal(f"Projection de {noms} terminée en {time.perf_counter() - debut:.2f} s")
+            finally:
+                connection.close()  # Connexion propre à ce thread
+
+
+# ----------------------------
+# Watchdog Event Handler
+# ----------------------------
+class CSVHandler(FileSystemEventHandler):
+    def __init__(self, file_attente):
+        self.file_attente = file_attente
+
+    # Écritures seulement : l'import lit le fichier, ce qui émet des événements opened et
+    # closed_no_write ; les suivre relancerait l'import indéfiniment
+    def on_created(self, event):
+        self._signaler(event, event.src_path)
+
+    def on_modified(self, event):
+        self._signaler(event, event.src_path)
+
+    def on_closed(self, event):  # Fermé après écriture
+        self._signaler(event, event.src_path)
+
+    def on_moved(self, event):
+        # Les éditeurs enregistrent souvent via un fichier temporaire renommé : suivre la destination
+        self._signaler(event, event.dest_path)
+
+    def _signaler(self, event, chemin):
+        if not event.is_directory:
+            self.file_attente.signaler(os.path.abspath(chemin))
+
+
+class Command(BaseCommand):
+    help = (
+        "Surveille les CSV d'import et lance les imports (anti-rebond, un seul import à la fois) ; "
+        "les projections de fin de saison sont recalculées après chaque import de matchs"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dossier', default=os.path.dirname(CSV_FILE), help='Dossier contenant matchs.csv et users.csv')
+        parser.add_argument('--delai', type=float, default=2.0, help="Délai d'anti-rebond en secondes")
+
+    def handle(self, *args, **options):
+        dossier = options['dossier']
+        projections = ProjectionsEnArrierePlan(journal=self.stdout.write)
+
+        def importer_matchs(chemin):
+            import_csv(chemin)
+            projections.demander()  # Import réussi et validé : scores de la page Projection à jour
+
+        file_attente = FileAttenteImports(
+            {'matchs.csv': importer_matchs, 'users.csv': import_users},
+            delai=options['delai'],
+            journal=self.stdout.write,
+        )
+        observer = Observer()
+        observer.schedule(CSVHandler(file_attente), path=dossier, recursive=False)
+
+        self.stdout.write(f"Surveillance des CSV en cours : {dossier}")
+        projections.demarrer()
+        file_attente.demarrer()
+        observer.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            observer.stop()
+        observer.join()
+        file_attente.arreter()
+        projections.arreter()
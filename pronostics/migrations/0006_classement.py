@@ -0,0 +1,105 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, F, Max, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import Exact, GreaterThan, IsNull, LessThan
+
+
+def _points():
+    """Règles de points au moment de la migration (copie figée de models.expression_points)"""
+    prono_domicile, prono_exterieur = F('score_domicile'), F('score_exterieur')
+    reel_domicile, reel_exterieur = F('match__score_domicile'), F('match__score_exterieur')
+    return Case(
+        When(
+            IsNull(reel_domicile, True) | IsNull(reel_exterieur, True)
+            | IsNull(prono_domicile, True) | IsNull(prono_exterieur, True),
+            then=Value(0),
+        ),
+        When(Exact(prono_domicile, reel_domicile) & Exact(prono_exterieur, reel_exterieur), then=Value(5)),
+        When(Exact(reel_domicile, reel_exterieur) & Exact(prono_domicile, prono_exterieur), then=Value(4)),
+        When(Exact(reel_domicile, reel_exterieur), then=Value(0)),
+        When(Exact(prono_domicile - prono_exterieur, reel_domicile - reel_exterieur), then=Value(4)),
+        When(
+            (GreaterThan(prono_domicile, prono_exterieur) & GreaterThan(reel_domicile, reel_exterieur))
+            | (LessThan(prono_domicile, prono_exterieur) & LessThan(reel_domicile, reel_exterieur)),
+            then=Value(3),
+        ),
+        default=Value(0),
+        output_field=models.IntegerField(),
+    )
+
+
+def remplir_classement(apps, schema_editor):
+    """
+    Classement des saisons existantes (même agrégation que classement.mettre_a_jour_saison) : sans lui,
+    le classement resterait vide jusqu'à la commande recalculer_classement. Les points enregistrés
+    pouvaient être périmés (voir 0008) : ils sont recalculés depuis les scores.
+    """
+    Saison = apps.get_model('pronostics', 'Saison')
+    Match = apps.get_model('pronostics', 'Match')
+    Pronostic = apps.get_model('pronostics', 'Pronostic')
+    Classement = apps.get_model('pronostics', 'Classement')
+
+    for saison_id in Saison.objects.values_list('id', flat=True):
+        derniere_journee = Match.objects.filter(
+            saison_id=saison_id, score_domicile__isnull=False, score_exterieur__isnull=False,
+        ).aggregate(derniere=Max('journee'))['derniere']
+        lignes = (
+            Pronostic.objects.filter(match__saison_id=saison_id).annotate(pts=_points())
+            .values('user_id').order_by().annotate(
+                total=Coalesce(Sum('pts'), 0),
+                exacts=Count('id', filter=Q(pts=5)),
+                bons=Count('id', filter=Q(pts__in=(3, 4))),
+                derniere=Coalesce(Sum('pts', filter=Q(match__journee=derniere_journee)), 0),
+            )
+        )
+        classements = sorted(
+            (
+                Classement(
+                    user_id=ligne['user_id'], saison_id=saison_id, points=ligne['total'], scores_exacts=ligne['exacts'],
+                    bons_resultats=ligne['bons'], points_derniere_journee=ligne['derniere'],
+                )
+                for ligne in lignes
+            ),
+            key=lambda c: -c.points,
+        )
+        # Ex aequo au même rang
+        rang, points_precedents = 0, None
+        for position, classement in enumerate(classements, start=1):
+            if classement.points != points_precedents:
+                rang, points_precedents = position, classement.points
+            classement.rang = rang
+        Classement.objects.bulk_create(classements, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pronostics', '0005_alter_equipe_unique_together_equipe_logo_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Classement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField(default=0)),
+                ('scores_exacts', models.IntegerField(default=0)),
+                ('bons_resultats', models.IntegerField(default=0)),
+                ('points_derniere_journee', models.IntegerField(default=0)),
+                ('rang', models.PositiveIntegerField(default=0)),
+                ('saison', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='classements', to='pronostics.saison')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='classements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['rang', '-scores_exacts'],
+                'indexes': [models.Index(fields=['saison', 'rang'], name='classement_saison_rang_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'saison'), name='classement_unique_user_saison')],
+            },
+        ),
+        migrations.RunPython(remplir_classement, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pronostics', '0006_classement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EtatImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fichier', models.CharField(max_length=255, unique=True)),
+                ('empreinte', models.CharField(blank=True, max_length=64)),
+                ('date', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EmpreinteLigne',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=255)),
+                ('empreinte', models.CharField(max_length=64)),
+                ('etat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lignes', to='pronostics.etatimport')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('etat', 'cle'), name='empreinte_ligne_unique_etat_cle')],
+            },
+        ),
+    ]
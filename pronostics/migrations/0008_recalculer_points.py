@@ -0,0 +1,51 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:30
+
+from django.db import migrations, models
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
+from django.db.models.lookups import Exact, GreaterThan, IsNull, LessThan
+
+
+def _points(reel_domicile, reel_exterieur):
+    """Règles de points au moment de la migration (copie figée de models.expression_points)"""
+    prono_domicile = F('score_domicile')
+    prono_exterieur = F('score_exterieur')
+    return Case(
+        When(
+            IsNull(reel_domicile, True) | IsNull(reel_exterieur, True)
+            | IsNull(prono_domicile, True) | IsNull(prono_exterieur, True),
+            then=Value(0),
+        ),
+        When(Exact(prono_domicile, reel_domicile) & Exact(prono_exterieur, reel_exterieur), then=Value(5)),
+        When(Exact(reel_domicile, reel_exterieur) & Exact(prono_domicile, prono_exterieur), then=Value(4)),
+        When(Exact(reel_domicile, reel_exterieur), then=Value(0)),
+        When(Exact(prono_domicile - prono_exterieur, reel_domicile - reel_exterieur), then=Value(4)),
+        When(
+            (GreaterThan(prono_domicile, prono_exterieur) & GreaterThan(reel_domicile, reel_exterieur))
+            | (LessThan(prono_domicile, prono_exterieur) & LessThan(reel_domicile, reel_exterieur)),
+            then=Value(3),
+        ),
+        default=Value(0),
+        output_field=models.IntegerField(),
+    )
+
+
+def recalculer_points(apps, schema_editor):
+    """Les points enregistrés n'étaient pas mis à jour quand un score était importé"""
+    Match = apps.get_model('pronostics', 'Match')
+    Pronostic = apps.get_model('pronostics', 'Pronostic')
+    score_reel = Match.objects.filter(pk=OuterRef('match_id'))
+    Pronostic.objects.update(points=_points(
+        Subquery(score_reel.values('score_domicile')[:1]),
+        Subquery(score_reel.values('score_exterieur')[:1]),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pronostics', '0007_etat_import'),
+    ]
+
+    operations = [
+        migrations.RunPython(recalculer_points, migrations.RunPython.noop),
+    ]
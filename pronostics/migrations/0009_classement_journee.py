@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pronostics', '0008_recalculer_points'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassementJournee',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('journee', models.IntegerField()),
+                ('points', models.IntegerField(default=0)),
+                ('points_journee', models.IntegerField(default=0)),
+                ('rang', models.PositiveIntegerField(default=0)),
+                ('saison', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='classements_journee', to='pronostics.saison')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='classements_journee', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['saison', 'journee', 'rang'],
+                'indexes': [models.Index(fields=['saison', 'journee', 'rang'], name='classement_journee_rang_idx')],
+                'constraints': [models.UniqueConstraint(fields=('saison', 'journee', 'user'), name='classement_journee_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:18
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fusionner_doublons(apps, schema_editor):
+    """
+    Avant la contrainte d'unicité (user, match) : pour chaque doublon, garder le pronostic
+    complet le plus récent (à défaut le plus récent) et supprimer les autres.
+    """
+    Pronostic = apps.get_model('pronostics', 'Pronostic')
+    doublons = Pronostic.objects.values('user_id', 'match_id').order_by().annotate(nb=Count('id')).filter(nb__gt=1)
+    a_supprimer = []
+    for doublon in doublons:
+        pronos = list(
+            Pronostic.objects.filter(user_id=doublon['user_id'], match_id=doublon['match_id']).order_by('-id')
+        )
+        complets = [p for p in pronos if p.score_domicile is not None and p.score_exterieur is not None]
+        garde = (complets or pronos)[0]
+        a_supprimer.extend(p.id for p in pronos if p.id != garde.id)
+    if a_supprimer:
+        Pronostic.objects.filter(id__in=a_supprimer).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pronostics', '0009_classement_journee'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionner_doublons, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['date'], name='match_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['equipe_domicile', 'equipe_exterieure', 'date'], name='match_equipes_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['saison', 'journee'], name='match_saison_journee_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='pronostic',
+            constraint=models.UniqueConstraint(fields=('user', 'match'), name='pronostic_unique_user_match'),
+        ),
+    ]
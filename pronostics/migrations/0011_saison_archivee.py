@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pronostics', '0010_index_et_unicite_pronostic'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saison',
+            name='archivee',
+            field=models.BooleanField(default=False),
+        ),
+    ]
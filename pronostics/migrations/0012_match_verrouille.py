@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pronostics', '0011_saison_archivee'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='verrouille',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,7 +1,11 @@
 from django.db import models
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
+from django.db.models.lookups import Exact, GreaterThan, IsNull, LessThan
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from .referentiel import equipes, saisons
+
 # -------------------------------
 # Modèle Equipe
 # -------------------------------
@@ -18,6 +22,8 @@ class Equipe(models.Model):
 class Saison(models.Model):
     annee = models.CharField(max_length=10, unique=True)  # ex: "2025-2026"
     equipes = models.ManyToManyField(Equipe, related_name='saisons')
+    # Saison terminée dont les pronostics ont été résumés dans Classement / ClassementJournee puis supprimés
+    archivee = models.BooleanField(default=False)
 
     def __str__(self):
         return self.annee
@@ -25,6 +31,25 @@ class Saison(models.Model):
 # -------------------------------
 # Modèle Match
 # -------------------------------
+def pronostic_ouvert(verrouille, date, maintenant=None):
+    """Match.can_pronostiquer() sur des valeurs (lignes values() sans instance de Match)"""
+    return not verrouille and (maintenant or timezone.now()) < date
+
+
+class MatchQuerySet(models.QuerySet):
+    def a_venir(self):
+        """Matchs dont le coup d'envoi n'est pas encore passé, du plus proche au plus lointain"""
+        return self.filter(date__gte=timezone.now()).order_by('date')
+
+    def prochain(self):
+        """Prochain match à pronostiquer (équipes et saison lues dans le référentiel en mémoire)"""
+        return self.a_venir().first()
+
+    async def aprochain(self):
+        """Version async de prochain()"""
+        return await self.a_venir().afirst()
+
+
 class Match(models.Model):
     saison = models.ForeignKey(Saison, on_delete=models.CASCADE, default=1)
     journee = models.IntegerField(default=1)
@@ -33,18 +58,137 @@ class Match(models.Model):
     score_domicile = models.IntegerField(null=True, blank=True)
     score_exterieur = models.IntegerField(null=True, blank=True)
     date = models.DateTimeField()
+    # Pronostics fermés avant le coup d'envoi (journée reportée, suspendue...), voir les actions de l'admin
+    verrouille = models.BooleanField(default=False)
+
+    objects = MatchQuerySet.as_manager()
+
+    # Relations servies par le référentiel en mémoire (referentiel.py) plutôt que par la base
+    RELATIONS_REFERENTIEL = (('equipe_domicile', equipes), ('equipe_exterieure', equipes), ('saison', saisons))
+
+    class Meta:
+        indexes = [
+            # Prochain match : date >= maintenant, trié par date
+            models.Index(fields=['date'], name='match_date_idx'),
+            # Clé d'import : (domicile, extérieur, date)
+            models.Index(fields=['equipe_domicile', 'equipe_exterieure', 'date'], name='match_equipes_date_idx'),
+            # Matchs d'une journée
+            models.Index(fields=['saison', 'journee'], name='match_saison_journee_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        match = super().from_db(db, field_names, values)
+        for champ, referentiel in cls.RELATIONS_REFERENTIEL:
+            # Colonne différée (only/defer) : relation laissée à l'ORM
+            ligne = referentiel.get(match.__dict__.get(f'{champ}_id'))
+            if ligne is not None:
+                match._state.fields_cache[champ] = ligne
+        return match
 
     def is_played(self):
         """Retourne True si le match a un score renseigné"""
         return self.score_domicile is not None and self.score_exterieur is not None
 
-    def can_pronostiquer(self):
-        """Retourne True si le match peut encore être pronostiqué"""
-        return timezone.now() < self.date
+    def can_pronostiquer(self, maintenant=None):
+        """
+        Retourne True si le match peut encore être pronostiqué. `maintenant` : même instant pour
+        tous les matchs d'une page ou d'une écriture (défaut : l'heure courante).
+        """
+        return pronostic_ouvert(self.verrouille, self.date, maintenant)
 
     def __str__(self):
         return f"{self.equipe_domicile.nom} - {self.equipe_exterieure.nom}"
 
+# -------------------------------
+# Calcul des points
+# -------------------------------
+def points_pronostic(prono_domicile, prono_exterieur, reel_domicile, reel_exterieur):
+    """Points d'un pronostic complet sur un score réel (règles communes au modèle et aux projections)"""
+    # Pronostic exact
+    if prono_domicile == reel_domicile and prono_exterieur == reel_exterieur:
+        return 5
+
+    # Match nul
+    if reel_domicile == reel_exterieur:
+        if prono_domicile == prono_exterieur:
+            return 4  # Nul correct mais pas exact
+        return 0
+
+    # Bonne différence de buts
+    if (prono_domicile - prono_exterieur) == (reel_domicile - reel_exterieur):
+        return 4
+
+    # Vainqueur trouvé sans le bon écart
+    if (prono_domicile > prono_exterieur and reel_domicile > reel_exterieur) or \
+       (prono_domicile < prono_exterieur and reel_domicile < reel_exterieur):
+        return 3
+
+    # Tout faux
+    return 0
+
+
+# -------------------------------
+# Calcul des points en base de données
+# -------------------------------
+def expression_points(reel_domicile=F('match__score_domicile'), reel_exterieur=F('match__score_exterieur')):
+    """
+    Expression SQL équivalente à Pronostic.calculer_points.
+    Le score réel peut être une référence au match (par défaut) ou une valeur fixe (Value).
+    """
+    prono_domicile = F('score_domicile')
+    prono_exterieur = F('score_exterieur')
+    return Case(
+        # Match non joué ou pronostic incomplet
+        When(
+            IsNull(reel_domicile, True) | IsNull(reel_exterieur, True)
+            | IsNull(prono_domicile, True) | IsNull(prono_exterieur, True),
+            then=Value(0),
+        ),
+        # Pronostic exact
+        When(Exact(prono_domicile, reel_domicile) & Exact(prono_exterieur, reel_exterieur), then=Value(5)),
+        # Match nul : nul correct mais pas exact, sinon tout faux
+        When(Exact(reel_domicile, reel_exterieur) & Exact(prono_domicile, prono_exterieur), then=Value(4)),
+        When(Exact(reel_domicile, reel_exterieur), then=Value(0)),
+        # Bonne différence de buts
+        When(Exact(prono_domicile - prono_exterieur, reel_domicile - reel_exterieur), then=Value(4)),
+        # Vainqueur trouvé sans le bon écart
+        When(
+            (GreaterThan(prono_domicile, prono_exterieur) & GreaterThan(reel_domicile, reel_exterieur))
+            | (LessThan(prono_domicile, prono_exterieur) & LessThan(reel_domicile, reel_exterieur)),
+            then=Value(3),
+        ),
+        # Tout faux
+        default=Value(0),
+        output_field=models.IntegerField(),
+    )
+
+
+class PronosticQuerySet(models.QuerySet):
+    def with_points(self):
+        """Annote chaque pronostic avec `points_calcules`, calculé par la base de données"""
+        return self.annotate(points_calcules=expression_points())
+
+    def recalculer_points(self):
+        """
+        Recalcule et enregistre `points` pour tous les pronostics du queryset en une seule requête UPDATE
+        (un UPDATE ne peut pas joindre le match : son score est lu par sous-requête).
+        """
+        score_reel = Match.objects.filter(pk=OuterRef('match_id'))
+        return self.update(points=expression_points(
+            Subquery(score_reel.values('score_domicile')[:1]),
+            Subquery(score_reel.values('score_exterieur')[:1]),
+        ))
+
+    def delete(self):
+        """Supprime en une requête ; le classement des saisons concernées est recalculé au commit"""
+        from .classement import recalculer_au_commit  # classement importe ce module
+        saisons = set(self.order_by().values_list('match__saison_id', flat=True).distinct())
+        resultat = super().delete()
+        recalculer_au_commit(saisons)
+        return resultat
+
+
 # -------------------------------
 # Modèle Pronostic
 # -------------------------------
@@ -55,6 +199,22 @@ class Pronostic(models.Model):
     score_exterieur = models.IntegerField(null=True, blank=True)
     points = models.IntegerField(default=0)
 
+    objects = PronosticQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Un seul pronostic par utilisateur et par match (sert aussi d'index pour cette recherche)
+            models.UniqueConstraint(fields=['user', 'match'], name='pronostic_unique_user_match'),
+        ]
+
+    def delete(self, *args, **kwargs):
+        """Comme PronosticQuerySet.delete() : classement de la saison recalculé au commit"""
+        from .classement import recalculer_au_commit  # classement importe ce module
+        saison_id = self.match.saison_id
+        resultat = super().delete(*args, **kwargs)
+        recalculer_au_commit({saison_id})
+        return resultat
+
     def calculer_points(self):
         """
         Calcule les points du pronostic en fonction du score réel du match.
@@ -62,28 +222,7 @@ class Pronostic(models.Model):
         """
         if not self.match.is_played() or self.score_domicile is None or self.score_exterieur is None:
             return 0
-
-        # Pronostic exact
-        if self.score_domicile == self.match.score_domicile and self.score_exterieur == self.match.score_exterieur:
-            return 5
-
-        # Match nul
-        if self.match.score_domicile == self.match.score_exterieur:
-            if self.score_domicile == self.score_exterieur:
-                return 4  # Nul correct mais pas exact
-            return 0
-
-        # Bonne différence de buts
-        if (self.score_domicile - self.score_exterieur) == (self.match.score_domicile - self.match.score_exterieur):
-            return 4
-
-        # Vainqueur trouvé sans le bon écart
-        if (self.score_domicile > self.score_exterieur and self.match.score_domicile > self.match.score_exterieur) or \
-           (self.score_domicile < self.score_exterieur and self.match.score_domicile < self.match.score_exterieur):
-            return 3
-
-        # Tout faux
-        return 0
+        return points_pronostic(self.score_domicile, self.score_exterieur, self.match.score_domicile, self.match.score_exterieur)
 
     def save(self, *args, **kwargs):
         """Met à jour les points automatiquement avant de sauvegarder"""
@@ -92,3 +231,79 @@ class Pronostic(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.match}"
+
+# -------------------------------
+# Modèle Classement
+# -------------------------------
+class Classement(models.Model):
+    """Classement matérialisé d'un utilisateur pour une saison, tenu à jour par pronostics.classement"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='classements')
+    saison = models.ForeignKey(Saison, on_delete=models.CASCADE, related_name='classements')
+    points = models.IntegerField(default=0)
+    scores_exacts = models.IntegerField(default=0)
+    bons_resultats = models.IntegerField(default=0)  # Résultat trouvé sans le score exact
+    points_derniere_journee = models.IntegerField(default=0)
+    rang = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['rang', '-scores_exacts']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'saison'], name='classement_unique_user_saison'),
+        ]
+        indexes = [
+            models.Index(fields=['saison', 'rang'], name='classement_saison_rang_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.saison} - {self.rang}. {self.user.username} ({self.points} pts)"
+
+# -------------------------------
+# Modèles EtatImport / EmpreinteLigne
+# -------------------------------
+class EtatImport(models.Model):
+    """Empreinte du dernier fichier importé, pour ignorer les réimports à l'identique"""
+    fichier = models.CharField(max_length=255, unique=True)
+    empreinte = models.CharField(max_length=64, blank=True)
+    date = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.fichier} ({self.date:%d/%m/%Y %H:%M})"
+
+
+class EmpreinteLigne(models.Model):
+    """Empreinte de chaque ligne importée : seules les lignes dont l'empreinte change sont réécrites"""
+    etat = models.ForeignKey(EtatImport, on_delete=models.CASCADE, related_name='lignes')
+    cle = models.CharField(max_length=255)  # "domicile|extérieur|date ISO"
+    empreinte = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['etat', 'cle'], name='empreinte_ligne_unique_etat_cle'),
+        ]
+
+    def __str__(self):
+        return self.cle
+
+# -------------------------------
+# Modèle ClassementJournee
+# -------------------------------
+class ClassementJournee(models.Model):
+    """Photo du classement d'une saison à la fin d'une journée, écrite quand la journée est complète (réécrite si un score change)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='classements_journee')
+    saison = models.ForeignKey(Saison, on_delete=models.CASCADE, related_name='classements_journee')
+    journee = models.IntegerField()
+    points = models.IntegerField(default=0)  # Total cumulé à la fin de la journée
+    points_journee = models.IntegerField(default=0)
+    rang = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['saison', 'journee', 'rang']
+        constraints = [
+            models.UniqueConstraint(fields=['saison', 'journee', 'user'], name='classement_journee_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['saison', 'journee', 'rang'], name='classement_journee_rang_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.saison} J{self.journee} - {self.rang}. {self.user.username} ({self.points} pts)"
@@ -0,0 +1,165 @@
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F
+
+from . import simulation
+from .cache import version_saison
+from .models import Classement, Match, Pronostic, Saison, points_pronostic
+
+# -------------------------------
+# Projection du classement final
+# -------------------------------
+# "Puis-je encore gagner ?" : les matchs restants d'une saison sont simulés (simulation.py) avec les
+# pronostics déjà saisis et les règles de points habituelles ; un pronostic non saisi rapporte 0.
+# Chaque équipe marque selon la répartition des buts des matchs déjà joués de la saison (domicile et
+# extérieur indépendants), lissée par REPARTITION_PAR_DEFAUT : en début de saison, elle domine.
+# Le calcul (plusieurs secondes) n'est jamais fait pendant une requête ; la page lit la dernière
+# projection enregistrée. Elle est recalculée par watch_imports après chaque import de matchs
+# (projeter_saisons_perimees, dans un thread à part) ou à la main par la commande projeter_classement.
+# Sans watch_imports, planifier la commande après les imports de scores (cron).
+BUTS_MAX = 9  # Au-delà, compté comme BUTS_MAX buts
+REPARTITION_PAR_DEFAUT = (30, 35, 20, 10, 5)  # Poids de 0, 1, 2, 3, 4 buts
+CLE_PROJECTION = 'pronostics:projection:{saison}'
+
+
+def scenarios_par_defaut():
+    # Le moteur Python pur (sans numpy) est environ cent fois plus lent
+    defaut = 100_000 if simulation.moteur() == 'numpy' else 2_000
+    return getattr(settings, 'PRONOSTICS_PROJECTION_SCENARIOS', defaut)
+
+
+def processus_par_defaut():
+    return getattr(settings, 'PRONOSTICS_PROJECTION_PROCESSUS', None) or os.cpu_count() or 1
+
+
+def _repartition(saison_id, champ):
+    """Probabilité de 0..BUTS_MAX buts pour `champ` (score_domicile ou score_exterieur) dans la saison"""
+    poids = [0.0] * (BUTS_MAX + 1)
+    for buts, nombre in enumerate(REPARTITION_PAR_DEFAUT):
+        poids[buts] += nombre / 10  # Équivaut à une dizaine de matchs joués
+    # Saison seule : les anciennes saisons (autre championnat, autres équipes) fausseraient la projection
+    comptes = Match.objects.filter(saison_id=saison_id, **{f'{champ}__isnull': False}).values(champ).annotate(
+        n=Count('id')
+    ).order_by()
+    for ligne in comptes:
+        poids[min(ligne[champ], BUTS_MAX)] += ligne['n']
+    total = sum(poids)
+    return [p / total for p in poids]
+
+
+def probabilites_issues(saison_id):
+    """Probabilité de chaque score de la saison, issue = buts_domicile * (BUTS_MAX + 1) + buts_exterieur"""
+    domicile, exterieur = _repartition(saison_id, 'score_domicile'), _repartition(saison_id, 'score_exterieur')
+    return [d * e for d in domicile for e in exterieur]
+
+
+def donnees_simulation(saison_id):
+    """
+    Entrées de simulation.simuler() pour la saison, et les joueurs correspondant à chaque index :
+    [{'user_id', 'username', 'points'}]. Pronostics des matchs restants regroupés par score pronostiqué.
+    """
+    joueurs = list(
+        Classement.objects.filter(saison_id=saison_id).order_by('rang', 'user__username')
+        .values('user_id', 'points', username=F('user__username'))
+    )
+    index = {j['user_id']: i for i, j in enumerate(joueurs)}
+
+    pronos = (
+        Pronostic.objects.filter(
+            match__saison_id=saison_id, match__score_domicile__isnull=True,
+            score_domicile__isnull=False, score_exterieur__isnull=False,
+        )
+        .values_list('match_id', 'score_domicile', 'score_exterieur', 'user_id', 'user__username')
+        .order_by('match_id', 'user_id')
+    )
+    groupes = defaultdict(lambda: defaultdict(list))  # match -> (buts domicile, buts extérieur) -> index des joueurs
+    for match_id, domicile, exterieur, user_id, username in pronos:
+        if user_id not in index:  # Pas encore de ligne de classement : aucun point acquis
+            index[user_id] = len(joueurs)
+            joueurs.append({'user_id': user_id, 'points': 0, 'username': username})
+        groupes[match_id][(domicile, exterieur)].append(index[user_id])
+
+    issues = [(d, e) for d in range(BUTS_MAX + 1) for e in range(BUTS_MAX + 1)]
+    points = {}  # Même pronostic sur plusieurs matchs : même table de points
+    for par_score in groupes.values():
+        for score in par_score:
+            if score not in points:
+                points[score] = tuple(points_pronostic(*score, d, e) for d, e in issues)
+    matchs = [[(points[score], indices) for score, indices in par_score.items()] for par_score in groupes.values()]
+    nb_restants = Match.objects.filter(saison_id=saison_id, score_domicile__isnull=True).count()
+    donnees = {'base': [j['points'] for j in joueurs], 'probas': probabilites_issues(saison_id), 'matchs': matchs}
+    return donnees, joueurs, nb_restants
+
+
+def _points_esperes(donnees):
+    """Total moyen attendu de chaque joueur (calcul exact, sans simulation)"""
+    esperes = [float(p) for p in donnees['base']]
+    for groupes in donnees['matchs']:
+        for points, indices in groupes:
+            moyenne = sum(p * q for p, q in zip(points, donnees['probas']))
+            for i in indices:
+                esperes[i] += moyenne
+    return esperes
+
+
+def projeter(saison, scenarios=None, graine=0, processus=None):
+    """
+    Projection du classement final de `saison` : pour chaque joueur, points actuels, points
+    attendus et probabilité de finir premier, sur le podium, dans les 10 premiers.
+    """
+    scenarios = scenarios or scenarios_par_defaut()
+    donnees, joueurs, nb_restants = donnees_simulation(saison.id)
+    comptes = simulation.simuler(donnees, scenarios, graine, processus or processus_par_defaut())
+    esperes = _points_esperes(donnees)
+
+    lignes = [
+        {
+            **joueur,
+            'points_projetes': round(esperes[i], 1),
+            'premier': comptes[0][i] / scenarios,
+            'podium': comptes[1][i] / scenarios,
+            'top_10': comptes[2][i] / scenarios,
+        }
+        for i, joueur in enumerate(joueurs)
+    ]
+    lignes.sort(key=lambda l: (-l['premier'], -l['podium'], -l['top_10'], -l['points_projetes'], l['username']))
+    for rang, ligne in enumerate(lignes, start=1):
+        ligne['rang_projete'] = rang
+    return {
+        'saison': saison.annee,
+        'scenarios': scenarios,
+        'graine': graine,
+        'moteur': simulation.moteur(),
+        'matchs_restants': nb_restants,
+        'joueurs': lignes,
+    }
+
+
+def enregistrer_projection(saison, scenarios=None, graine=0, processus=None):
+    """projeter(), puis conservée pour la page Projection jusqu'au calcul suivant"""
+    version = version_saison(saison.id)  # Lue avant le calcul : une écriture pendant celui-ci la rend périmée
+    projection = projeter(saison, scenarios, graine, processus)
+    cache.set(CLE_PROJECTION.format(saison=saison.id), {'version': version, 'projection': projection}, timeout=None)
+    return projection
+
+
+def derniere_projection(saison):
+    """
+    (projection, à jour) : dernière projection enregistrée pour la saison, ou (None, False).
+    Périmée (à jour = False) si un score ou un pronostic de la saison a changé depuis son calcul.
+    """
+    enregistree = cache.get(CLE_PROJECTION.format(saison=saison.id))
+    if enregistree is None:
+        return None, False
+    return enregistree['projection'], enregistree['version'] == version_saison(saison.id)
+
+
+def projeter_saisons_perimees(**options):
+    """Enregistre la projection de chaque saison non archivée dont la dernière est absente ou périmée"""
+    saisons = [saison for saison in Saison.objects.filter(archivee=False) if not derniere_projection(saison)[1]]
+    for saison in saisons:
+        enregistrer_projection(saison, **options)
+    return saisons
@@ -0,0 +1,121 @@
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+# -------------------------------
+# Référentiel en mémoire : équipes et saisons
+# -------------------------------
+# Quelques dizaines de lignes qui ne changent presque jamais, mais relues pour chaque match affiché,
+# chaque import et chaque page de l'admin : elles sont chargées une fois par processus.
+# - Invalidation locale : signaux post_save / post_delete (signals.py) ; les écritures en masse
+#   (bulk_create, update) appellent invalider() elles-mêmes.
+# - Entre processus (PRONOSTICS_REFERENTIEL_PARTAGE) : un numéro de version partagé dans le cache,
+#   relu une fois par requête HTTP (request_started) et au début de chaque import.
+# Les instances sont partagées par tout le processus : lecture seule.
+CLE_VERSION_REFERENTIEL = 'pronostics:referentiel:version'
+
+
+def _partage():
+    return getattr(settings, 'PRONOSTICS_REFERENTIEL_PARTAGE', True)
+
+
+def _version_partagee():
+    return cache.get(CLE_VERSION_REFERENTIEL, 0) if _partage() else 0
+
+
+class Referentiel:
+    """Lignes d'un modèle indexées par id et par `champ_nom`"""
+
+    def __init__(self, label, champ_nom):
+        self.label = label  # 'app.Modele', résolu au premier chargement (models.py importe ce module)
+        self.champ_nom = champ_nom
+        self._verrou = threading.Lock()
+        self._donnees = None  # (par id, par nom, version partagée au chargement)
+        self._a_verifier = False
+        self.provisoire = False  # Invalidé dans une transaction pas encore validée
+
+    @property
+    def modele(self):
+        return apps.get_model(self.label)
+
+    def _charger(self):
+        with self._verrou:
+            # Version lue avant les lignes : une écriture concurrente provoquera un nouveau chargement.
+            # Après une invalidation pas encore validée, le contenu peut être annulé : revérifié au prochain accès.
+            if not connection.in_atomic_block:
+                self.provisoire = False
+            version = None if self.provisoire else _version_partagee()
+            lignes = list(self.modele.objects.all())
+            self._donnees = ({l.pk: l for l in lignes}, {getattr(l, self.champ_nom): l for l in lignes}, version)
+            self._a_verifier = False
+        return self._donnees
+
+    def _a_jour(self):
+        donnees = self._donnees
+        if donnees is None:
+            return self._charger()
+        if self._a_verifier:
+            self._a_verifier = False
+            if donnees[2] is None or _version_partagee() != donnees[2]:
+                return self._charger()
+        return donnees
+
+    def get(self, pk):
+        """Ligne d'id `pk` ; un id inconnu (ligne créée ailleurs, ou en masse) provoque un rechargement"""
+        if pk is None:
+            return None
+        ligne = self._a_jour()[0].get(pk)
+        if ligne is None:
+            ligne = self._charger()[0].get(pk)
+        return ligne
+
+    def ids_par_nom(self, noms):
+        """{nom: id} pour les noms connus parmi `noms` (rechargement si certains manquent)"""
+        par_nom = self._a_jour()[1]
+        if any(nom not in par_nom for nom in noms):
+            par_nom = self._charger()[1]
+        return {nom: par_nom[nom].pk for nom in noms if nom in par_nom}
+
+    def verifier(self):
+        """Relire la version partagée au prochain accès"""
+        self._a_verifier = True
+
+    def vider(self):
+        self._donnees = None
+
+
+equipes = Referentiel('pronostics.Equipe', 'nom')
+saisons = Referentiel('pronostics.Saison', 'annee')
+REFERENTIELS = (equipes, saisons)
+
+
+def verifier(**kwargs):
+    """Receveur de request_started (apps.py) ; appelé aussi au début des imports"""
+    for referentiel in REFERENTIELS:
+        referentiel.verifier()
+
+
+def _invalider():
+    for referentiel in REFERENTIELS:
+        referentiel.vider()
+        referentiel.provisoire = False
+    if _partage():
+        try:
+            cache.incr(CLE_VERSION_REFERENTIEL)
+        except ValueError:  # Clé absente (cache vidé ou expiré)
+            cache.add(CLE_VERSION_REFERENTIEL, 1, timeout=None)
+
+
+def invalider(**kwargs):
+    """
+    Vide le référentiel du processus et prévient les autres. Comme incrementer_version(),
+    à nouveau au commit : un chargement entre les deux aurait pu lire des données non validées.
+    """
+    _invalider()
+    if connection.in_atomic_block:
+        for referentiel in REFERENTIELS:
+            referentiel.provisoire = True
+        transaction.on_commit(_invalider)
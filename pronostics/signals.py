@@ -0,0 +1,105 @@
+import threading
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, pre_delete, pre_save, post_save
+from django.dispatch import receiver
+
+from .cache import incrementer_version
+from .classement import (
+    invalider_photos, mettre_a_jour_saison, mettre_a_jour_utilisateur, recalculer_au_commit, rescorer_matchs,
+)
+from .models import Classement, Equipe, Match, Pronostic, Saison
+from .referentiel import invalider
+
+# -------------------------------
+# Match : mise à jour du classement quand le score change
+# -------------------------------
+@receiver(pre_save, sender=Match)
+def memoriser_score(sender, instance, **kwargs):
+    """Mémorise le score, la saison et la journée enregistrés en base avant la sauvegarde"""
+    instance._score_precedent = instance._position_precedente = None
+    if instance.pk:
+        enregistre = Match.objects.filter(pk=instance.pk).values_list(
+            'score_domicile', 'score_exterieur', 'saison_id', 'journee'
+        ).first()
+        if enregistre is not None:
+            instance._score_precedent, instance._position_precedente = enregistre[:2], enregistre[2:]
+
+
+@receiver(post_save, sender=Match)
+def score_modifie(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    incrementer_version()
+    score = (instance.score_domicile, instance.score_exterieur)
+    precedent = getattr(instance, '_score_precedent', None) or (None, None)
+    position = (instance.saison_id, instance.journee)
+    ancienne = getattr(instance, '_position_precedente', None) or position
+    if position != ancienne:
+        # Match déplacé : photos de l'ancienne et de la nouvelle journée périmées
+        invalider_photos([ancienne, position])
+    if score != precedent:
+        # Les points enregistrés des pronostics de ce match sont réécrits en une requête
+        rescorer_matchs([instance.pk])
+    if score != precedent or position != ancienne:
+        for saison_id in {ancienne[0], position[0]}:
+            mettre_a_jour_saison(saison_id)
+
+
+# -------------------------------
+# Pronostic : mise à jour de la ligne de l'utilisateur
+# -------------------------------
+@receiver(post_save, sender=Pronostic)
+def pronostic_enregistre(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    incrementer_version()
+    match = instance.match
+    # Un pronostic sur un match non joué ne rapporte rien : il suffit que l'utilisateur soit classé
+    if not match.is_played() and Classement.objects.filter(user_id=instance.user_id, saison_id=match.saison_id).exists():
+        return
+    mettre_a_jour_utilisateur(instance.user_id, match.saison_id)
+
+
+# -------------------------------
+# Suppressions : matchs et utilisateurs (pronostics et lignes de classement supprimés en cascade)
+# -------------------------------
+# Aucun signal de suppression sur Pronostic ni Classement : Django ne supprimerait plus ces cascades
+# en une requête. Un delete() envoie un signal par match ou utilisateur, tous avec le même `origin` :
+# ils notent les saisons, sans requête, et chacune est recalculée une fois au commit.
+_suppression = threading.local()
+
+
+def _memo(origin):
+    """Mémoire partagée par les signaux d'une même suppression"""
+    if origin is None or getattr(_suppression, 'origin', None) is not origin:
+        _suppression.origin, _suppression.memo = origin, {}
+    return _suppression.memo
+
+
+@receiver(pre_delete, sender=Match)
+def match_supprime(sender, instance, origin=None, **kwargs):
+    memo = _memo(origin)
+    if 'saisons' not in memo:
+        memo['saisons'], memo['photos'] = set(), set()
+        recalculer_au_commit(memo['saisons'], photos=memo['photos'])
+    memo['saisons'].add(instance.saison_id)
+    memo['photos'].add((instance.saison_id, instance.journee))
+
+
+@receiver(pre_delete, sender=User)
+def utilisateur_supprime(sender, instance, origin=None, **kwargs):
+    # Ses lignes de classement disparaissent : rangs des autres joueurs de chaque saison
+    memo = _memo(origin)
+    if 'utilisateurs' not in memo:
+        memo['utilisateurs'] = True
+        recalculer_au_commit(rangs_seulement=True)
+
+
+# -------------------------------
+# Équipes et saisons : référentiel en mémoire à recharger
+# -------------------------------
+@receiver([post_save, post_delete], sender=Equipe)
+@receiver([post_save, post_delete], sender=Saison)
+def referentiel_modifie(sender, **kwargs):
+    invalider()
@@ -0,0 +1,148 @@
+import math
+import multiprocessing
+import random
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # numpy est optionnel : moteur en Python pur (entiers empaquetés), plus lent
+    np = None
+
+# -------------------------------
+# Simulation Monte Carlo de fin de saison
+# -------------------------------
+# Module sans Django : importé tel quel par les processus de calcul (voir projection.py pour les données).
+# Données d'entrée :
+#   base    : points actuels de chaque joueur (index 0..U-1)
+#   probas  : probabilité de chaque issue d'un match, issue = buts_domicile * nb_buts + buts_exterieur
+#   matchs  : pour chaque match restant, [(points par issue, [index des joueurs ayant ce pronostic]), ...]
+# Résultat : pour chaque palier de PALIERS, nombre de scénarios où le joueur finit à ce rang ou mieux
+# (ex aequo au même rang, comme le classement).
+PALIERS = (1, 3, 10)
+TAILLE_LOT = 5000  # Scénarios par tâche ; découpage fixe : le résultat ne dépend pas du nombre de processus
+# Totaux sur 16 bits (au plus 5 points par match : une saison reste loin de 32767 points), ce qui
+# divise par deux la mémoire parcourue par numpy ; le moteur Python range 16 bits par joueur dans un entier
+BITS = 16
+
+_etat = {}
+
+
+def moteur():
+    return 'numpy' if np is not None else 'python'
+
+
+def initialiser(donnees):
+    """Prépare les tables du moteur, une fois par processus (initializer du pool)"""
+    base, probas, matchs = donnees['base'], donnees['probas'], donnees['matchs']
+    nb_issues, nb_joueurs = len(probas), len(base)
+    _etat.clear()
+    _etat.update(nb_joueurs=nb_joueurs, nb_issues=nb_issues, nb_matchs=len(matchs))
+    if np is not None:
+        # tables[m, issue, joueur] : points du joueur sur le match m pour cette issue
+        tables = np.zeros((len(matchs), nb_issues, nb_joueurs), dtype=np.int8)
+        for m, groupes in enumerate(matchs):
+            for points, joueurs in groupes:
+                tables[m][:, joueurs] = np.asarray(points, dtype=np.int8)[:, None]
+        _etat.update(base=np.asarray(base, dtype=np.int16), tables=tables, probas=np.asarray(probas, dtype=float))
+    else:
+        # Un entier par (match, issue) : les points de tous les joueurs, 16 bits chacun ; une addition
+        # d'entiers ajoute d'un coup les points de tout le monde
+        masques = [[(points, sum(1 << (BITS * j) for j in joueurs)) for points, joueurs in groupes] for groupes in matchs]
+        _etat.update(
+            base=int.from_bytes(_octets(base), 'little'),
+            tables=[[sum(points[issue] * masque for points, masque in groupe) for issue in range(nb_issues)] for groupe in masques],
+            cumul=list(_cumul(probas)),
+        )
+
+
+def _octets(valeurs):
+    tableau = array('H', valeurs)
+    if sys.byteorder == 'big':
+        tableau.byteswap()
+    return tableau.tobytes()
+
+
+def _cumul(probas):
+    total = 0.0
+    for p in probas:
+        total += p
+        yield total
+
+
+def simuler_lot(indice, scenarios, graine):
+    """Compte les paliers atteints sur `scenarios` scénarios ; le lot `indice` a son propre flux aléatoire"""
+    if _etat['nb_joueurs'] == 0:
+        return [[] for _ in PALIERS]
+    if np is not None:
+        return _lot_numpy(np.random.default_rng([graine, indice]), scenarios)
+    return _lot_python(random.Random(f'{graine}:{indice}'), scenarios)
+
+
+def _lot_numpy(rng, scenarios):
+    nb_joueurs = _etat['nb_joueurs']
+    totaux = np.tile(_etat['base'], (scenarios, 1))
+    if _etat['nb_matchs']:
+        issues = rng.choice(_etat['nb_issues'], size=(scenarios, _etat['nb_matchs']), p=_etat['probas'])
+        for m, table in enumerate(_etat['tables']):
+            totaux += table[issues[:, m]]
+    # Rang <= k  <=>  moins de k joueurs strictement devant  <=>  total >= k-ième meilleur total.
+    # Tri partiel : seules les positions des paliers sont placées
+    positions = [nb_joueurs - min(palier, nb_joueurs) for palier in PALIERS]
+    ordonnes = np.partition(totaux, sorted(set(positions)), axis=1)
+    return [(totaux >= ordonnes[:, [position]]).sum(axis=0).tolist() for position in positions]
+
+
+def _lot_python(aleatoire, scenarios):
+    nb_joueurs, nb_matchs, tables = _etat['nb_joueurs'], _etat['nb_matchs'], _etat['tables']
+    issues = aleatoire.choices(range(_etat['nb_issues']), cum_weights=_etat['cumul'], k=scenarios * nb_matchs)
+    comptes = [[0] * nb_joueurs for _ in PALIERS]
+    rangs_utiles = [min(palier, nb_joueurs) - 1 for palier in PALIERS]
+    joueurs = range(nb_joueurs)
+    for s in range(scenarios):
+        total = _etat['base']
+        for table, issue in zip(tables, issues[s * nb_matchs:(s + 1) * nb_matchs]):
+            total += table[issue]
+        valeurs = array('H', total.to_bytes(2 * nb_joueurs, 'little'))
+        if sys.byteorder == 'big':
+            valeurs.byteswap()
+        ordre = sorted(joueurs, key=valeurs.__getitem__, reverse=True)
+        seuils = [valeurs[ordre[r]] for r in rangs_utiles]
+        # Seule la tête du classement est parcourue : jusqu'au dernier ex aequo du palier le plus large
+        for joueur in ordre:
+            valeur = valeurs[joueur]
+            if valeur < seuils[-1]:
+                break
+            for compte, seuil in zip(comptes, seuils):
+                if valeur >= seuil:
+                    compte[joueur] += 1
+    return comptes
+
+
+def simuler(donnees, scenarios, graine=0, processus=1):
+    """
+    Simule `scenarios` fins de saison par lots de TAILLE_LOT, répartis sur `processus` processus.
+    Même graine, même moteur : mêmes résultats, quel que soit le nombre de processus.
+    Retourne, pour chaque palier, le nombre de scénarios par joueur.
+    """
+    lots = [(i, min(TAILLE_LOT, scenarios - i * TAILLE_LOT)) for i in range(math.ceil(scenarios / TAILLE_LOT))]
+    if processus <= 1 or len(lots) == 1:
+        initialiser(donnees)
+        resultats = [simuler_lot(indice, taille, graine) for indice, taille in lots]
+    else:
+        # spawn : pas de fork d'un serveur web multi-thread ni de ses connexions à la base
+        with ProcessPoolExecutor(
+            max_workers=min(processus, len(lots)), mp_context=multiprocessing.get_context('spawn'),
+            initializer=initialiser, initargs=(donnees,),
+        ) as executeur:
+            resultats = list(executeur.map(
+                simuler_lot, [i for i, _ in lots], [n for _, n in lots], [graine] * len(lots)
+            ))
+
+    totaux = [[0] * len(donnees['base']) for _ in PALIERS]
+    for resultat in resultats:
+        for total, comptes in zip(totaux, resultat):
+            for joueur, compte in enumerate(comptes):
+                total[joueur] += compte
+    return totaux
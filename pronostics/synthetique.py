@@ -0,0 +1,99 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import referentiel
+from .cache import incrementer_version
+from .classement import mettre_a_jour_saison
+from .models import Equipe, Match, Pronostic, Saison
+
+# -------------------------------
+# Jeu de données synthétique (benchmarks)
+# -------------------------------
+PREFIXE_JOUEURS = 'synth'
+PREFIXE_EQUIPES = 'Équipe synthétique'
+
+# Répartition réaliste des buts marqués par une équipe sur un match (0 à 4)
+POIDS_BUTS = (30, 35, 20, 10, 5)
+
+
+def _buts(aleatoire):
+    return aleatoire.choices(range(len(POIDS_BUTS)), weights=POIDS_BUTS)[0]
+
+
+def _annee_courante():
+    """Première année de la saison en cours (les saisons commencent en août)"""
+    aujourdhui = timezone.localdate()
+    return aujourdhui.year if aujourdhui.month >= 7 else aujourdhui.year - 1
+
+
+@transaction.atomic
+def generer_donnees(joueurs=200, saisons=1, equipes=10, journees=10, densite=1.0, journees_jouees=None, graine=0):
+    """
+    Crée `saisons` saisons en écritures groupées : équipes, matchs (`equipes` // 2 par journée),
+    joueurs sans mot de passe et pronostics (chaque joueur pronostique un match avec la probabilité
+    `densite`). Les saisons passées sont entièrement jouées ; dans la saison courante, seules les
+    `journees_jouees` premières journées ont un score (la moitié par défaut), les suivantes sont à venir.
+    Coups d'envoi à l'heure pile, comme dans le CSV d'import. Points et classements sont recalculés en base.
+    Retourne {'saison' (courante), 'saisons', 'joueurs', 'matchs', 'pronostics'}.
+    """
+    aleatoire = random.Random(graine)
+    if journees_jouees is None:
+        journees_jouees = journees // 2
+
+    noms = [f'{PREFIXE_EQUIPES} {i + 1}' for i in range(equipes - equipes % 2)]
+    Equipe.objects.bulk_create([Equipe(nom=nom) for nom in noms], ignore_conflicts=True)
+    toutes_equipes = list(Equipe.objects.filter(nom__in=noms).order_by('nom'))
+
+    mot_de_passe = make_password(None)
+    noms_joueurs = [f'{PREFIXE_JOUEURS}{i:05d}' for i in range(joueurs)]
+    User.objects.bulk_create(
+        [User(username=nom, password=mot_de_passe) for nom in noms_joueurs], batch_size=1000, ignore_conflicts=True
+    )
+    utilisateurs = list(User.objects.filter(username__in=noms_joueurs).order_by('username'))
+
+    maintenant = timezone.now().replace(minute=0, second=0, microsecond=0)
+    annee = _annee_courante()
+    liste_saisons, matchs = [], []
+    for rang in range(saisons - 1, -1, -1):  # Des plus anciennes à la courante
+        saison, _ = Saison.objects.get_or_create(annee=f'{annee - rang}-{annee - rang + 1}')
+        saison.equipes.add(*toutes_equipes)
+        liste_saisons.append(saison)
+        jouees = journees if rang else journees_jouees
+        for journee in range(1, journees + 1):
+            # Journées jouées dans le passé, les suivantes une semaine d'écart à partir de demain
+            decalage = timedelta(days=7 * (journee - jouees - 1) + (0 if journee <= jouees else 1) - 365 * rang)
+            aleatoire.shuffle(toutes_equipes)
+            for i in range(len(toutes_equipes) // 2):
+                jouee = journee <= jouees
+                matchs.append(Match(
+                    saison=saison, journee=journee,
+                    equipe_domicile=toutes_equipes[2 * i], equipe_exterieure=toutes_equipes[2 * i + 1],
+                    date=maintenant + decalage + timedelta(hours=i),
+                    score_domicile=_buts(aleatoire) if jouee else None,
+                    score_exterieur=_buts(aleatoire) if jouee else None,
+                ))
+    referentiel.invalider()  # Équipes créées en masse, sans post_save
+    matchs = Match.objects.bulk_create(matchs, batch_size=500)
+
+    pronostics = Pronostic.objects.bulk_create([
+        Pronostic(user=user, match=match, score_domicile=_buts(aleatoire), score_exterieur=_buts(aleatoire))
+        for user in utilisateurs for match in matchs
+        if aleatoire.random() < densite
+    ], batch_size=1000, ignore_conflicts=True)
+
+    Pronostic.objects.filter(match__saison__in=liste_saisons).recalculer_points()
+    for saison in liste_saisons:
+        mettre_a_jour_saison(saison.id)
+    incrementer_version()
+    return {
+        'saison': liste_saisons[-1],
+        'saisons': liste_saisons,
+        'joueurs': utilisateurs,
+        'matchs': matchs,
+        'pronostics': len(pronostics),
+    }
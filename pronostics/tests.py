@@ -1,3 +1,1424 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from itertools import product
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Classement, ClassementJournee, Equipe, Match, Pronostic, Saison
+
+
+class ClassementTests(TestCase):
+    """Classement matérialisé mis à jour par les signaux"""
+
+    def setUp(self):
+        cache.clear()
+        self.saison = Saison.objects.create(annee='2025-2026')
+        self.toulouse = Equipe.objects.create(nom='Toulouse')
+        self.nice = Equipe.objects.create(nom='Nice')
+        self.match = Match.objects.create(
+            saison=self.saison, journee=1,
+            equipe_domicile=self.toulouse, equipe_exterieure=self.nice,
+            date=timezone.now() + timedelta(days=1),
+        )
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+
+    def test_pronostic_cree_une_ligne(self):
+        Pronostic.objects.create(user=self.alice, match=self.match, score_domicile=2, score_exterieur=1)
+        ligne = Classement.objects.get(user=self.alice, saison=self.saison)
+        self.assertEqual((ligne.points, ligne.rang), (0, 1))
+
+    def test_score_du_match_met_a_jour_le_classement(self):
+        Pronostic.objects.create(user=self.alice, match=self.match, score_domicile=2, score_exterieur=1)
+        Pronostic.objects.create(user=self.bob, match=self.match, score_domicile=1, score_exterieur=0)
+
+        self.match.score_domicile = 2
+        self.match.score_exterieur = 1
+        self.match.save()
+
+        alice = Classement.objects.get(user=self.alice, saison=self.saison)
+        bob = Classement.objects.get(user=self.bob, saison=self.saison)
+        self.assertEqual((alice.points, alice.scores_exacts, alice.rang, alice.points_derniere_journee), (5, 1, 1, 5))
+        self.assertEqual((bob.points, bob.bons_resultats, bob.rang), (4, 1, 2))
+
+    def test_ex_aequo_au_meme_rang(self):
+        Pronostic.objects.create(user=self.alice, match=self.match, score_domicile=1, score_exterieur=1)
+        Pronostic.objects.create(user=self.bob, match=self.match, score_domicile=1, score_exterieur=1)
+        self.match.score_domicile = 0
+        self.match.score_exterieur = 0
+        self.match.save()
+        rangs = set(Classement.objects.filter(saison=self.saison).values_list('rang', flat=True))
+        self.assertEqual(rangs, {1})
+
+    def test_suppression_d_un_pronostic(self):
+        Pronostic.objects.create(user=self.alice, match=self.match, score_domicile=2, score_exterieur=1)
+        prono_bob = Pronostic.objects.create(user=self.bob, match=self.match, score_domicile=2, score_exterieur=1)
+        self.match.score_domicile, self.match.score_exterieur = 2, 1
+        self.match.save()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            prono_bob.delete()
+        bob = Classement.objects.get(user=self.bob, saison=self.saison)
+        self.assertEqual((bob.points, bob.scores_exacts, bob.rang), (0, 0, 2))
+
+        # Cascade d'un utilisateur : sa ligne disparaît, les rangs des autres sont recalculés
+        charlie = User.objects.create_user('charlie')
+        Pronostic.objects.create(user=charlie, match=self.match, score_domicile=1, score_exterieur=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.delete()
+        rangs = dict(Classement.objects.filter(saison=self.saison).values_list('user__username', 'rang'))
+        self.assertEqual(rangs, {'charlie': 1, 'bob': 2})
+
+        # Cascade d'un match : pronostics supprimés en une requête, classement recalculé une fois
+        with self.captureOnCommitCallbacks() as rappels, CaptureQueriesContext(connection) as requetes:
+            self.match.delete()
+        self.assertEqual(len(rappels), 1)
+        self.assertEqual(sum('DELETE FROM "pronostics_pronostic"' in q['sql'] for q in requetes.captured_queries), 1)
+        for rappel in rappels:
+            rappel()
+        self.assertEqual(
+            list(Classement.objects.filter(saison=self.saison).values_list('user__username', 'points')),
+            [('bob', 0), ('charlie', 0)],
+        )
+
+    def test_un_seul_pronostic_par_match(self):
+        Pronostic.objects.create(user=self.alice, match=self.match, score_domicile=2, score_exterieur=1)
+        with self.assertRaises(IntegrityError):
+            Pronostic.objects.bulk_create([Pronostic(user=self.alice, match=self.match)])
+
+    def test_vue_classement(self):
+        Pronostic.objects.create(user=self.alice, match=self.match, score_domicile=2, score_exterieur=1)
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('pronostics:classement'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([u['username'] for u in response.context['classement']], ['alice'])
+
+
+class PointsEnBaseTests(TestCase):
+    """Parité entre le calcul des points en base (with_points, recalculer_points) et Pronostic.calculer_points"""
+
+    scores = [None, 0, 1, 2, 3, 4]
+
+    def setUp(self):
+        scores = self.scores
+        saison = Saison.objects.create(annee='2025-2026')
+        domicile = Equipe.objects.create(nom='Toulouse')
+        exterieur = Equipe.objects.create(nom='Nice')
+        date = timezone.now()
+        matchs = Match.objects.bulk_create([
+            Match(saison=saison, equipe_domicile=domicile, equipe_exterieure=exterieur,
+                  date=date, score_domicile=d, score_exterieur=e)
+            for d, e in product(scores, repeat=2)
+        ])
+        users = User.objects.bulk_create([
+            User(username=f'joueur{d}-{e}') for d, e in product(scores, repeat=2)
+        ])
+        Pronostic.objects.bulk_create([
+            Pronostic(user=user, match=match, score_domicile=d, score_exterieur=e)
+            for match in matchs
+            for user, (d, e) in zip(users, product(scores, repeat=2))
+        ])
+
+    def test_parite_sur_toutes_les_combinaisons(self):
+        pronos = Pronostic.objects.select_related('match').with_points()
+        self.assertEqual(len(pronos), len(self.scores) ** 4)
+        for p in pronos:
+            self.assertEqual(
+                p.points_calcules, p.calculer_points(),
+                f"prono {p.score_domicile}-{p.score_exterieur} / match {p.match.score_domicile}-{p.match.score_exterieur}",
+            )
+
+    def test_recalculer_points_en_une_requete(self):
+        with self.assertNumQueries(1):
+            Pronostic.objects.recalculer_points()
+        for p in Pronostic.objects.select_related('match'):
+            self.assertEqual(p.points, p.calculer_points())
+
+
+class ClassementRequetesTests(TestCase):
+    """Le nombre de requêtes du classement ne dépend pas du nombre de joueurs"""
+
+    def setUp(self):
+        cache.clear()
+        saison = Saison.objects.create(annee='2025-2026')
+        toulouse = Equipe.objects.create(nom='Toulouse')
+        nice = Equipe.objects.create(nom='Nice')
+        self.joue = Match.objects.create(
+            saison=saison, equipe_domicile=toulouse, equipe_exterieure=nice,
+            date=timezone.now() - timedelta(days=7), score_domicile=1, score_exterieur=0,
+        )
+        self.prochain = Match.objects.create(
+            saison=saison, journee=2, equipe_domicile=nice, equipe_exterieure=toulouse,
+            date=timezone.now() + timedelta(days=1),
+        )
+        self.nb_joueurs = 0
+        self.joueur = self.ajouter_joueurs(1)[0]
+
+    def ajouter_joueurs(self, nombre):
+        joueurs = []
+        for _ in range(nombre):
+            self.nb_joueurs += 1
+            joueur = User.objects.create_user(f'joueur{self.nb_joueurs}')
+            Pronostic.objects.create(user=joueur, match=self.joue, score_domicile=2, score_exterieur=1)
+            Pronostic.objects.create(user=joueur, match=self.prochain, score_domicile=1, score_exterieur=1)
+            joueurs.append(joueur)
+        return joueurs
+
+    def compter_requetes(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('pronostics:classement'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['classement']), self.nb_joueurs)
+        return len(requetes)
+
+    def test_nombre_de_requetes_constant(self):
+        self.client.force_login(self.joueur)
+        avant = self.compter_requetes()
+        self.ajouter_joueurs(10)
+        self.assertEqual(self.compter_requetes(), avant)
+
+    def test_prono_semaine(self):
+        self.client.force_login(self.joueur)
+        response = self.client.get(reverse('pronostics:classement'))
+        ligne = response.context['classement'][0]
+        self.assertEqual((ligne['total'], ligne['prono_semaine'], ligne['points_semaine']), (4, '1-1', 0))
+
+
+class CSVMatchsMixin:
+    """Écriture de CSV de matchs temporaires"""
+
+    ENTETE = ['Saison', 'Journée', 'Equipe domicile', 'Equipe extérieure', 'Date', 'Heure', 'Score domicile', 'Score extérieur']
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.chemin = os.path.join(dossier.name, 'matchs.csv')
+
+    def ecrire_csv(self, lignes):
+        with open(self.chemin, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.ENTETE)
+            writer.writerows(lignes)
+        return self.chemin
+
+    def saisons(self, nb_saisons, nb_equipes=20):
+        """Calendrier aller-retour complet : nb_equipes * (nb_equipes - 1) matchs par saison"""
+        lignes = []
+        for s in range(nb_saisons):
+            annee = f'{2000 + s}-{2001 + s}'
+            numero = 0
+            for dom in range(nb_equipes):
+                for ext in range(nb_equipes):
+                    if dom != ext:
+                        numero += 1
+                        jour = f'{2000 + s}-09-01'
+                        heure = f'{numero // 60 % 24:02d}:{numero % 60:02d}'
+                        lignes.append([annee, numero // 10 + 1, f'Equipe {dom}', f'Equipe {ext}', jour, heure, dom % 4, ext % 3])
+        return lignes
+
+
+class ImportCSVTests(CSVMatchsMixin, TestCase):
+    """Import en masse des matchs depuis le CSV"""
+
+    def importer(self, lignes):
+        from watchers.import_csv import import_csv
+        chemin = self.ecrire_csv(lignes)
+        with CaptureQueriesContext(connection) as requetes:
+            self.resume = import_csv(chemin)
+        return len(requetes)
+
+    def test_import_puis_mise_a_jour_et_suppression(self):
+        lignes = [
+            ['2025-2026', 1, 'Nice', 'Toulouse', '2025-08-16', '21:05', '', ''],
+            ['2025-2026', 2, 'Toulouse', 'Brest', '2025-08-24', '17:15', '', ''],
+        ]
+        self.importer(lignes)
+        self.assertEqual(Match.objects.count(), 2)
+        self.assertEqual(Equipe.objects.count(), 3)
+
+        user = User.objects.create_user('alice')
+        match = Match.objects.get(equipe_domicile__nom='Nice')
+        Pronostic.objects.create(user=user, match=match, score_domicile=0, score_exterieur=1)
+
+        self.importer([['2025-2026', 1, 'Nice', 'Toulouse', '2025-08-16', '21:05', '0', '1']])
+        self.assertEqual(list(Match.objects.values_list('score_domicile', 'score_exterieur')), [(0, 1)])
+        self.assertEqual(Classement.objects.get(user=user).points, 5)
+        self.assertEqual(Pronostic.objects.get(user=user).points, 5)
+        self.assertEqual(self.resume, {'crees': 0, 'mis_a_jour': 1, 'supprimes': 1, 'inchanges': 0})
+
+    def test_photos_apres_changement_de_journee_et_suppression(self):
+        lignes = [
+            ['2025-2026', 1, 'Nice', 'Toulouse', '2025-08-16', '21:05', '', ''],
+            ['2025-2026', 1, 'Brest', 'Lille', '2025-08-16', '17:00', '', ''],
+            ['2025-2026', 2, 'Toulouse', 'Brest', '2025-08-24', '17:15', '', ''],
+        ]
+        self.importer(lignes)
+        alice = User.objects.create_user('alice')
+        for match in Match.objects.all():
+            Pronostic.objects.create(user=alice, match=match, score_domicile=1, score_exterieur=0)
+        for ligne in lignes:
+            ligne[6:] = ['1', '0']
+        self.importer(lignes)
+
+        def photos():
+            return dict(ClassementJournee.objects.filter(user=alice).values_list('journee', 'points'))
+
+        self.assertEqual(photos(), {1: 10, 2: 15})
+
+        # Match de la journée 2 déplacé en journée 1 : la journée 2 n'existe plus, la 1 compte trois matchs
+        lignes[2][1] = 1
+        self.importer(lignes)
+        self.assertEqual(photos(), {1: 15})
+
+        # Match supprimé du calendrier : la journée 1 est réécrite sans lui
+        self.importer(lignes[1:])
+        self.assertEqual(photos(), {1: 10})
+
+    def test_reimport_ne_reecrit_que_les_lignes_modifiees(self):
+        lignes = self.saisons(1, nb_equipes=6)
+        self.importer(lignes)
+        self.assertEqual(self.resume['crees'], len(lignes))
+
+        # Fichier identique : ignoré sans lire les lignes
+        self.assertLess(self.importer(lignes), 5)
+        self.assertEqual(self.resume, {'crees': 0, 'mis_a_jour': 0, 'supprimes': 0, 'inchanges': 0})
+
+        # Un seul score modifié
+        lignes[3][6] = 9
+        self.importer(lignes)
+        self.assertEqual(self.resume, {'crees': 0, 'mis_a_jour': 1, 'supprimes': 0, 'inchanges': len(lignes) - 1})
+        self.assertTrue(Match.objects.filter(score_domicile=9).exists())
+
+    def test_import_multi_saisons_en_masse(self):
+        lignes = self.saisons(8)
+        debut = time.perf_counter()
+        nb_requetes = self.importer(lignes)
+        duree = time.perf_counter() - debut
+        self.assertEqual(Match.objects.count(), len(lignes))
+        # Indépendant du nombre de lignes : quelques requêtes par saison (classement, photos) et par lot
+        self.assertLess(nb_requetes, 150)
+        self.assertLess(duree, 1)
+
+
+class ImportCSVFluxTests(CSVMatchsMixin, TestCase):
+    """Import en flux par lots, avec lignes invalides"""
+
+    def importer_flux(self, lignes, **kwargs):
+        from watchers.import_csv import import_csv_flux
+        return import_csv_flux(self.ecrire_csv(lignes), **kwargs)
+
+    def test_lots_et_lignes_invalides_ignorees(self):
+        lignes = self.saisons(1, nb_equipes=6)
+        lignes[2][4] = '2025-13-45'  # date invalide
+        lignes[5][6] = 'x'  # score invalide
+        resume = self.importer_flux(lignes, taille_lot=7)
+        self.assertEqual(resume['erreurs'], 2)
+        self.assertEqual(resume['crees'], len(lignes) - 2)
+        self.assertEqual(Match.objects.count(), len(lignes) - 2)
+        self.assertIn('lignes_par_seconde', resume)
+
+        # Réimport : rien à créer, et l'import en flux ne supprime rien
+        resume = self.importer_flux(lignes[:10], taille_lot=7)
+        self.assertEqual((resume['crees'], resume['mis_a_jour'], resume['inchanges']), (0, 0, 8))
+        self.assertEqual(Match.objects.count(), len(lignes) - 2)
+
+    def test_arret_sur_erreur_conserve_les_lots_ecrits(self):
+        lignes = self.saisons(1, nb_equipes=6)
+        lignes[12][1] = 'J3'
+        resume = self.importer_flux(lignes, taille_lot=5, sur_erreur='arreter')
+        self.assertEqual(resume['erreurs'], 1)
+        self.assertEqual(Match.objects.count(), 12)
+
+    def test_import_complet_annule_sur_ligne_invalide(self):
+        lignes = self.saisons(1, nb_equipes=4)
+        lignes[1][4] = 'demain'
+        from watchers.import_csv import import_csv
+        self.assertIsNone(import_csv(self.ecrire_csv(lignes)))
+        self.assertEqual(Match.objects.count(), 0)
+
+
+class ImportUsersTests(TestCase):
+    """Synchronisation en masse des utilisateurs"""
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.chemin = os.path.join(dossier.name, 'users.csv')
+
+    def importer(self, lignes):
+        from watchers.import_users import import_users
+        with open(self.chemin, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['username', 'email', 'first_name', 'last_name'])
+            writer.writerows(lignes)
+        with CaptureQueriesContext(connection) as requetes:
+            resume = import_users(self.chemin)
+        return resume, len(requetes)
+
+    def test_creation_mise_a_jour_suppression(self):
+        User.objects.create_superuser('Alex', 'alex@example.com', 'secret')
+        self.importer([
+            ['alice', 'alice@example.com', 'Alice', ''],
+            ['bob', 'bob@example.com', 'Bob', ''],
+        ])
+        self.assertFalse(User.objects.get(username='alice').has_usable_password())
+
+        resume, _ = self.importer([['alice', 'alice@exemple.fr', 'Alice', 'Martin']])
+        self.assertEqual(resume, {'crees': 0, 'mis_a_jour': 1, 'supprimes': 1})
+        alice = User.objects.get(username='alice')
+        self.assertEqual((alice.email, alice.last_name), ('alice@exemple.fr', 'Martin'))
+        self.assertEqual(set(User.objects.values_list('username', flat=True)), {'Alex', 'alice'})
+
+    def test_nombre_de_requetes_independant_du_nombre_d_utilisateurs(self):
+        lignes = [[f'joueur{i}', f'joueur{i}@example.com', '', ''] for i in range(3000)]
+        resume, nb_requetes = self.importer(lignes)
+        self.assertEqual(resume['crees'], 3000)
+        # Seules les insertions par lots (limite de paramètres SQLite) dépendent du volume
+        self.assertLess(nb_requetes, len(lignes) // 50)
+
+        lignes = [[u, e.replace('example.com', 'exemple.fr'), p, n] for u, e, p, n in lignes[:1500]]
+        resume, nb_requetes = self.importer(lignes)
+        self.assertEqual(resume, {'crees': 0, 'mis_a_jour': 1500, 'supprimes': 1500})
+        self.assertLess(nb_requetes, 3000 // 50)
+
+
+class FileAttenteImportsTests(SimpleTestCase):
+    """Anti-rebond et file d'attente de la commande watch_imports"""
+
+    def setUp(self):
+        from pronostics.management.commands.watch_imports import FileAttenteImports
+        self.appels = []
+        self.termine = threading.Event()
+
+        def importer(chemin):
+            self.appels.append(chemin)
+            self.termine.set()
+
+        self.file_attente = FileAttenteImports({'matchs.csv': importer}, delai=0.05, journal=lambda message: None)
+        self.file_attente.demarrer()
+        self.addCleanup(self.file_attente.arreter, 1)
+
+    def test_rafale_regroupee_en_un_import(self):
+        for _ in range(5):
+            self.file_attente.signaler('/import/matchs.csv')
+            time.sleep(0.01)
+        self.assertTrue(self.termine.wait(1))
+        time.sleep(0.1)
+        self.assertEqual(self.appels, ['/import/matchs.csv'])
+
+    def test_fichiers_ignores(self):
+        self.file_attente.signaler('/import/.matchs.csv.swp')
+        self.assertFalse(self.termine.wait(0.15))
+        self.assertEqual(self.appels, [])
+
+    def test_projections_apres_import(self):
+        from pronostics.management.commands.watch_imports import ProjectionsEnArrierePlan
+        calculs = []
+        journal = []
+        en_cours = threading.Event()
+        reprise = threading.Event()
+
+        def projeter():
+            calculs.append(len(calculs))
+            if len(calculs) == 1:
+                en_cours.set()
+                reprise.wait(1)
+                raise RuntimeError('panne')
+            return ['2025-2026']
+
+        projections = ProjectionsEnArrierePlan(projeter, journal=journal.append)
+        projections.demarrer()
+        self.addCleanup(projections.arreter, 1)
+        projections.demander()
+        self.assertTrue(en_cours.wait(1))
+        for _ in range(3):  # Pendant le calcul : un seul calcul de plus
+            projections.demander()
+        reprise.set()
+        time.sleep(0.2)
+        self.assertEqual(calculs, [0, 1])
+        self.assertIn('Projection en échec', journal[0])
+        self.assertIn('Projection de 2025-2026 terminée', journal[1])
+
+    def test_lecture_par_l_import_sans_relance(self):
+        from watchdog.observers import Observer
+        from pronostics.management.commands.watch_imports import CSVHandler, FileAttenteImports
+
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        lectures = []
+
+        def importer(chemin):  # Lit le fichier comme les vrais imports : événements opened / closed_no_write
+            with open(chemin) as f:
+                lectures.append(f.read())
+
+        file_attente = FileAttenteImports({'matchs.csv': importer}, delai=0.3, journal=lambda message: None)
+        file_attente.demarrer()
+        self.addCleanup(file_attente.arreter, 1)
+        observer = Observer()
+        observer.schedule(CSVHandler(file_attente), path=dossier.name, recursive=False)
+        observer.start()
+        self.addCleanup(observer.join, 1)
+        self.addCleanup(observer.stop)
+
+        with open(os.path.join(dossier.name, 'matchs.csv'), 'w') as f:
+            f.write('journee\n')
+        time.sleep(2)
+        self.assertEqual(lectures, ['journee\n'])
+
+
+class ClassementJourneeTests(TestCase):
+    """Photos du classement par journée et page d'historique"""
+
+    def setUp(self):
+        cache.clear()
+        self.saison = Saison.objects.create(annee='2025-2026')
+        equipes = [Equipe.objects.create(nom=nom) for nom in ('Toulouse', 'Nice', 'Brest', 'Lille')]
+        passe = timezone.now() - timedelta(days=30)
+        self.j1 = [
+            Match.objects.create(saison=self.saison, journee=1, equipe_domicile=equipes[0], equipe_exterieure=equipes[1], date=passe),
+            Match.objects.create(saison=self.saison, journee=1, equipe_domicile=equipes[2], equipe_exterieure=equipes[3], date=passe),
+        ]
+        self.j2 = Match.objects.create(saison=self.saison, journee=2, equipe_domicile=equipes[1], equipe_exterieure=equipes[0], date=passe)
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+        for match in self.j1 + [self.j2]:
+            Pronostic.objects.create(user=self.alice, match=match, score_domicile=1, score_exterieur=0)
+            Pronostic.objects.create(user=self.bob, match=match, score_domicile=0, score_exterieur=1)
+
+    def jouer(self, match, domicile, exterieur):
+        match.score_domicile = domicile
+        match.score_exterieur = exterieur
+        match.save()
+
+    def test_photo_ecrite_quand_la_journee_est_terminee(self):
+        self.jouer(self.j1[0], 1, 0)
+        self.assertFalse(ClassementJournee.objects.exists())
+        self.jouer(self.j1[1], 2, 0)
+        photos = {p.user.username: (p.rang, p.points) for p in ClassementJournee.objects.filter(journee=1)}
+        self.assertEqual(photos, {'alice': (1, 8), 'bob': (2, 0)})
+
+    def test_photos_reecrites_apres_un_match_reporte_ou_un_score_corrige(self):
+        def photos():
+            return {(p.journee, p.user.username): p.points for p in ClassementJournee.objects.select_related('user')}
+
+        # j1[1] reporté : la journée 2 est terminée (et photographiée) avant la journée 1
+        self.jouer(self.j1[0], 1, 0)
+        self.jouer(self.j2, 0, 1)
+        self.assertEqual(photos(), {(2, 'alice'): 5, (2, 'bob'): 5})
+
+        # Le match reporté termine la journée 1 et change le cumul de la journée 2
+        self.jouer(self.j1[1], 1, 0)
+        self.assertEqual(photos(), {(1, 'alice'): 10, (1, 'bob'): 0, (2, 'alice'): 10, (2, 'bob'): 5})
+
+        # Score corrigé : sa journée et les suivantes sont réécrites
+        self.jouer(self.j1[0], 0, 1)
+        self.assertEqual(photos(), {(1, 'alice'): 5, (1, 'bob'): 5, (2, 'alice'): 5, (2, 'bob'): 10})
+        self.assertEqual(ClassementJournee.objects.get(journee=2, user=self.bob).rang, 1)
+
+    def test_photos_reecrites_apres_un_changement_de_journee(self):
+        self.jouer(self.j1[0], 1, 0)
+        self.jouer(self.j1[1], 1, 0)
+        self.jouer(self.j2, 0, 1)
+        self.j2.journee = 1  # Correction dans l'admin
+        self.j2.save()
+        photos = {(p.journee, p.user.username): p.points for p in ClassementJournee.objects.select_related('user')}
+        self.assertEqual(photos, {(1, 'alice'): 10, (1, 'bob'): 5})
+
+    def test_historique_et_exports(self):
+        self.jouer(self.j1[0], 1, 0)
+        self.jouer(self.j1[1], 1, 0)
+        self.jouer(self.j2, 0, 3)
+
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('pronostics:historique'))
+        self.assertEqual(response.context['journee'], 2)
+        lignes = {l['username']: l for l in response.context['lignes']}
+        self.assertEqual((lignes['bob']['rang'], lignes['bob']['evolution'], lignes['bob']['gain_points']), (2, 0, 3))
+
+        response = self.client.get(reverse('pronostics:historique_export', args=['csv']) + '?journee=1')
+        self.assertIn('1,alice,10,10,', response.content.decode())
+        response = self.client.get(reverse('pronostics:historique_export', args=['pdf']))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF-1.4'))
+        self.assertTrue(response.content.rstrip().endswith(b'%%EOF'))
+
+
+class CacheVuesTests(TestCase):
+    """Cache des pages invalidé par la version des données"""
+
+    def setUp(self):
+        cache.clear()
+        saison = Saison.objects.create(annee='2025-2026')
+        toulouse = Equipe.objects.create(nom='Toulouse')
+        nice = Equipe.objects.create(nom='Nice')
+        self.match = Match.objects.create(
+            saison=saison, equipe_domicile=toulouse, equipe_exterieure=nice,
+            date=timezone.now() + timedelta(days=1),
+        )
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+
+    def test_classement_servi_depuis_le_cache_puis_invalide(self):
+        from .cache import statistiques
+        Pronostic.objects.create(user=self.alice, match=self.match, score_domicile=1, score_exterieur=0)
+        self.client.force_login(self.alice)
+        url = reverse('pronostics:classement')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url)
+        self.assertNotContains(response, 'bob')
+        # Seules la session et l'utilisateur sont lus
+        self.assertEqual(len(requetes), 2)
+        self.assertEqual(statistiques(['classement'])['classement'], {'hit': 1, 'miss': 1})
+
+        Pronostic.objects.create(user=self.bob, match=self.match, score_domicile=2, score_exterieur=0)
+        self.assertContains(self.client.get(url), 'bob')
+
+    def test_mes_pronos_par_utilisateur(self):
+        Pronostic.objects.create(user=self.alice, match=self.match, score_domicile=3, score_exterieur=2)
+        url = reverse('pronostics:mes_pronos')
+        self.client.force_login(self.alice)
+        self.assertContains(self.client.get(url), '3 - 2')
+        self.client.force_login(self.bob)
+        self.assertNotContains(self.client.get(url), '3 - 2')
+
+
+class ConcurrenceTests(TransactionTestCase):
+    """Rush avant le coup d'envoi : N écrivains en parallèle, aucune erreur de verrou"""
+
+    NB_ECRIVAINS = 16
+    NB_ECRITURES = 5
+
+    def test_ecrivains_paralleles(self):
+        from .db import enregistrer_pronostic
+        saison = Saison.objects.create(annee='2025-2026')
+        match = Match.objects.create(
+            saison=saison,
+            equipe_domicile=Equipe.objects.create(nom='Toulouse'),
+            equipe_exterieure=Equipe.objects.create(nom='Nice'),
+            date=timezone.now() + timedelta(hours=1),
+        )
+        joueurs = [User.objects.create_user(f'joueur{i}') for i in range(self.NB_ECRIVAINS)]
+        erreurs = []
+        depart = threading.Barrier(self.NB_ECRIVAINS)
+
+        def ecrire(joueur):
+            try:
+                depart.wait()
+                for buts in range(self.NB_ECRITURES):
+                    enregistrer_pronostic(joueur, match, buts, 0)
+            except Exception as e:
+                erreurs.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=ecrire, args=(joueur,)) for joueur in joueurs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(erreurs, [])
+        self.assertEqual(Pronostic.objects.filter(match=match).count(), self.NB_ECRIVAINS)
+        self.assertEqual(set(Pronostic.objects.values_list('score_domicile', flat=True)), {self.NB_ECRITURES - 1})
+
+
+    def test_meme_journee_soumise_deux_fois(self):
+        # Double clic ou deux onglets : deux écritures de la même journée par le même joueur
+        from unittest import mock
+        from .db import enregistrer_pronostics
+        saison = Saison.objects.create(annee='2025-2026')
+        equipes = [Equipe.objects.create(nom=nom) for nom in ('Toulouse', 'Nice', 'Brest', 'Lille')]
+        matchs = [
+            Match.objects.create(
+                saison=saison, equipe_domicile=equipes[i], equipe_exterieure=equipes[i + 1],
+                date=timezone.now() + timedelta(hours=1),
+            )
+            for i in (0, 2)
+        ]
+        joueur = User.objects.create_user('joueur')
+        erreurs = []
+        depart = threading.Barrier(2)
+        filtre = Pronostic.objects.filter
+
+        def lecture_avant_l_autre_ecriture(*args, **kwargs):
+            # Chaque soumission lit avant que l'autre n'ait validé (READ COMMITTED) : aucun pronostic existant
+            if 'match_id__in' in kwargs:
+                return Pronostic.objects.none()
+            return filtre(*args, **kwargs)
+
+        def ecrire(buts):
+            try:
+                depart.wait()
+                enregistrer_pronostics(joueur, {match: (buts, 0) for match in matchs})
+            except Exception as e:
+                erreurs.append(e)
+            finally:
+                connection.close()
+
+        with mock.patch.object(Pronostic.objects, 'filter', side_effect=lecture_avant_l_autre_ecriture):
+            threads = [threading.Thread(target=ecrire, args=(buts,)) for buts in (1, 2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(erreurs, [])
+        self.assertEqual(Pronostic.objects.filter(user=joueur).count(), 2)
+        self.assertEqual(len(set(Pronostic.objects.values_list('score_domicile', flat=True))), 1)
+
+
+class PronostiquerJourneeTests(TestCase):
+    """Saisie de tous les pronostics d'une journée en une requête"""
+
+    def setUp(self):
+        cache.clear()
+        self.saison = Saison.objects.create(annee='2025-2026')
+        equipes = [Equipe.objects.create(nom=f'Equipe {i}') for i in range(6)]
+        demain = timezone.now() + timedelta(days=1)
+        self.ouverts = [
+            Match.objects.create(saison=self.saison, journee=3, equipe_domicile=equipes[0], equipe_exterieure=equipes[1], date=demain),
+            Match.objects.create(saison=self.saison, journee=3, equipe_domicile=equipes[2], equipe_exterieure=equipes[3], date=demain),
+        ]
+        self.commence = Match.objects.create(
+            saison=self.saison, journee=3, equipe_domicile=equipes[4], equipe_exterieure=equipes[5],
+            date=timezone.now() - timedelta(minutes=5),
+        )
+        self.alice = User.objects.create_user('alice')
+        self.client.force_login(self.alice)
+        self.url = reverse('pronostics:pronostiquer_journee', args=[3])
+
+    def test_affichage_sans_ecriture(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Pronostic.objects.exists())
+        self.assertFalse(any(q['sql'].startswith(('INSERT', 'UPDATE')) for q in requetes))
+        self.assertEqual([l['ouvert'] for l in response.context['lignes']], [False, True, True])
+
+    def test_enregistrement_de_toute_la_journee(self):
+        Pronostic.objects.create(user=self.alice, match=self.ouverts[1], score_domicile=0, score_exterieur=0)
+        response = self.client.post(self.url, {
+            f'm{self.ouverts[0].id}-score_domicile': '2', f'm{self.ouverts[0].id}-score_exterieur': '1',
+            f'm{self.ouverts[1].id}-score_domicile': '1', f'm{self.ouverts[1].id}-score_exterieur': '3',
+            f'm{self.commence.id}-score_domicile': '5', f'm{self.commence.id}-score_exterieur': '5',
+        })
+        self.assertRedirects(response, reverse('pronostics:mes_pronos'))
+        scores = dict(Pronostic.objects.values_list('match_id', 'score_domicile'))
+        self.assertEqual(scores, {self.ouverts[0].id: 2, self.ouverts[1].id: 1})
+        self.assertTrue(Classement.objects.filter(user=self.alice, saison=self.saison).exists())
+
+    def test_un_score_invalide_n_ecrit_rien(self):
+        response = self.client.post(self.url, {
+            f'm{self.ouverts[0].id}-score_domicile': '2', f'm{self.ouverts[0].id}-score_exterieur': '1',
+            f'm{self.ouverts[1].id}-score_domicile': '1', f'm{self.ouverts[1].id}-score_exterieur': '',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Pronostic.objects.exists())
+        self.assertTrue(response.context['lignes'][2]['form'].errors)
+
+
+class APITests(TestCase):
+    """API JSON : pagination par curseur et réponses conditionnelles"""
+
+    def setUp(self):
+        cache.clear()
+        self.saison = Saison.objects.create(annee='2025-2026')
+        equipes = [Equipe.objects.create(nom=f'Equipe {i}') for i in range(2)]
+        demain = timezone.now() + timedelta(days=1)
+        self.matchs = [
+            Match.objects.create(saison=self.saison, journee=1, equipe_domicile=equipes[0], equipe_exterieure=equipes[1], date=demain + timedelta(hours=i))
+            for i in range(5)
+        ]
+        self.alice = User.objects.create_user('alice')
+        self.client.force_login(self.alice)
+
+    def test_authentification_requise(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('pronostics:api_classement')).status_code, 401)
+
+    def test_pagination_par_curseur(self):
+        url = reverse('pronostics:api_matchs_a_venir')
+        ids, curseur, pages = [], None, 0
+        while True:
+            response = self.client.get(url, {'limite': 2, **({'curseur': curseur} if curseur else {})})
+            self.assertEqual(response.status_code, 200)
+            donnees = response.json()
+            ids += [m['id'] for m in donnees['resultats']]
+            pages += 1
+            curseur = donnees['suivant']
+            if curseur is None:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, [m.id for m in self.matchs])
+        self.assertEqual(self.client.get(url, {'curseur': '!!!'}).status_code, 400)
+
+    def test_curseur_modifie(self):
+        from .api import _encoder_curseur
+        for url, valeurs in (
+            (reverse('pronostics:api_matchs_a_venir'), ['pas-une-date', 1]),
+            (reverse('pronostics:api_matchs_a_venir'), [timezone.now().isoformat(), 'abc']),
+            (reverse('pronostics:api_classement'), ['abc', 1]),
+            (reverse('pronostics:api_classement'), [[1], {'a': 1}]),
+            (reverse('pronostics:api_mes_pronos'), [None, 1]),
+        ):
+            response = self.client.get(url, {'curseur': _encoder_curseur(valeurs)})
+            self.assertEqual(response.status_code, 400, valeurs)
+            self.assertEqual(response.json(), {'erreur': 'Curseur invalide'})
+
+    def test_saison_inconnue(self):
+        for nom in ('api_classement', 'api_autour_de_moi', 'api_mes_pronos'):
+            response = self.client.get(reverse(f'pronostics:{nom}'), {'saison': '1900-1901'})
+            self.assertEqual((response.status_code, response.json()), (404, {'erreur': 'Saison inconnue'}), nom)
+
+    def test_304_tant_que_rien_ne_change(self):
+        url = reverse('pronostics:api_mes_pronos')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Pronostic.objects.create(user=self.alice, match=self.matchs[0], score_domicile=1, score_exterieur=0)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['resultats'][0]['prono'], [1, 0])
+
+
+@override_settings(ROOT_URLCONF='config.urls_asgi')
+class VuesAsyncTests(TestCase):
+    """Versions async (ASGI) des pages en lecture et de l'API : même contenu que les vues sync"""
+
+    def setUp(self):
+        cache.clear()
+        from .synthetique import generer_donnees
+        donnees = generer_donnees(joueurs=5, equipes=4, journees=4)
+        self.joueur = donnees['joueurs'][0]
+        self.async_client.force_login(self.joueur)
+        self.client.force_login(self.joueur)
+
+    async def test_pages_identiques_aux_vues_sync(self):
+        for nom, cle in (('accueil', 'prochain_match'), ('classement', 'classement'), ('mes_pronos', 'pronos_par_journee')):
+            reponse_async = await self.async_client.get(reverse(f'pronostics:{nom}'))
+            self.assertEqual(reponse_async.status_code, 200, nom)
+            with override_settings(ROOT_URLCONF='config.urls'):
+                await cache.aclear()
+                reponse_sync = await sync_to_async(self.client.get)(reverse(f'pronostics:{nom}'))
+            attendu = reponse_sync.context[cle]
+            if nom == 'classement':
+                attendu = await sync_to_async(list)(attendu)
+            self.assertEqual(reponse_async.context[cle], attendu, nom)
+
+    async def test_api_async_conditionnelle(self):
+        url = reverse('pronostics:api_mes_pronos')
+        response = await self.async_client.get(url, {'limite': 3})
+        self.assertEqual(response.status_code, 200)
+        donnees = response.json()
+        self.assertEqual(len(donnees['resultats']), 3)
+        suite = await self.async_client.get(url, {'limite': 3, 'curseur': donnees['suivant']})
+        self.assertEqual(len(suite.json()['resultats']), 3)
+        self.assertEqual(
+            (await self.async_client.get(url, {'limite': 3}, headers={'if-none-match': response['ETag']})).status_code, 304
+        )
+        response = await self.async_client.get(url, {'saison': '1900-1901'})
+        self.assertEqual((response.status_code, response.json()), (404, {'erreur': 'Saison inconnue'}))
+        await self.async_client.alogout()
+        self.assertEqual((await self.async_client.get(url)).status_code, 401)
+
+
+    async def test_cache_lu_hors_de_la_boucle(self):
+        from unittest import mock
+        from django.core.cache import caches
+        dans_la_boucle = []
+
+        def espion(methode):
+            def appel(cache_, *args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    dans_la_boucle.append(methode.__name__)
+                except RuntimeError:  # Thread de sync_to_async : pas de boucle
+                    pass
+                return methode(cache_, *args, **kwargs)
+            return appel
+
+        classe = type(caches['default'])
+        with contextlib.ExitStack() as pile:
+            for nom in ('get', 'set', 'add', 'incr', 'get_many'):
+                pile.enter_context(mock.patch.object(classe, nom, espion(getattr(classe, nom))))
+            for nom in ('accueil', 'classement', 'api_mes_pronos'):
+                for _ in range(2):  # Calcul puis page en cache (ou 304)
+                    self.assertIn((await self.async_client.get(reverse(f'pronostics:{nom}'))).status_code, (200, 304))
+        self.assertEqual(dans_la_boucle, [])
+
+
+class BenchmarksTests(TestCase):
+    """Suite de benchmarks : chaque scénario tourne et reste sous les seuils de requêtes de la petite taille"""
+
+    def test_suite_sur_petit_jeu(self):
+        from .benchmarks import SCENARIOS, SEUILS, depassements, mesurer
+        resultats = {'petite': mesurer({'joueurs': 4, 'equipes': 4, 'journees': 4}, repetitions=1)}
+        self.assertEqual(set(resultats['petite']['scenarios']), set(SCENARIOS))
+        seuils_requetes = {nom: {'requetes': seuil['requetes']} for nom, seuil in SEUILS['petite'].items()}
+        self.assertEqual(depassements(resultats, {'petite': seuils_requetes}), [])
+
+    def test_regression_par_rapport_a_la_reference(self):
+        from .benchmarks import depassements
+        mesure = {'requetes': 8, 'ms_median': 30.0}
+        reference = {'petite': {'scenarios': {'classement': {'requetes': 7, 'ms_median': 10.0}}}}
+        messages = depassements({'petite': {'scenarios': {'classement': mesure}}}, {}, reference, tolerance=0.5)
+        self.assertEqual(len(messages), 2)
+
+
+class InstrumentationTests(TestCase):
+    """Server-Timing, métriques Prometheus par vue et journal des requêtes lentes"""
+
+    def setUp(self):
+        from .instrumentation import metriques
+        cache.clear()
+        metriques.reinitialiser()
+        Saison.objects.create(annee='2025-2026')
+        self.alice = User.objects.create_user('alice')
+        self.client.force_login(self.alice)
+
+    def test_server_timing_compte_les_requetes(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('pronostics:classement'))
+        self.assertIn(f'desc="{len(requetes)} requetes"', response['Server-Timing'])
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, sql;dur=[\d.]+;.*, sql-max;dur=[\d.]+$')
+
+    def test_metriques_reservees_a_l_equipe(self):
+        self.client.get(reverse('pronostics:classement'))
+        url = reverse('pronostics:metriques')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        User.objects.filter(pk=self.alice.pk).update(is_staff=True)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        texte = response.content.decode()
+        self.assertIn('pronostics_http_duree_secondes_count{vue="pronostics:classement"} 1', texte)
+        self.assertIn('pronostics_http_sql_requetes_bucket{vue="pronostics:classement",le="+Inf"} 1', texte)
+        self.assertIn('pronostics_http_sql_plus_lente_secondes{vue="pronostics:classement"} ', texte)
+        self.assertNotIn('sql=', texte)
+
+    @override_settings(PRONOSTICS_SEUIL_REQUETE_LENTE_MS=0)
+    def test_journal_des_requetes_lentes(self):
+        from unittest import mock
+        from .instrumentation import journal_requetes_lentes
+        with mock.patch.object(journal_requetes_lentes, 'handlers', []), self.assertLogs(journal_requetes_lentes) as journal:
+            self.client.get(reverse('pronostics:classement'))
+        self.assertTrue(any('/classement/ : SELECT' in ligne for ligne in journal.output))
+        # Les valeurs des paramètres (ici l'identifiant de session et le nom d'utilisateur) n'y figurent pas
+        sortie = '\n'.join(journal.output)
+        self.assertNotIn(self.client.session.session_key, sortie)
+        self.assertNotIn("'alice'", sortie)
+        self.assertRegex(sortie, r'\(paramètres \d+\)')
+
+    @override_settings(ROOT_URLCONF='config.urls_asgi')
+    async def test_requetes_comptees_sous_asgi(self):
+        await sync_to_async(self.async_client.force_login)(self.alice)
+        response = await self.async_client.get(reverse('pronostics:api_classement'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('desc="0 requetes"', response['Server-Timing'])
+
+
+class SaisonsTests(TestCase):
+    """Classement et mes pronos par saison, archivage d'une saison terminée"""
+
+    def setUp(self):
+        from .synthetique import generer_donnees
+        cache.clear()
+        donnees = generer_donnees(joueurs=3, saisons=2, equipes=4, journees=3)
+        self.ancienne, self.courante = donnees['saisons']
+        self.joueur = donnees['joueurs'][0]
+        self.client.force_login(self.joueur)
+
+    def test_saison_courante_par_defaut_et_selecteur(self):
+        url = reverse('pronostics:mes_pronos')
+        matchs = lambda response: {p['match_id'] for j in response.context['pronos_par_journee'] for p in j['pronos']}
+        response = self.client.get(url)
+        self.assertEqual(matchs(response), set(Match.objects.filter(saison=self.courante).values_list('id', flat=True)))
+        response = self.client.get(url, {'saison': self.ancienne.annee})
+        self.assertEqual(matchs(response), set(Match.objects.filter(saison=self.ancienne).values_list('id', flat=True)))
+        self.assertContains(response, f'<option value="{self.ancienne.annee}" selected>')
+
+        response = self.client.get(reverse('pronostics:classement'), {'saison': self.ancienne.annee})
+        attendu = list(Classement.objects.filter(saison=self.ancienne).order_by('rang', '-scores_exacts', 'user__username').values_list('points', flat=True))
+        self.assertEqual([l['total'] for l in response.context['classement']], attendu)
+        self.assertIsNone(response.context['prochain_match'])
+        self.assertEqual(self.client.get(url, {'saison': '1900-1901'}).status_code, 404)
+
+    def test_archivage(self):
+        from .classement import SaisonNonTerminee, archiver_saison
+        with self.assertRaises(SaisonNonTerminee):
+            archiver_saison(self.courante.id)
+
+        classement_avant = list(Classement.objects.filter(saison=self.ancienne).values_list('user_id', 'points', 'rang').order_by('user_id'))
+        photos_avant = ClassementJournee.objects.filter(saison=self.ancienne).count()
+        supprimes = archiver_saison(self.ancienne.id)
+
+        self.assertGreater(supprimes, 0)
+        self.assertFalse(Pronostic.objects.filter(match__saison=self.ancienne).exists())
+        self.assertTrue(Pronostic.objects.filter(match__saison=self.courante).exists())
+        self.assertEqual(ClassementJournee.objects.filter(saison=self.ancienne).count(), photos_avant)
+
+        # Un score corrigé après archivage ne réécrit pas le classement définitif
+        match = Match.objects.filter(saison=self.ancienne).first()
+        match.score_domicile += 1
+        match.save()
+        self.assertEqual(
+            list(Classement.objects.filter(saison=self.ancienne).values_list('user_id', 'points', 'rang').order_by('user_id')),
+            classement_avant,
+        )
+
+        cache.clear()
+        response = self.client.get(reverse('pronostics:mes_pronos'), {'saison': self.ancienne.annee})
+        self.assertContains(response, 'Saison archivée')
+        self.assertEqual(response.context['resume'].points, dict((u, p) for u, p, _ in classement_avant)[self.joueur.id])
+        self.assertEqual(len(response.context['journees']), 3)
+
+
+class ClassementPaginationTests(TestCase):
+    """Rangs calculés en SQL, classement paginé et tranche "autour de moi" """
+
+    @classmethod
+    def setUpTestData(cls):
+        from .synthetique import generer_donnees
+        cls.donnees = generer_donnees(joueurs=120, equipes=6, journees=4, densite=0.7)
+        cls.saison = cls.donnees['saison']
+        cls.ordre = list(
+            Classement.objects.filter(saison=cls.saison)
+            .order_by('rang', '-scores_exacts', 'user__username').values_list('user_id', 'rang', 'points')
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rangs_ex_aequo(self):
+        points = [p for _, _, p in self.ordre]
+        self.assertEqual([r for _, r, _ in self.ordre], [1 + sum(q > p for q in points) for p in points])
+        self.assertLess(len(set(points)), len(points))  # Le jeu contient bien des ex aequo
+
+    def test_pages(self):
+        self.client.force_login(self.donnees['joueurs'][0])
+        url = reverse('pronostics:classement')
+        with CaptureQueriesContext(connection) as premiere:
+            pages = [self.client.get(url).context]
+        for numero in (2, 3):
+            cache.clear()
+            with CaptureQueriesContext(connection) as requetes:
+                pages.append(self.client.get(url, {'page': numero}).context)
+        self.assertEqual(len(requetes), len(premiere))
+        self.assertEqual([len(p['classement']) for p in pages], [50, 50, 20])
+        self.assertEqual([l['rang'] for p in pages for l in p['classement']], [r for _, r, _ in self.ordre])
+
+    def test_autour_de_moi(self):
+        from .classement import autour_de
+        position = 60
+        user_id = self.ordre[position][0]
+        with CaptureQueriesContext(connection) as requetes:
+            lignes = autour_de(user_id, self.saison.id, n=5)
+        self.assertEqual(len(requetes), 3)
+        self.assertEqual([l['user_id'] for l in lignes], [u for u, _, _ in self.ordre[position - 5:position + 6]])
+        self.assertEqual([l['user_id'] for l in autour_de(self.ordre[0][0], self.saison.id, n=5)], [u for u, _, _ in self.ordre[:6]])
+        self.assertEqual(autour_de(User.objects.create_user('absent').id, self.saison.id), [])
+
+    def test_api_autour_de_moi(self):
+        joueur = User.objects.get(pk=self.ordre[-1][0])
+        self.client.force_login(joueur)
+        donnees = self.client.get(reverse('pronostics:api_autour_de_moi'), {'voisins': 3}).json()
+        self.assertEqual([l['moi'] for l in donnees['resultats']], [False, False, False, True])
+        self.assertEqual(self.client.get(reverse('pronostics:api_autour_de_moi'), {'voisins': 'x'}).status_code, 400)
+
+    @override_settings(ROOT_URLCONF='config.urls_asgi')
+    async def test_versions_async(self):
+        joueur = await User.objects.aget(pk=self.ordre[10][0])
+        await self.async_client.aforce_login(joueur)
+        response = await self.async_client.get(reverse('pronostics:classement'), {'page': 3})
+        self.assertEqual(len(response.context['classement']), 20)
+        self.assertEqual([l['moi'] for l in response.context['autour']].index(True), 5)
+        donnees = (await self.async_client.get(reverse('pronostics:api_autour_de_moi'))).json()
+        self.assertEqual(len(donnees['resultats']), 11)
+
+
+class AdminTests(TestCase):
+    """Listes de l'admin sans requête par ligne ni COUNT(*) complet, actions en masse"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from .synthetique import generer_donnees
+        cls.donnees = generer_donnees(joueurs=60, equipes=6, journees=4)
+        cls.admin = User.objects.create_superuser('admin', 'admin@exemple.fr', 'secret')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_liste_des_pronostics(self):
+        url = reverse('admin:pronostics_pronostic_changelist')
+        with CaptureQueriesContext(connection) as premiere:
+            response = self.client.get(url)
+        self.assertContains(response, 'Plus de 100 pronostics')
+        with CaptureQueriesContext(connection) as seconde:
+            self.client.get(url, {'p': 2, 'match__journee': 1})
+        self.assertEqual(len(seconde), len(premiere))
+        self.assertLess(len(premiere), 15)  # 100 lignes affichées, aucune requête par ligne
+        self.assertFalse(any('COUNT(*)' in q['sql'] and 'LIMIT' not in q['sql'] for q in premiere.captured_queries))
+
+    def test_recalculer_points(self):
+        match = Match.objects.filter(saison=self.donnees['saison'], score_domicile__isnull=False).first()
+        attendus = dict(Pronostic.objects.filter(match=match).values_list('id', 'points'))
+        Pronostic.objects.filter(match=match).update(points=0)
+        self.client.post(reverse('admin:pronostics_match_changelist'), {
+            'action': 'recalculer_points', '_selected_action': [match.pk],
+        })
+        self.assertEqual(dict(Pronostic.objects.filter(match=match).values_list('id', 'points')), attendus)
+
+    def test_verrouiller_journee(self):
+        match = Match.objects.filter(saison=self.donnees['saison']).a_venir().first()
+        with CaptureQueriesContext(connection) as requetes:
+            self.client.post(reverse('admin:pronostics_match_changelist'), {
+                'action': 'verrouiller_journees', '_selected_action': [match.pk],
+            })
+        self.assertEqual(len([q for q in requetes.captured_queries if q['sql'].startswith('UPDATE')]), 1)
+        journee = Match.objects.filter(saison=match.saison, journee=match.journee)
+        self.assertTrue(all(journee.values_list('verrouille', flat=True)))
+        self.assertFalse(Match.objects.exclude(pk__in=journee).filter(verrouille=True).exists())
+
+        joueur = self.donnees['joueurs'][0]
+        self.client.force_login(joueur)
+        avant = Pronostic.objects.filter(user=joueur, match=match).values_list('score_domicile', flat=True).first()
+        response = self.client.post(reverse('pronostics:pronostiquer', args=[match.id]), {'score_domicile': 7, 'score_exterieur': 7})
+        self.assertRedirects(response, reverse('pronostics:accueil'), fetch_redirect_response=False)
+        self.assertEqual(Pronostic.objects.filter(user=joueur, match=match).values_list('score_domicile', flat=True).first(), avant)
+
+
+class ReferentielTests(CSVMatchsMixin, TestCase):
+    """Équipes et saisons servies par le référentiel en mémoire"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):  # Comme après le commit en production
+            self.saison = Saison.objects.create(annee='2025-2026')
+            self.toulouse = Equipe.objects.create(nom='Toulouse')
+            self.nice = Equipe.objects.create(nom='Nice')
+        for jour in range(1, 4):
+            Match.objects.create(
+                saison=self.saison, journee=jour, equipe_domicile=self.toulouse, equipe_exterieure=self.nice,
+                date=timezone.now() + timedelta(days=jour),
+            )
+
+    def test_matchs_sans_requete_sur_les_equipes(self):
+        list(Match.objects.all())  # Chargement du référentiel
+        with self.assertNumQueries(1):
+            matchs = list(Match.objects.order_by('date'))
+            self.assertEqual([str(m) for m in matchs], ['Toulouse - Nice'] * 3)
+            self.assertEqual({m.saison.annee for m in matchs}, {'2025-2026'})
+
+    def test_invalidation_par_les_signaux(self):
+        list(Match.objects.all())
+        self.nice.nom = 'OGC Nice'
+        self.nice.save()
+        self.assertEqual(str(Match.objects.first()), 'Toulouse - OGC Nice')
+        self.toulouse.delete()
+        from .referentiel import equipes
+        self.assertIsNone(equipes.get(self.toulouse.pk))
+
+    def test_import_sans_requete_sur_les_equipes(self):
+        from watchers.import_csv import import_csv
+        import_csv(self.ecrire_csv([['2025-2026', 9, 'Toulouse', 'Nice', '2025-09-01', '20:00', '', '']]))
+        chemin = self.ecrire_csv([['2025-2026', 9, 'Toulouse', 'Nice', '2025-09-01', '20:00', 2, 0]])
+        with CaptureQueriesContext(connection) as requetes:
+            import_csv(chemin)
+        self.assertEqual(Match.objects.get(journee=9).score_domicile, 2)
+        self.assertFalse([q for q in requetes.captured_queries if 'FROM "pronostics_equipe"' in q['sql']])
+
+
+class ReferentielProcessusTests(TransactionTestCase):
+    """Version partagée : les modifications faites par un autre processus sont vues à la requête suivante"""
+
+    def test_version_partagee(self):
+        from .referentiel import CLE_VERSION_REFERENTIEL, equipes, verifier
+        cache.clear()
+        equipe = Equipe.objects.create(nom='Toulouse')
+        self.assertEqual(equipes.get(equipe.pk).nom, 'Toulouse')
+
+        # Écriture sans signal, comme depuis un autre processus
+        Equipe.objects.filter(pk=equipe.pk).update(nom='Toulouse FC')
+        verifier()
+        self.assertEqual(equipes.get(equipe.pk).nom, 'Toulouse')
+
+        # L'autre processus a incrémenté la version partagée
+        cache.incr(CLE_VERSION_REFERENTIEL)
+        verifier()
+        self.assertEqual(equipes.get(equipe.pk).nom, 'Toulouse FC')
+
+
+class MesPronosTests(TestCase):
+    """Page mes_pronos : une requête pour toute la saison, groupée par journée"""
+
+    def setUp(self):
+        from .synthetique import generer_donnees
+        cache.clear()
+        self.donnees = generer_donnees(joueurs=2, equipes=4, journees=2)
+        self.joueur = self.donnees['joueurs'][0]
+        self.client.force_login(self.joueur)
+
+    def compter_requetes(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('pronostics:mes_pronos'))
+        return response, len(requetes)
+
+    def test_nombre_de_requetes_constant(self):
+        _, avant = self.compter_requetes()
+        saison = self.donnees['saison']
+        equipes = list(saison.equipes.all())
+        for journee in range(3, 13):
+            match = Match.objects.create(
+                saison=saison, journee=journee, equipe_domicile=equipes[0], equipe_exterieure=equipes[1],
+                date=timezone.now() + timedelta(days=journee),
+            )
+            Pronostic.objects.create(user=self.joueur, match=match, score_domicile=1, score_exterieur=0)
+        response, apres = self.compter_requetes()
+        self.assertEqual(apres, avant)
+        self.assertEqual([j['journee'] for j in response.context['pronos_par_journee']], list(range(1, 13)))
+
+    def test_journees_et_modification(self):
+        response, _ = self.compter_requetes()
+        premiere, seconde = response.context['pronos_par_journee']
+        # Première journée jouée (generer_donnees : la moitié des journées), seconde à venir
+        self.assertFalse(premiere['ouverte'])
+        self.assertTrue(all(p['joue'] and not p['modifiable'] for p in premiere['pronos']))
+        self.assertTrue(all(p['modifiable'] for p in seconde['pronos']))
+        self.assertContains(response, reverse('pronostics:pronostiquer_journee', args=[2]))
+
+        Match.objects.filter(journee=2).update(verrouille=True)
+        response, _ = self.compter_requetes()
+        self.assertFalse(response.context['pronos_par_journee'][1]['ouverte'])
+
+
+class ProjectionTests(TestCase):
+    """Projection Monte Carlo du classement final"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from .synthetique import generer_donnees
+        cls.donnees = generer_donnees(joueurs=30, equipes=6, journees=4, densite=0.8)
+        cls.saison = cls.donnees['saison']
+
+    def setUp(self):
+        cache.clear()
+
+    def test_reproductible_et_independante_du_nombre_de_processus(self):
+        from .projection import projeter
+        from .simulation import TAILLE_LOT
+        scenarios = TAILLE_LOT + 500  # Deux lots
+        sequentielle = projeter(self.saison, scenarios, graine=7, processus=1)
+        self.assertEqual(projeter(self.saison, scenarios, graine=7, processus=1), sequentielle)
+        self.assertEqual(projeter(self.saison, scenarios, graine=7, processus=2), sequentielle)
+
+        self.assertEqual(sequentielle['matchs_restants'], 6)
+        self.assertEqual(len(sequentielle['joueurs']), 30)
+        self.assertGreaterEqual(sum(l['premier'] for l in sequentielle['joueurs']), 1)  # Ex aequo : plusieurs premiers
+        for ligne in sequentielle['joueurs']:
+            self.assertLessEqual(ligne['premier'], ligne['podium'])
+            self.assertLessEqual(ligne['podium'], ligne['top_10'])
+            self.assertGreaterEqual(ligne['points_projetes'], ligne['points'])
+
+    def test_saison_terminee(self):
+        from .classement import mettre_a_jour_saison
+        from .projection import projeter
+        Match.objects.filter(saison=self.saison, score_domicile__isnull=True).update(score_domicile=1, score_exterieur=0)
+        Pronostic.objects.filter(match__saison=self.saison).update(points=0)
+        mettre_a_jour_saison(self.saison.id)
+
+        projection = projeter(self.saison, 200, processus=1)
+        self.assertEqual(projection['matchs_restants'], 0)
+        rangs = dict(Classement.objects.filter(saison=self.saison).values_list('user_id', 'rang'))
+        for ligne in projection['joueurs']:
+            self.assertEqual(ligne['premier'], 1.0 if rangs[ligne['user_id']] == 1 else 0.0)
+            self.assertEqual(ligne['points_projetes'], ligne['points'])
+
+    def test_moteurs(self):
+        from unittest import mock
+        from . import simulation
+        # Deux issues équiprobables : chaque joueur gagne sur l'une ; le troisième est distancé
+        donnees = {
+            'base': [10, 10, 0],
+            'probas': [0.5, 0.5],
+            'matchs': [[((5, 0), [0]), ((0, 5), [1])]],
+        }
+        moteurs = [mock.patch.object(simulation, 'np', None)]
+        if simulation.np is not None:
+            moteurs.append(contextlib.nullcontext())
+        for moteur in moteurs:
+            with moteur:
+                premier, podium, top_10 = simulation.simuler(donnees, 4000, graine=3)
+                self.assertEqual(premier[0] + premier[1], 4000)
+                self.assertAlmostEqual(premier[0] / 4000, 0.5, delta=0.05)
+                self.assertEqual(premier[2], 0)
+                self.assertEqual(podium, [4000] * 3)
+                self.assertEqual(top_10, [4000] * 3)
+
+    @override_settings(PRONOSTICS_PROJECTION_SCENARIOS=200, PRONOSTICS_PROJECTION_PROCESSUS=1)
+    def test_saisons_perimees_et_repartition_de_la_saison(self):
+        from .projection import derniere_projection, probabilites_issues, projeter_saisons_perimees
+        probas = probabilites_issues(self.saison.id)
+        # Une ancienne saison pleine de 0-0 ne change pas la saison courante
+        ancienne = Saison.objects.create(annee='1999-2000')
+        equipes = list(Equipe.objects.all()[:2])
+        Match.objects.bulk_create([
+            Match(saison=ancienne, equipe_domicile=equipes[0], equipe_exterieure=equipes[1],
+                  date=timezone.now() - timedelta(days=400 + i), score_domicile=0, score_exterieur=0)
+            for i in range(50)
+        ])
+        self.assertEqual(probabilites_issues(self.saison.id), probas)
+        self.assertGreater(probabilites_issues(ancienne.id)[0], 2 * probas[0])
+
+        self.assertEqual(projeter_saisons_perimees(), [self.saison, ancienne])
+        self.assertTrue(derniere_projection(self.saison)[1])
+        self.assertEqual(projeter_saisons_perimees(), [])
+
+    @override_settings(PRONOSTICS_PROJECTION_SCENARIOS=500, PRONOSTICS_PROJECTION_PROCESSUS=1)
+    def test_commande_et_vue(self):
+        import io
+        import json
+        from unittest import mock
+        from django.core.management import call_command
+        from . import projection
+        from .classement import mettre_a_jour_utilisateur
+
+        joueur = self.donnees['joueurs'][0]
+        self.client.force_login(joueur)
+        # La vue ne lance jamais la simulation : rien tant que la commande n'a pas tourné
+        with mock.patch.object(projection, 'projeter', side_effect=AssertionError):
+            response = self.client.get(reverse('pronostics:projection'))
+        self.assertIsNone(response.context['projection'])
+        self.assertContains(response, "pas encore été calculée")
+
+        sortie = io.StringIO()
+        call_command('projeter_classement', '--json', stdout=sortie)
+        resultat = json.loads(sortie.getvalue())
+        self.assertEqual((resultat['saison'], resultat['scenarios']), (self.saison.annee, 500))
+
+        # La vue reprend la projection calculée par la commande
+        with mock.patch.object(projection, 'projeter', side_effect=AssertionError):
+            response = self.client.get(reverse('pronostics:projection'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['projection'], resultat)
+        self.assertTrue(response.context['a_jour'])
+        self.assertEqual(response.context['moi']['user_id'], joueur.id)
+        self.assertContains(response, 'Projection de fin de saison')
+
+        # Un pronostic d'une autre saison ne la périme pas ; un pronostic de la saison, si
+        autre = Saison.objects.create(annee='1999-2000')
+        mettre_a_jour_utilisateur(joueur.id, autre.id)
+        self.assertEqual(projection.derniere_projection(self.saison), (resultat, True))
+        mettre_a_jour_utilisateur(joueur.id, self.saison.id)
+        self.assertEqual(projection.derniere_projection(self.saison), (resultat, False))
+
+
+@override_settings(ROOT_URLCONF='config.urls_asgi')
+class DirectTests(TestCase):
+    """Classement en direct : flux Server-Sent Events alimenté par les écritures"""
+
+    def setUp(self):
+        cache.clear()
+        from .synthetique import generer_donnees
+        donnees = generer_donnees(joueurs=5, equipes=4, journees=4)
+        self.joueur = donnees['joueurs'][0]
+        self.match = Match.objects.filter(saison=donnees['saison'], score_domicile__isnull=True).order_by('date').first()
+        Pronostic.objects.update_or_create(
+            user=self.joueur, match=self.match, defaults={'score_domicile': 2, 'score_exterieur': 1},
+        )
+        self.async_client.force_login(self.joueur)
+
+    def jouer_match(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.match.score_domicile, self.match.score_exterieur = 2, 1
+            self.match.save()
+
+    async def ouvrir(self):
+        response = await self.async_client.get(reverse('pronostics:direct'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        flux = aiter(response.streaming_content)
+        self.assertEqual(await anext(flux), b'retry: 5000\n\n')
+        return flux
+
+    async def fermer(self, flux):
+        # Déconnexion du client : le serveur ASGI annule la tâche qui lit le flux
+        lecture = asyncio.ensure_future(anext(flux))
+        await asyncio.sleep(0)
+        lecture.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await lecture
+
+    async def lire(self, flux):
+        evenement, donnees = (await asyncio.wait_for(anext(flux), 5)).decode().split('\n')[:2]
+        return evenement.removeprefix('event: '), json.loads(donnees.removeprefix('data: '))
+
+    async def test_score_et_classement_pousses(self):
+        from .direct import diffuseur
+        flux = await self.ouvrir()
+        try:
+            await sync_to_async(self.jouer_match)()
+            evenement, score = await self.lire(flux)
+            self.assertEqual((evenement, score['id'], score['score_domicile'], score['score_exterieur']), ('score', self.match.id, 2, 1))
+
+            evenement, delta = await self.lire(flux)
+            self.assertEqual(evenement, 'classement')
+            en_base = {
+                c['user_id']: c async for c in Classement.objects.filter(saison_id=self.match.saison_id).values('user_id', 'rang', 'points')
+            }
+            lignes = {l['user_id']: l for l in delta['lignes']}
+            self.assertIn(self.joueur.id, lignes)  # Score exact : +5 points
+            for user_id, ligne in lignes.items():
+                self.assertEqual((ligne['rang'], ligne['points']), (en_base[user_id]['rang'], en_base[user_id]['points']))
+        finally:
+            await self.fermer(flux)
+        self.assertEqual(diffuseur.abonnes, {})
+
+    async def test_avis_d_un_autre_processus(self):
+        from unittest import mock
+        from . import direct
+        with mock.patch.object(direct, 'INTERVALLE_RELAIS', 0.05):
+            flux = await self.ouvrir()
+            try:
+                # Avis déposé dans le cache par un autre processus (ex. watch_imports)
+                await cache.aadd(direct.CLE_SEQUENCE, 0, timeout=None)
+                numero = await cache.aincr(direct.CLE_SEQUENCE)
+                await cache.aset(
+                    direct.CLE_AVIS.format(numero=numero),
+                    {'saisons': [], 'matchs': [self.match.id], 'origine': 'autre-machine:1'},
+                )
+                evenement, score = await self.lire(flux)
+                self.assertEqual((evenement, score['id']), ('score', self.match.id))
+            finally:
+                await self.fermer(flux)
+
+    def test_relais_en_panne_sans_erreur(self):
+        # Le relais part au commit : les données sont écrites, il ne doit jamais faire échouer la requête
+        from unittest import mock
+        from . import direct
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            self.jouer_match()
+        with mock.patch.object(direct.cache, 'set', side_effect=OSError), self.assertLogs('pronostics.direct', 'ERROR'):
+            direct.publier({'saisons': [self.match.saison_id], 'matchs': []})
+
+    def test_sans_asgi(self):
+        self.client.force_login(self.joueur)
+        with override_settings(ROOT_URLCONF='config.urls'):
+            self.assertEqual(self.client.get(reverse('pronostics:direct')).status_code, 204)
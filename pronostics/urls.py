@@ -1,5 +1,5 @@
-from django.urls import path
-from . import views
+from django.urls import path, re_path
+from . import api, views
 
 app_name = 'pronostics'
 
@@ -7,9 +7,22 @@ urlpatterns = [
     path('', views.accueil, name='accueil'),
     path('mes-pronos/', views.mes_pronos, name='mes_pronos'),
     path('classement/', views.classement, name='classement'),
+    path('classement/historique/', views.historique, name='historique'),
+    path('classement/projection/', views.projection, name='projection'),
+    path('classement/direct/', views.direct, name='direct'),
+    re_path(r'^classement/historique/export\.(?P<format>csv|pdf)$', views.historique_export, name='historique_export'),
     path('mon-compte/', views.mon_compte, name='mon_compte'),
     path('login/', views.login_user, name='login'),
     path('logout/', views.logout_user, name='logout'),
     path('set-password/', views.set_password, name='set_password'),
     path('pronostiquer/<int:match_id>/', views.pronostiquer, name='pronostiquer'),
+    path('pronostiquer/journee/<int:journee>/', views.pronostiquer_journee, name='pronostiquer_journee'),
+    path('metriques/', views.metriques, name='metriques'),
+
+    # API JSON (lecture seule)
+    path('api/classement/', api.classement, name='api_classement'),
+    path('api/classement/autour-de-moi/', api.autour_de_moi, name='api_autour_de_moi'),
+    path('api/matchs/a-venir/', api.matchs_a_venir, name='api_matchs_a_venir'),
+    path('api/journees/<int:journee>/', api.journee, name='api_journee'),
+    path('api/mes-pronos/', api.mes_pronos, name='api_mes_pronos'),
 ]
@@ -0,0 +1,23 @@
+from django.urls import URLPattern
+
+from . import api, urls, views_async
+
+app_name = urls.app_name
+
+# Mêmes routes que urls.py ; les vues en lecture sont remplacées par leurs versions async
+VUES_ASYNC = {
+    'accueil': views_async.accueil,
+    'mes_pronos': views_async.mes_pronos,
+    'classement': views_async.classement,
+    'direct': views_async.direct,
+    'api_classement': api.aclassement,
+    'api_autour_de_moi': api.aautour_de_moi,
+    'api_matchs_a_venir': api.amatchs_a_venir,
+    'api_journee': api.ajournee,
+    'api_mes_pronos': api.ames_pronos,
+}
+
+urlpatterns = [
+    URLPattern(motif.pattern, VUES_ASYNC[motif.name], motif.default_args, motif.name) if motif.name in VUES_ASYNC else motif
+    for motif in urls.urlpatterns
+]
@@ -1,11 +1,24 @@
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import F
+from django.http import Http404, HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate, update_session_auth_hash
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm, SetPasswordForm
 from django.contrib.auth.models import User
+from django.core.paginator import Paginator
 from django.utils import timezone
-from .models import Match, Pronostic
-from .forms import PronosticForm, UserUpdateForm
+from . import instrumentation
+from .cache import cache_vue
+from .classement import autour_de, lignes_classement, saison_demandee
+from .db import enregistrer_pronostic, enregistrer_pronostics
+from .export import exporter_csv, exporter_pdf
+from .models import Classement, ClassementJournee, Match, Pronostic, Saison, pronostic_ouvert
+from .projection import derniere_projection
+from .forms import PronosticForm, PronosticJourneeForm, UserUpdateForm
 
 # -----------------------
 # Gestion des utilisateurs
@@ -82,64 +95,202 @@ def logout_user(request):
 # -----------------------
 
 @login_required
+@cache_vue()
 def accueil(request):
     # Affiche le prochain match à pronostiquer
-    prochain_match = Match.objects.filter(date__gte=timezone.now()).order_by('date').first()
+    prochain_match = Match.objects.prochain()
     return render(request, 'pronostics/accueil.html', {'prochain_match': prochain_match})
 
 
+def requete_mes_pronos(user, saison):
+    """
+    Pronostics de l'utilisateur sur la saison, en une requête (match et équipes joints) et en
+    dictionnaires légers, par journée puis par date. Les points enregistrés sont à jour :
+    réécrits à chaque changement de score.
+    """
+    return Pronostic.objects.filter(user=user, match__saison=saison).values(
+        'match_id', 'score_domicile', 'score_exterieur', 'points',
+        journee=F('match__journee'), date=F('match__date'), verrouille=F('match__verrouille'),
+        domicile=F('match__equipe_domicile__nom'), exterieur=F('match__equipe_exterieure__nom'),
+        reel_domicile=F('match__score_domicile'), reel_exterieur=F('match__score_exterieur'),
+    ).order_by('match__journee', 'match__date', 'match_id')
+
+
+def pronos_par_journee(lignes, maintenant):
+    """[{'journee', 'pronos', 'ouverte'}] ; `modifiable` de chaque ligne calculé avec le même `maintenant`"""
+    journees = []
+    for journee, pronos in groupby(lignes, key=itemgetter('journee')):
+        pronos = list(pronos)
+        for p in pronos:
+            p['joue'] = p['reel_domicile'] is not None and p['reel_exterieur'] is not None
+            p['modifiable'] = pronostic_ouvert(p['verrouille'], p['date'], maintenant)
+        journees.append({'journee': journee, 'pronos': pronos, 'ouverte': any(p['modifiable'] for p in pronos)})
+    return journees
+
+
 @login_required
+@cache_vue(par_utilisateur=True)
 def mes_pronos(request):
-    # Récupère les pronostics de l'utilisateur
-    pronos = Pronostic.objects.select_related('match').filter(user=request.user).order_by('match__date')
+    # Pronostics de l'utilisateur sur la saison choisie (courante par défaut), groupés par journée
+    saison = saison_demandee(request)
+    contexte = {
+        'pronos_par_journee': pronos_par_journee(requete_mes_pronos(request.user, saison), timezone.now()),
+        'saison': saison,
+        'saisons': Saison.objects.order_by('-annee').values_list('annee', flat=True)
+    }
+    if saison is not None and saison.archivee:
+        # Saison archivée : les pronostics sont résumés par le classement et ses photos par journée
+        contexte['resume'] = Classement.objects.filter(user=request.user, saison=saison).first()
+        contexte['journees'] = ClassementJournee.objects.filter(user=request.user, saison=saison).order_by('journee')
+    return render(request, 'pronostics/mes_pronos.html', contexte)
+
 
-    # Calcul à la volée des points
-    for p in pronos:
-        p.points = p.calculer_points()
+TAILLE_PAGE_CLASSEMENT = 50
+VOISINS_CLASSEMENT = 5
 
-    return render(request, 'pronostics/mes_pronos.html', {'pronos': pronos, 'now': timezone.now()})
+
+def ligne_classement(ligne, pronos_semaine, user_id):
+    """Ligne affichée du classement, avec le prono sur le prochain match ("SP" : sans pronostic)"""
+    prono = pronos_semaine.get(ligne['user_id'])
+    return {
+        'user_id': ligne['user_id'],
+        'rang': ligne['rang'],
+        'username': ligne['username'],
+        'total': ligne['points'],
+        'scores_exacts': ligne['scores_exacts'],
+        'bons_resultats': ligne['bons_resultats'],
+        'points_derniere_journee': ligne['points_derniere_journee'],
+        'prono_semaine': f"{prono['score_domicile']}-{prono['score_exterieur']}" if prono else "SP",
+        'points_semaine': prono['points'] if prono else 0,
+        'moi': ligne['user_id'] == user_id,
+    }
 
 
 @login_required
+@cache_vue(par_utilisateur=True)  # La tranche "autour de moi" dépend du joueur
 def classement(request):
-    # Calcul des points de tous les utilisateurs à la volée
-    all_pronos = Pronostic.objects.select_related('match', 'user').all()
-    scores = {}
-    for p in all_pronos:
-        pts = p.calculer_points()
-        scores[p.user.username] = scores.get(p.user.username, 0) + pts
-
-    # Prochain match
-    prochain_match = Match.objects.filter(date__gte=timezone.now()).order_by('date').first()
-
-    # Pour chaque user, prono sur le prochain match
-    users = User.objects.all()
-    for user in users:
-        username = user.username
-        if username not in scores:
-            scores[username] = 0
-        # Trouver prono sur prochain match
-        prono_semaine = "SP"
-        points_semaine = 0
-        if prochain_match:
-            try:
-                prono = Pronostic.objects.get(user=user, match=prochain_match)
-                prono_semaine = f"{prono.score_domicile}-{prono.score_exterieur}"
-                points_semaine = prono.calculer_points()
-            except Pronostic.DoesNotExist:
-                pass
-        # Ajouter au scores
-        scores[username] = {
-            'total': scores[username],
-            'prono_semaine': prono_semaine,
-            'points_semaine': points_semaine
+    # Lecture du classement matérialisé de la saison choisie (tenu à jour par les signaux), une page à la fois
+    saison = saison_demandee(request)
+    page = Paginator(lignes_classement(saison and saison.id), TAILLE_PAGE_CLASSEMENT).get_page(request.GET.get('page'))
+    autour = autour_de(request.user.id, saison.id, VOISINS_CLASSEMENT) if saison else []
+
+    # Prochain match de la saison et pronostics des joueurs affichés sur ce match, en une seule requête
+    prochain_match = Match.objects.filter(saison=saison).prochain()
+    pronos_semaine = {}
+    if prochain_match:
+        pronos_semaine = {
+            p['user_id']: p
+            for p in Pronostic.objects.filter(
+                match=prochain_match, user_id__in={l['user_id'] for l in [*page, *autour]}
+            ).values('user_id', 'score_domicile', 'score_exterieur', 'points')
         }
 
-    # Transformer en liste triée pour le template
-    classement_list = [{'username': u, 'total': d['total'], 'prono_semaine': d['prono_semaine'], 'points_semaine': d['points_semaine']} for u, d in scores.items()]
-    classement_list.sort(key=lambda x: x['total'], reverse=True)
+    return render(request, 'pronostics/classement.html', {
+        'classement': [ligne_classement(l, pronos_semaine, request.user.id) for l in page],
+        'autour': [ligne_classement(l, pronos_semaine, request.user.id) for l in autour],
+        'page': page,
+        'prochain_match': prochain_match,
+        'saison': saison,
+        'saisons': Saison.objects.order_by('-annee').values_list('annee', flat=True)
+    })
+
 
-    return render(request, 'pronostics/classement.html', {'classement': classement_list, 'prochain_match': prochain_match})
+def _historique(request):
+    """Photo du classement d'une journée et évolution depuis la journée photographiée précédente"""
+    saison = saison_demandee(request)
+    journees = list(
+        ClassementJournee.objects.filter(saison=saison).values_list('journee', flat=True).distinct().order_by('journee')
+    )
+    if not journees:
+        return saison, journees, None, []
+
+    try:
+        journee = int(request.GET.get('journee', journees[-1]))
+    except ValueError:
+        raise Http404("Journée invalide")
+    if journee not in journees:
+        raise Http404("Pas de classement pour cette journée")
+    precedente = journees[journees.index(journee) - 1] if journees.index(journee) > 0 else None
+
+    avant = {}
+    if precedente is not None:
+        avant = {
+            user_id: (rang, points)
+            for user_id, rang, points in ClassementJournee.objects.filter(saison=saison, journee=precedente).values_list(
+                'user_id', 'rang', 'points'
+            )
+        }
+    lignes = []
+    for photo in ClassementJournee.objects.filter(saison=saison, journee=journee).order_by('rang', 'user__username').values(
+        'user_id', 'user__username', 'rang', 'points', 'points_journee'
+    ):
+        rang_avant, points_avant = avant.get(photo['user_id'], (None, 0))
+        lignes.append({
+            'rang': photo['rang'],
+            'username': photo['user__username'],
+            'points': photo['points'],
+            'points_journee': photo['points_journee'],
+            # Places gagnées (positif) ou perdues depuis la journée précédente
+            'evolution': rang_avant - photo['rang'] if rang_avant is not None else None,
+            'gain_points': photo['points'] - points_avant,
+        })
+    return saison, journees, journee, lignes
+
+
+@login_required
+def historique(request):
+    saison, journees, journee, lignes = _historique(request)
+    return render(request, 'pronostics/historique.html', {
+        'saison': saison,
+        'journees': journees,
+        'journee': journee,
+        'lignes': lignes
+    })
+
+
+@login_required
+def projection(request):
+    # Simulation Monte Carlo des matchs restants (projection.py) : calculée par la commande projeter_classement,
+    # seulement lue ici. Pas de cache_vue : une nouvelle projection ne change pas version_donnees()
+    saison = saison_demandee(request)
+    projection, a_jour = derniere_projection(saison) if saison else (None, False)
+    joueurs = projection['joueurs'] if projection else []
+    return render(request, 'pronostics/projection.html', {
+        'projection': projection,
+        'a_jour': a_jour,
+        'page': Paginator(joueurs, TAILLE_PAGE_CLASSEMENT).get_page(request.GET.get('page')),
+        'moi': next((l for l in joueurs if l['user_id'] == request.user.id), None),
+        'saison': saison,
+        'saisons': Saison.objects.order_by('-annee').values_list('annee', flat=True)
+    })
+
+
+@login_required
+def direct(request):
+    # Flux en direct du classement : servi sous ASGI seulement (views_async.direct), un worker WSGI
+    # resterait bloqué par connexion. 204 : le navigateur ne se reconnecte pas, la page reste statique
+    return HttpResponse(status=204)
+
+
+@login_required
+def historique_export(request, format):
+    saison, journees, journee, lignes = _historique(request)
+    if journee is None:
+        raise Http404("Aucun classement par journée")
+
+    titre = f"Classement {saison} après J{journee}"
+    entetes = ['Rang', 'Utilisateur', 'Points', 'Points journée', 'Évolution']
+    tableau = [
+        [l['rang'], l['username'], l['points'], l['points_journee'], '' if l['evolution'] is None else f"{l['evolution']:+d}"]
+        for l in lignes
+    ]
+    nom_fichier = f"classement_{saison}_J{journee}"
+    if format == 'pdf':
+        response = HttpResponse(exporter_pdf(titre, entetes, tableau), content_type='application/pdf')
+    else:
+        response = HttpResponse(exporter_csv(entetes, tableau), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}.{format}"'
+    return response
 
 
 @login_required
@@ -171,11 +322,13 @@ def pronostiquer(request, match_id):
     if not match.can_pronostiquer():
         return redirect('pronostics:accueil')
 
-    pronostic, created = Pronostic.objects.get_or_create(user=request.user, match=match)
+    # Aucune écriture à l'affichage : le pronostic n'est créé qu'à l'enregistrement
+    pronostic = Pronostic.objects.filter(user=request.user, match=match).first() or Pronostic(user=request.user, match=match)
     if request.method == 'POST':
         form = PronosticForm(request.POST, instance=pronostic)
         if form.is_valid():
-            form.save()
+            # Transaction courte, relancée si la base est verrouillée (rush avant le coup d'envoi)
+            enregistrer_pronostic(request.user, match, form.cleaned_data['score_domicile'], form.cleaned_data['score_exterieur'])
             return redirect('pronostics:mes_pronos')
     else:
         form = PronosticForm(instance=pronostic)
@@ -185,3 +338,53 @@ def pronostiquer(request, match_id):
         'match': match,
         'pronostic': pronostic
     })
+
+
+@login_required
+def pronostiquer_journee(request, journee):
+    saison = saison_demandee(request)
+    matchs = list(
+        Match.objects.filter(saison=saison, journee=journee).order_by('date')
+    )
+    if not matchs:
+        raise Http404("Aucun match pour cette journée")
+
+    # Une seule requête pour les pronostics existants, aucune écriture à l'affichage
+    pronos = {p.match_id: p for p in Pronostic.objects.filter(user=request.user, match__in=matchs)}
+    maintenant = timezone.now()
+    donnees = request.POST if request.method == 'POST' else None
+    lignes = []
+    for match in matchs:
+        prono = pronos.get(match.id)
+        ouvert = match.can_pronostiquer(maintenant)
+        form = None
+        if ouvert:
+            form = PronosticJourneeForm(donnees, prefix=f'm{match.id}', initial={
+                'score_domicile': prono.score_domicile if prono else None,
+                'score_exterieur': prono.score_exterieur if prono else None,
+            })
+        lignes.append({'match': match, 'prono': prono, 'ouvert': ouvert, 'form': form})
+
+    if request.method == 'POST':
+        forms_ouverts = [l for l in lignes if l['form'] is not None]
+        # Tous les scores sont validés (erreurs affichées pour chaque match) avant d'écrire quoi que ce soit
+        if all([l['form'].is_valid() for l in forms_ouverts]):
+            scores = {l['match']: l['form'].scores() for l in forms_ouverts if l['form'].scores() is not None}
+            enregistrer_pronostics(request.user, scores)
+            return redirect('pronostics:mes_pronos')
+
+    return render(request, 'pronostics/pronostiquer_journee.html', {
+        'saison': saison,
+        'journee': journee,
+        'lignes': lignes
+    })
+
+
+# -----------------------
+# Métriques (équipe uniquement)
+# -----------------------
+
+@staff_member_required
+def metriques(request):
+    # Format texte Prometheus : durées, requêtes SQL et temps SQL par vue (voir instrumentation.py)
+    return HttpResponse(instrumentation.metriques.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,104 @@
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+
+from .cache import cache_vue
+from .classement import aautour_de, asaison_demandee, lignes_classement
+from .direct import flux
+from .models import Classement, ClassementJournee, Match, Pronostic, Saison
+from .views import TAILLE_PAGE_CLASSEMENT, VOISINS_CLASSEMENT, ligne_classement, pronos_par_journee, requete_mes_pronos
+
+# -----------------------
+# Pages en lecture, versions async (servies sous ASGI, voir config/asgi.py)
+# -----------------------
+# Mêmes pages que views.accueil / mes_pronos / classement, avec l'ORM async : sous ASGI, une vue
+# synchrone occupe un thread pendant toute la requête. Le rendu des templates reste synchrone,
+# il ne doit donc plus toucher la base : tout est chargé avant l'appel à render().
+
+
+async def _utilisateur(request):
+    """Résout l'utilisateur une fois : les templates lisent ensuite request.user sans requête synchrone"""
+    request.user = await request.auser()
+    return request.user
+
+
+async def _page(queryset, numero, taille):
+    """Page de `queryset` : le Paginator ne sert qu'aux numéros de page, comptage et lecture sont async"""
+    page = Paginator(range(await queryset.acount()), taille).get_page(numero)
+    debut = (page.number - 1) * taille
+    page.object_list = [ligne async for ligne in queryset[debut:debut + taille]]
+    return page
+
+
+async def _saisons():
+    return [annee async for annee in Saison.objects.order_by('-annee').values_list('annee', flat=True)]
+
+
+@login_required
+@cache_vue()
+async def accueil(request):
+    await _utilisateur(request)
+    prochain_match = await Match.objects.aprochain()
+    return render(request, 'pronostics/accueil.html', {'prochain_match': prochain_match})
+
+
+@login_required
+@cache_vue(par_utilisateur=True)
+async def mes_pronos(request):
+    user = await _utilisateur(request)
+    saison = await asaison_demandee(request)
+    lignes = [p async for p in requete_mes_pronos(user, saison)]
+    contexte = {
+        'pronos_par_journee': pronos_par_journee(lignes, timezone.now()),
+        'saison': saison,
+        'saisons': await _saisons(),
+    }
+    if saison is not None and saison.archivee:
+        contexte['resume'] = await Classement.objects.filter(user=user, saison=saison).afirst()
+        contexte['journees'] = [
+            j async for j in ClassementJournee.objects.filter(user=user, saison=saison).order_by('journee')
+        ]
+    return render(request, 'pronostics/mes_pronos.html', contexte)
+
+
+@login_required
+@cache_vue(par_utilisateur=True)
+async def classement(request):
+    user = await _utilisateur(request)
+    saison = await asaison_demandee(request)
+    page = await _page(lignes_classement(saison and saison.id), request.GET.get('page'), TAILLE_PAGE_CLASSEMENT)
+    autour = await aautour_de(user.id, saison.id, VOISINS_CLASSEMENT) if saison else []
+
+    prochain_match = await Match.objects.filter(saison=saison).aprochain()
+    pronos_semaine = {}
+    if prochain_match:
+        pronos_semaine = {
+            p['user_id']: p
+            async for p in Pronostic.objects.filter(
+                match=prochain_match, user_id__in={l['user_id'] for l in [*page, *autour]}
+            ).values('user_id', 'score_domicile', 'score_exterieur', 'points')
+        }
+
+    return render(request, 'pronostics/classement.html', {
+        'classement': [ligne_classement(l, pronos_semaine, user.id) for l in page],
+        'autour': [ligne_classement(l, pronos_semaine, user.id) for l in autour],
+        'page': page,
+        'prochain_match': prochain_match,
+        'saison': saison,
+        'saisons': await _saisons()
+    })
+
+
+@login_required
+async def direct(request):
+    """Flux Server-Sent Events de la saison : scores saisis et lignes du classement modifiées"""
+    await _utilisateur(request)
+    saison = await asaison_demandee(request)
+    if saison is None or saison.archivee:
+        return HttpResponse(status=204)  # Plus rien ne changera : le navigateur ne se reconnecte pas
+    response = StreamingHttpResponse(flux(saison.id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx : messages transmis sans mise en tampon
+    return response
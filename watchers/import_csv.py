@@ -2,23 +2,27 @@ import os
 import sys
 import csv
 import time
+import hashlib
 import django
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
 from datetime import datetime
+from django.db import transaction
 from django.utils import timezone
 
 # ----------------------------
 # Configuration Django
 # ----------------------------
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-sys.path.append(BASE_DIR)  # <-- ajoute le projet au PYTHONPATH
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
-django.setup()
+# Exécution directe du script uniquement : importer le module ne configure pas Django
+if __name__ == "__main__":
+    sys.path.append(BASE_DIR)  # <-- ajoute le projet au PYTHONPATH
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
 
-from pronostics.models import Match, Equipe, Saison
-from watchers.import_users import import_users
+from pronostics import referentiel
+from pronostics.cache import incrementer_version
+from pronostics.classement import invalider_photos, mettre_a_jour_saison, rescorer_matchs
+from pronostics.models import Match, EtatImport, EmpreinteLigne
 
 # ----------------------------
 # Chemin vers le CSV à surveiller
@@ -31,108 +35,347 @@ CSV_FILE = os.path.join(BASE_DIR, 'import', 'matchs.csv')
 USERS_CSV = os.path.join(BASE_DIR, 'import', 'users.csv')
 
 # ----------------------------
-# Fonction d'import CSV
+# Lecture du CSV
 # ----------------------------
-def import_csv():
-    if not os.path.exists(CSV_FILE):
-        print("Fichier CSV introuvable :", CSV_FILE)
-        return
+class LigneInvalide(ValueError):
+    """Ligne du CSV impossible à convertir (date, journée ou score incorrect)"""
+    def __init__(self, numero, message):
+        super().__init__(f"Ligne {numero} invalide : {message}")
+        self.numero = numero
+
+
+def _convertir_ligne(row):
+    """Convertit une ligne brute du CSV ; lève ValueError si une valeur est incorrecte"""
+    saison_annee = row[0]
+    journee = int(row[1]) if row[1] else 1
+    equipe_domicile_nom = row[2]
+    equipe_exterieure_nom = row[3]
+    date_str = row[4]
+    time_str = row[5]
+    score_domicile = row[6] if len(row) > 6 and row[6] else None
+    score_exterieure = row[7] if len(row) > 7 and row[7] else None
+
+    if not saison_annee or not equipe_domicile_nom or not equipe_exterieure_nom:
+        raise ValueError("saison ou équipe manquante")
+
+    # Conversion en datetime
+    match_datetime = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
+    match_datetime = timezone.make_aware(match_datetime)
+
+    # Conversion scores en int si présent
+    score_domicile = int(score_domicile) if score_domicile else None
+    score_exterieure = int(score_exterieure) if score_exterieure else None
 
-    csv_matches = []
-    with open(CSV_FILE, newline='', encoding='utf-8') as f:
+    return {
+        'cle': f"{equipe_domicile_nom}|{equipe_exterieure_nom}|{match_datetime.isoformat()}",
+        'empreinte': hashlib.sha256('\x1f'.join(row[:8]).encode('utf-8')).hexdigest(),
+        'saison': saison_annee,
+        'journee': journee,
+        'equipe_domicile': equipe_domicile_nom,
+        'equipe_exterieure': equipe_exterieure_nom,
+        'date': match_datetime,
+        'score_domicile': score_domicile,
+        'score_exterieur': score_exterieure
+    }
+
+
+def iterer_csv(chemin, sur_erreur=None):
+    """
+    Générateur des lignes converties. Une ligne invalide lève LigneInvalide, sauf si
+    `sur_erreur` est fourni : il reçoit l'erreur et la lecture continue s'il retourne True.
+    """
+    with open(chemin, newline='', encoding='utf-8') as f:
         reader = csv.reader(f)
-        next(reader)  # Skip header
-        for row in reader:
+        next(reader, None)  # Skip header
+        for numero, row in enumerate(reader, start=2):
             if len(row) < 8:
                 continue
-            saison_annee = row[0]
-            journee = int(row[1]) if row[1] else 1
-            equipe_domicile_nom = row[2]
-            equipe_exterieure_nom = row[3]
-            date_str = row[4]
-            time_str = row[5]
-            score_domicile = row[6] if len(row) > 6 and row[6] else None
-            score_exterieure = row[7] if len(row) > 7 and row[7] else None
-
-            # Créer les équipes si elles n'existent pas
-            equipe_domicile, _ = Equipe.objects.get_or_create(nom=equipe_domicile_nom)
-            equipe_exterieure, _ = Equipe.objects.get_or_create(nom=equipe_exterieure_nom)
-
-            # Créer la saison si elle n'existe pas
-            saison, _ = Saison.objects.get_or_create(annee=saison_annee)
-
-            # Conversion en datetime
-            match_datetime = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
-            match_datetime = timezone.make_aware(match_datetime)
-
-            # Conversion scores en int si présent
-            score_domicile = int(score_domicile) if score_domicile else None
-            score_exterieure = int(score_exterieure) if score_exterieure else None
-
-            csv_matches.append({
-                'saison': saison,
-                'journee': journee,
-                'equipe_domicile': equipe_domicile,
-                'equipe_exterieure': equipe_exterieure,
-                'date': match_datetime,
-                'score_domicile': score_domicile,
-                'score_exterieur': score_exterieure
-            })
-
-    # Collecter les clés des matchs du CSV
-    csv_keys = {(m['equipe_domicile'], m['equipe_exterieure'], m['date']) for m in csv_matches}
-
-    # Création ou mise à jour des matchs du CSV
-    for match_data in csv_matches:
-        match, created = Match.objects.update_or_create(
-            equipe_domicile=match_data['equipe_domicile'],
-            equipe_exterieure=match_data['equipe_exterieure'],
-            date=match_data['date'],
-            defaults={
-                'saison': match_data['saison'],
-                'journee': match_data['journee'],
-                'score_domicile': match_data['score_domicile'],
-                'score_exterieur': match_data['score_exterieur']
-            }
+            try:
+                ligne = _convertir_ligne(row)
+            except ValueError as e:
+                erreur = LigneInvalide(numero, e)
+                if sur_erreur is None:
+                    raise erreur from e
+                if not sur_erreur(erreur):
+                    return
+                continue
+            yield ligne
+
+
+def lire_csv(chemin):
+    """Lit le CSV des matchs et retourne les lignes converties, sans toucher à la base"""
+    return list(iterer_csv(chemin))
+
+
+def _ids_par_nom(registre, noms):
+    """Retourne {nom: id} pour les noms demandés, lus dans le référentiel en mémoire, en créant d'un coup ceux qui manquent"""
+    ids = registre.ids_par_nom(noms)
+    manquants = [nom for nom in noms if nom not in ids]
+    if manquants:
+        model = registre.modele
+        model.objects.bulk_create([model(**{registre.champ_nom: nom}) for nom in manquants])
+        referentiel.invalider()  # bulk_create n'envoie pas post_save
+        ids.update(registre.ids_par_nom(manquants))
+    return ids
+
+
+def _matchs_existants(queryset):
+    """{(domicile, extérieur, date): (id, saison, journée, scores)} sans instancier de modèles ni charger les équipes"""
+    return {
+        (dom, ext, date): (pk, saison_id, journee, score_dom, score_ext)
+        for pk, dom, ext, date, saison_id, journee, score_dom, score_ext in queryset.values_list(
+            'id', 'equipe_domicile_id', 'equipe_exterieure_id', 'date',
+            'saison_id', 'journee', 'score_domicile', 'score_exterieur'
         )
-        if created:
-            print(f"Match créé : {match} à {match.date}")
-        else:
-            print(f"Match mis à jour : {match} à {match.date}, scores {match.score_domicile}-{match.score_exterieur}")
-
-    # Supprimer les matchs qui ne sont plus dans le CSV
-    existing_matches = Match.objects.all()
-    for match in existing_matches:
-        key = (match.equipe_domicile, match.equipe_exterieure, match.date)
-        if key not in csv_keys:
-            print(f"Match supprimé : {match} à {match.date}")
-            match.delete()
+    }
+
+
+def _match_a_ecrire(key, ligne, existant, saisons):
+    """Instance à créer ou à mettre à jour pour une ligne du CSV, ou None si le match est déjà à jour"""
+    valeurs = {
+        'saison_id': saisons[ligne['saison']],
+        'journee': ligne['journee'],
+        'score_domicile': ligne['score_domicile'],
+        'score_exterieur': ligne['score_exterieur'],
+    }
+    if existant is None:
+        return Match(equipe_domicile_id=key[0], equipe_exterieure_id=key[1], date=key[2], **valeurs)
+    if existant[1:] != tuple(valeurs.values()):
+        return Match(id=existant[0], **valeurs)
+    return None
+
+
+def _empreinte_fichier(chemin):
+    """Empreinte SHA-256 du contenu complet du fichier"""
+    sha = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(1 << 16), b''):
+            sha.update(bloc)
+    return sha.hexdigest()
+
 
 # ----------------------------
-# Watchdog Event Handler
+# Fonction d'import CSV
 # ----------------------------
-class CSVHandler(FileSystemEventHandler):
-    def on_modified(self, event):
-        if event.src_path.endswith('matchs.csv'):
-            print("CSV matchs modifié, import en cours...")
-            import_csv()
-        elif event.src_path.endswith('users.csv'):
-            print("CSV users modifié, import en cours...")
-            import_users()
+def import_csv(chemin=CSV_FILE, forcer=False):
+    """
+    Importe les matchs du CSV et retourne le résumé {crees, mis_a_jour, supprimes, inchanges}.
+    Un fichier identique au dernier import est ignoré (sauf forcer=True) et seules les lignes
+    dont l'empreinte a changé sont écrites.
+    """
+    if not os.path.exists(chemin):
+        print("Fichier CSV introuvable :", chemin)
+        return
+
+    resume = {'crees': 0, 'mis_a_jour': 0, 'supprimes': 0, 'inchanges': 0}
+    referentiel.verifier()  # Hors requête HTTP : équipes ou saisons ont pu changer dans un autre processus
+    empreinte_fichier = _empreinte_fichier(chemin)
+
+    with transaction.atomic():
+        etat, _ = EtatImport.objects.get_or_create(fichier=os.path.basename(chemin))
+        if etat.empreinte == empreinte_fichier and not forcer:
+            print("Fichier inchangé depuis le dernier import, rien à faire.")
+            return resume
+
+        try:
+            lignes = lire_csv(chemin)
+        except LigneInvalide as e:
+            # Import complet : une ligne invalide ferait supprimer son match, on n'écrit rien
+            print(f"{e} — import annulé.")
+            return
+        empreintes = dict(etat.lignes.values_list('cle', 'empreinte'))
+
+        # Équipes et saisons résolues en mémoire (créées en une fois si besoin)
+        equipes = _ids_par_nom(referentiel.equipes, {l['equipe_domicile'] for l in lignes} | {l['equipe_exterieure'] for l in lignes})
+        saisons = _ids_par_nom(referentiel.saisons, {l['saison'] for l in lignes})
+
+        # Matchs du CSV indexés par (domicile, extérieur, date) ; la dernière ligne l'emporte
+        csv_matches = {}
+        for l in lignes:
+            key = (equipes[l['equipe_domicile']], equipes[l['equipe_exterieure']], l['date'])
+            csv_matches[key] = l
+
+        existants = _matchs_existants(Match.objects.all())
+
+        a_creer = []
+        a_modifier = []
+        scores_modifies = []
+        deplaces = []  # Anciennes et nouvelles positions (saison, journée) des matchs changés de journée
+        lignes_modifiees = []
+        saisons_a_recalculer = set()
+        for key, l in csv_matches.items():
+            existant = existants.get(key)
+            # Ligne identique au dernier import et match toujours présent : rien à écrire
+            if existant is not None and empreintes.get(l['cle']) == l['empreinte']:
+                resume['inchanges'] += 1
+                continue
+            lignes_modifiees.append(EmpreinteLigne(etat=etat, cle=l['cle'], empreinte=l['empreinte']))
+
+            match = _match_a_ecrire(key, l, existant, saisons)
+            if match is None:
+                resume['inchanges'] += 1
+                continue
+            (a_creer if existant is None else a_modifier).append(match)
+            saisons_a_recalculer.add(match.saison_id)
+            if existant is not None:
+                saisons_a_recalculer.add(existant[1])
+                if existant[3:] != (match.score_domicile, match.score_exterieur):
+                    scores_modifies.append(match.id)
+                if existant[1:3] != (match.saison_id, match.journee):
+                    deplaces.extend([existant[1:3], (match.saison_id, match.journee)])
+
+        Match.objects.bulk_create(a_creer, batch_size=500)
+        Match.objects.bulk_update(a_modifier, ['saison', 'journee', 'score_domicile', 'score_exterieur'], batch_size=500)
+        resume['crees'] = len(a_creer)
+        resume['mis_a_jour'] = len(a_modifier)
+
+        # Résultats modifiés : points des pronostics réécrits en une requête
+        rescorer_matchs(scores_modifies)
+        invalider_photos(deplaces)
+
+        # Supprimer en une requête les matchs qui ne sont plus dans le CSV
+        obsoletes = [existant for key, existant in existants.items() if key not in csv_matches]
+        if obsoletes:
+            # Photos de leurs journées effacées avant le recalcul du classement, plus bas dans la transaction
+            invalider_photos(existant[1:3] for existant in obsoletes)
+            Match.objects.filter(pk__in=[existant[0] for existant in obsoletes]).delete()
+            saisons_a_recalculer.update(existant[1] for existant in obsoletes)
+            resume['supprimes'] = len(obsoletes)
+
+        # Mémoriser les empreintes : lignes modifiées, lignes disparues, fichier complet
+        EmpreinteLigne.objects.bulk_create(
+            lignes_modifiees, batch_size=500,
+            update_conflicts=True, unique_fields=['etat', 'cle'], update_fields=['empreinte'],
+        )
+        cles_csv = {l['cle'] for l in csv_matches.values()}
+        disparues = [cle for cle in empreintes if cle not in cles_csv]
+        if disparues:
+            etat.lignes.filter(cle__in=disparues).delete()
+        etat.empreinte = empreinte_fichier
+        etat.save()
+
+        # Les opérations en masse ne déclenchent pas les signaux : classement et cache mis à jour ici
+        for saison_id in saisons_a_recalculer:
+            mettre_a_jour_saison(saison_id)
+        if resume['crees'] or resume['mis_a_jour'] or resume['supprimes']:
+            incrementer_version()
+
+    print(
+        f"Import terminé : {resume['crees']} créé(s), {resume['mis_a_jour']} mis à jour, "
+        f"{resume['supprimes']} supprimé(s), {resume['inchanges']} inchangé(s)"
+    )
+    return resume
+
+# ----------------------------
+# Import en flux (archives volumineuses)
+# ----------------------------
+def _par_lots(lignes, taille_lot):
+    lot = []
+    for ligne in lignes:
+        lot.append(ligne)
+        if len(lot) >= taille_lot:
+            yield lot
+            lot = []
+    if lot:
+        yield lot
+
+
+def _ecrire_lot(lot, equipes, saisons, resume):
+    """Crée ou met à jour les matchs d'un lot ; retourne les saisons dont le classement a changé"""
+    noms = {l['equipe_domicile'] for l in lot} | {l['equipe_exterieure'] for l in lot}
+    equipes.update(_ids_par_nom(referentiel.equipes, noms - equipes.keys()))
+    saisons.update(_ids_par_nom(referentiel.saisons, {l['saison'] for l in lot} - saisons.keys()))
+
+    csv_matches = {
+        (equipes[l['equipe_domicile']], equipes[l['equipe_exterieure']], l['date']): l for l in lot
+    }
+    # Seuls les matchs susceptibles d'appartenir au lot sont chargés
+    existants = _matchs_existants(Match.objects.filter(
+        date__in={key[2] for key in csv_matches},
+        equipe_domicile_id__in={key[0] for key in csv_matches},
+    ))
+
+    a_creer = []
+    a_modifier = []
+    scores_modifies = []
+    deplaces = []
+    saisons_modifiees = set()
+    for key, l in csv_matches.items():
+        existant = existants.get(key)
+        match = _match_a_ecrire(key, l, existant, saisons)
+        if match is None:
+            resume['inchanges'] += 1
+            continue
+        (a_creer if existant is None else a_modifier).append(match)
+        saisons_modifiees.add(match.saison_id)
+        if existant is not None:
+            saisons_modifiees.add(existant[1])
+            if existant[3:] != (match.score_domicile, match.score_exterieur):
+                scores_modifies.append(match.id)
+            if existant[1:3] != (match.saison_id, match.journee):
+                deplaces.extend([existant[1:3], (match.saison_id, match.journee)])
+
+    Match.objects.bulk_create(a_creer)
+    Match.objects.bulk_update(a_modifier, ['saison', 'journee', 'score_domicile', 'score_exterieur'])
+    resume['crees'] += len(a_creer)
+    resume['mis_a_jour'] += len(a_modifier)
+    rescorer_matchs(scores_modifies)
+    invalider_photos(deplaces)
+    return saisons_modifiees
+
+
+def import_csv_flux(chemin, taille_lot=1000, sur_erreur='ignorer'):
+    """
+    Import en flux d'un CSV volumineux : les lignes sont lues par un générateur, validées,
+    puis écrites par lots de `taille_lot`, chacun dans sa propre transaction.
+    La mémoire utilisée ne dépend pas de la taille du fichier.
+    L'import est additif : les matchs absents du fichier ne sont pas supprimés.
+    `sur_erreur` vaut 'ignorer' (la ligne est sautée) ou 'arreter' (les lots déjà écrits sont conservés).
+    """
+    if not os.path.exists(chemin):
+        print("Fichier CSV introuvable :", chemin)
+        return
+
+    resume = {'crees': 0, 'mis_a_jour': 0, 'inchanges': 0, 'erreurs': 0}
+    referentiel.verifier()
+    equipes = {}
+    saisons = {}
+    saisons_a_recalculer = set()
+    nb_lignes = 0
+    debut = time.perf_counter()
+
+    def signaler(erreur):
+        resume['erreurs'] += 1
+        if sur_erreur == 'arreter':
+            print(f"{erreur} — import arrêté.")
+            return False
+        print(f"{erreur} — ligne ignorée.")
+        return True
+
+    for lot in _par_lots(iterer_csv(chemin, sur_erreur=signaler), taille_lot):
+        with transaction.atomic():
+            saisons_a_recalculer |= _ecrire_lot(lot, equipes, saisons, resume)
+        nb_lignes += len(lot)
+
+    # Les opérations en masse ne déclenchent pas les signaux : classement et cache mis à jour ici
+    for saison_id in saisons_a_recalculer:
+        mettre_a_jour_saison(saison_id)
+    if resume['crees'] or resume['mis_a_jour']:
+        incrementer_version()
+
+    duree = time.perf_counter() - debut
+    resume['lignes_par_seconde'] = round(nb_lignes / duree) if duree else nb_lignes
+    print(
+        f"Import en flux terminé : {nb_lignes} lignes en {duree:.2f} s ({resume['lignes_par_seconde']} lignes/s), "
+        f"{resume['crees']} créé(s), {resume['mis_a_jour']} mis à jour, {resume['inchanges']} inchangé(s), "
+        f"{resume['erreurs']} erreur(s)"
+    )
+    return resume
 
 # ----------------------------
 # Boucle principale
 # ----------------------------
 if __name__ == "__main__":
-    print("Surveillance des CSV en cours :", os.path.dirname(CSV_FILE))
-    event_handler = CSVHandler()
-    observer = Observer()
-    observer.schedule(event_handler, path=os.path.dirname(CSV_FILE), recursive=False)
-    observer.start()
-
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        observer.stop()
-    observer.join()
+    # La surveillance (anti-rebond, file d'attente) est assurée par la commande watch_imports
+    from django.core.management import call_command
+    call_command('watch_imports', dossier=os.path.dirname(CSV_FILE))
@@ -7,12 +7,16 @@ import django
 # Configuration Django
 # ----------------------------
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-sys.path.append(BASE_DIR)  # <-- ajoute le projet au PYTHONPATH
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
-django.setup()
+# Exécution directe du script uniquement : importer le module ne configure pas Django
+if __name__ == "__main__":
+    sys.path.append(BASE_DIR)  # <-- ajoute le projet au PYTHONPATH
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
 
 from django.contrib.auth.models import User
+from django.db import transaction
+from pronostics.cache import incrementer_version
 
 # ----------------------------
 # Chemin vers le CSV des utilisateurs
@@ -20,55 +24,85 @@ from django.contrib.auth.models import User
 USERS_CSV = os.path.join(BASE_DIR, 'import', 'users.csv')
 
 # ----------------------------
-# Fonction d'import utilisateurs
+# Superuser jamais modifié ni supprimé par l'import
 # ----------------------------
-def import_users():
-    if not os.path.exists(USERS_CSV):
-        print("Fichier CSV utilisateurs introuvable :", USERS_CSV)
-        return
+SUPERUSER_PROTEGE = 'Alex'
 
-    csv_usernames = set()
-    with open(USERS_CSV, newline='', encoding='utf-8') as f:
+CHAMPS = ('email', 'first_name', 'last_name')
+
+# ----------------------------
+# Fonction d'import utilisateurs
+# ----------------------------
+def lire_utilisateurs(chemin):
+    """Retourne {username: {email, first_name, last_name}} depuis le CSV (superuser protégé exclu)"""
+    utilisateurs = {}
+    with open(chemin, newline='', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         for row in reader:
             username = row['username'].strip()
-            email = row['email'].strip()
-            first_name = row.get('first_name', '').strip()
-            last_name = row.get('last_name', '').strip()
-            if not username or username == 'Alex':  # Conserver le superuser Alex
+            if not username or username == SUPERUSER_PROTEGE:  # Conserver le superuser Alex
                 continue
-            csv_usernames.add(username)
+            utilisateurs[username] = {
+                'email': row['email'].strip(),
+                'first_name': (row.get('first_name') or '').strip(),
+                'last_name': (row.get('last_name') or '').strip(),
+            }
+    return utilisateurs
 
-            user, created = User.objects.get_or_create(
-                username=username,
-                defaults={'email': email, 'first_name': first_name, 'last_name': last_name}
-            )
-            if created:
+
+def import_users(chemin=USERS_CSV):
+    """
+    Synchronise les utilisateurs avec le CSV en quelques requêtes : création en masse
+    (mot de passe inutilisable), mise à jour des seuls champs modifiés, suppression en une fois.
+    Retourne le résumé {crees, mis_a_jour, supprimes}.
+    """
+    if not os.path.exists(chemin):
+        print("Fichier CSV utilisateurs introuvable :", chemin)
+        return
+
+    csv_users = lire_utilisateurs(chemin)
+
+    with transaction.atomic():
+        existants = {
+            username: (pk, dict(zip(CHAMPS, valeurs)))
+            for pk, username, *valeurs in User.objects.exclude(username=SUPERUSER_PROTEGE).values_list('id', 'username', *CHAMPS)
+        }
+
+        a_creer = []
+        a_modifier = []
+        champs_modifies = set()
+        for username, valeurs in csv_users.items():
+            if username not in existants:
+                user = User(username=username, **valeurs)
                 user.set_unusable_password()  # Mot de passe inutilisable, force le choix à la première connexion
-                user.save()
-                print(f"Utilisateur créé : {username}")
-            else:
-                # Mettre à jour l'email, first_name, last_name si changé
-                updated = False
-                if user.email != email:
-                    user.email = email
-                    updated = True
-                if user.first_name != first_name:
-                    user.first_name = first_name
-                    updated = True
-                if user.last_name != last_name:
-                    user.last_name = last_name
-                    updated = True
-                if updated:
-                    user.save()
-                    print(f"Utilisateur mis à jour : {username}")
-
-    # Supprimer les utilisateurs qui ne sont plus dans le CSV (sauf Alex)
-    existing_users = User.objects.exclude(username='Alex')
-    for user in existing_users:
-        if user.username not in csv_usernames:
-            print(f"Utilisateur supprimé : {user.username}")
-            user.delete()
+                a_creer.append(user)
+                continue
+            pk, actuelles = existants[username]
+            modifies = {champ for champ in CHAMPS if actuelles[champ] != valeurs[champ]}
+            if modifies:
+                a_modifier.append(User(id=pk, username=username, **valeurs))
+                champs_modifies |= modifies
+
+        User.objects.bulk_create(a_creer, batch_size=1000)
+        if a_modifier:
+            User.objects.bulk_update(a_modifier, sorted(champs_modifies), batch_size=1000)
+
+        # Supprimer en une fois les utilisateurs qui ne sont plus dans le CSV (sauf Alex)
+        departs = [pk for username, (pk, _) in existants.items() if username not in csv_users]
+        if departs:
+            # Pronostics et lignes de classement supprimés en cascade, en une requête par table ;
+            # les rangs sont recalculés au commit, une fois par saison (signal pre_delete de User)
+            User.objects.filter(pk__in=departs).delete()
+
+        if a_creer or a_modifier or departs:
+            incrementer_version()
+
+    resume = {'crees': len(a_creer), 'mis_a_jour': len(a_modifier), 'supprimes': len(departs)}
+    print(
+        f"Utilisateurs synchronisés : {resume['crees']} créé(s), "
+        f"{resume['mis_a_jour']} mis à jour, {resume['supprimes']} supprimé(s)"
+    )
+    return resume
 
 if __name__ == "__main__":
     import_users()
\ No newline at end of file